@@ -1,10 +1,11 @@
 from django.contrib import admin
 from .models.category import Category, Brand
-from .models.facility import Facility, Cluster, FacilityInventory
-from .models.product import Language, Product, ProductDetail, ProductVariant, ProductVariantImage, Collection, ComboProduct, ComboProductItem
+from .models.facility import Facility, Cluster, FacilityInventory, ProductClusterPrice, ClusterPriceSummary, CatalogChangeEvent
+from .models.product import Language, Product, ProductDetail, ProductPriceHistoryDaily, PriceChangeBatch, ScheduledPriceChange, ProductVariant, ProductVariantImage, Collection, ComboProduct, ComboProductItem
 from .models.product_image import ProductImage
 from .models.setting import Attribute, AttributeValue, ProductType, ProductTypeAttribute, CustomTab, CustomSection, CustomField
-from .models.master import Tax
+from .models.master import Tax, GtinMetadata
+from .models.job import CatalogJob
 from django.utils.html import format_html
 
 
@@ -19,6 +20,18 @@ class TaxAdmin(admin.ModelAdmin):
         }),
     )
 
+@admin.register(GtinMetadata)
+class GtinMetadataAdmin(admin.ModelAdmin):
+    list_display = ('gtin', 'found', 'is_published', 'hsn_code', 'tax_rate', 'expires_at')
+    search_fields = ('gtin', 'hsn_code')
+    list_filter = ('found', 'is_published')
+
+@admin.register(CatalogJob)
+class CatalogJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'job_type', 'status', 'source', 'processed_count', 'total_count', 'failure_count', 'creation_date')
+    list_filter = ('job_type', 'status')
+    readonly_fields = ('params', 'result', 'error', 'run_after', 'started_at', 'finished_at')
+
 @admin.register(Cluster)
 class ClusterAdmin(admin.ModelAdmin):
     list_display = ('name', 'region', 'latitude', 'longitude', 'is_active')
@@ -26,6 +39,41 @@ class ClusterAdmin(admin.ModelAdmin):
     list_filter = ('region', 'is_active')
     filter_horizontal = ('facilities',) 
 
+@admin.register(ProductClusterPrice)
+class ProductClusterPriceAdmin(admin.ModelAdmin):
+    list_display = ('product', 'cluster', 'product_variant', 'selling_price', 'updation_date')
+    list_filter = ('cluster',)
+    raw_id_fields = ('product', 'product_variant', 'facility_inventory')
+
+@admin.register(PriceChangeBatch)
+class PriceChangeBatchAdmin(admin.ModelAdmin):
+    list_display = ('id', 'change_type', 'percentage_change', 'cluster', 'user', 'row_count', 'source', 'creation_date')
+    list_filter = ('change_type',)
+    raw_id_fields = ('cluster', 'user')
+
+@admin.register(ScheduledPriceChange)
+class ScheduledPriceChangeAdmin(admin.ModelAdmin):
+    list_display = ('id', 'margin', 'effective_at', 'status', 'applied_at', 'created_by')
+    list_filter = ('status',)
+    readonly_fields = ('result', 'error', 'applied_at')
+
+@admin.register(ProductPriceHistoryDaily)
+class ProductPriceHistoryDailyAdmin(admin.ModelAdmin):
+    list_display = ('day', 'product_variant', 'facility', 'change_type', 'change_count', 'first_old_price', 'last_new_price')
+    list_filter = ('change_type', 'day')
+    raw_id_fields = ('product', 'product_variant', 'cluster', 'facility')
+
+@admin.register(ClusterPriceSummary)
+class ClusterPriceSummaryAdmin(admin.ModelAdmin):
+    list_display = ('cluster', 'last_update_at', 'last_change_type', 'total_updates', 'unique_products', 'unique_variants')
+    readonly_fields = ('percentage_changes', 'recent_updates')
+
+@admin.register(CatalogChangeEvent)
+class CatalogChangeEventAdmin(admin.ModelAdmin):
+    list_display = ('seq', 'entity', 'entity_id', 'action', 'product_id', 'facility_id', 'creation_date')
+    list_filter = ('entity', 'action')
+    readonly_fields = ('payload',)
+
 @admin.register(Facility)
 class FacilityAdmin(admin.ModelAdmin):
     list_display = ('name', 'facility_type', 'address', 'city', 'state', 'get_assigned_clusters', 'is_active')
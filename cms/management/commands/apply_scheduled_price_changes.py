@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cms.models.product import ScheduledPriceChange
+from cms.utils.scheduled_prices import apply_due_price_changes
+
+
+class Command(BaseCommand):
+    help = "Apply scheduled price changes whose effective time has passed (run at the maintenance window)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep polling for due changes")
+        parser.add_argument('--interval', type=float, default=60.0, help="Polling interval in seconds with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            handled = apply_due_price_changes()
+            for change in handled:
+                if change.status == ScheduledPriceChange.APPLIED:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Applied scheduled change #{change.id}: {change.result['updated']} inventories updated, "
+                        f"{change.result['rejected']} rejected"
+                    ))
+                else:
+                    self.stdout.write(self.style.ERROR(f"Scheduled change #{change.id} failed: {change.error}"))
+
+            if not options['loop']:
+                if not handled:
+                    self.stdout.write("No scheduled price changes are due")
+                return
+            time.sleep(options['interval'])
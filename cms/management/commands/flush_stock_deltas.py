@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from cms.utils.stock_deltas import flush_stock_deltas
+
+
+class Command(BaseCommand):
+    help = "Apply buffered stock deltas to facility inventories"
+
+    def handle(self, *args, **options):
+        updated = flush_stock_deltas()
+        self.stdout.write(self.style.SUCCESS(f"Applied stock deltas to {updated} inventory rows"))
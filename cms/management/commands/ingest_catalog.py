@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cms.utils.catalog_ingest import ingest_catalog_csv, STAGING_COLUMNS
+from cms.utils.jobs import run_job
+from user.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Load a normalized catalog CSV through a COPY staging table and merge it into products/variants. "
+        f"Columns: {', '.join(STAGING_COLUMNS)}"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Path to the normalized catalog CSV")
+        parser.add_argument('--user-id', type=int, help="User recorded as created_by/updated_by on products")
+        parser.add_argument('--skip-validation', action='store_true',
+                            help="Leave the EAN/RAN validation job pending for run_catalog_jobs")
+
+    def handle(self, *args, **options):
+        user = None
+        if options.get('user_id'):
+            user = User.objects.filter(id=options['user_id']).first()
+            if not user:
+                raise CommandError(f"User {options['user_id']} not found")
+
+        try:
+            with open(options['path'], 'r', encoding='utf-8-sig', newline='') as csv_file:
+                report = ingest_catalog_csv(csv_file, user=user, run_validation_async=False)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for row in report['rejected']:
+            self.stdout.write(self.style.WARNING(
+                f"Line {row['line']} ({row['product_sku']} / {row['variant_sku']}): {row['reason']}"
+            ))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Staged {report['staged_rows']} rows, rejected {report['rejected_rows']}. "
+            f"Products: {report['products_created']} created, {report['products_updated']} updated. "
+            f"Variants: {report['variants_created']} created, {report['variants_updated']} updated "
+            f"in {report['duration_seconds']}s."
+        ))
+
+        job_id = report['validation_job_id']
+        if job_id and not options['skip_validation']:
+            # A command exits when handle() returns, so validate in the foreground
+            self.stdout.write(f"Validating new/changed EAN/RAN codes (job #{job_id})...")
+            run_job(job_id)
+            self.stdout.write(self.style.SUCCESS(f"Validation job #{job_id} finished"))
+        elif job_id:
+            self.stdout.write(f"EAN/RAN validation job #{job_id} queued")
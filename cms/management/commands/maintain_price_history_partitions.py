@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from cms.utils.price_history import (
+    PRICE_HISTORY_RETENTION_MONTHS,
+    ensure_partitions,
+    expire_partitions,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create upcoming monthly product_price_history partitions, and roll up "
+        "and detach partitions older than the retention window"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help="Create partitions through this many months ahead (default 3)")
+        parser.add_argument('--retention-months', type=int, default=PRICE_HISTORY_RETENTION_MONTHS,
+                            help="Months of raw history to keep attached (default PRICE_HISTORY_RETENTION_MONTHS or 12)")
+        parser.add_argument('--drop', action='store_true',
+                            help="Drop expired partitions after rolling them up instead of keeping them as archive tables")
+
+    def handle(self, *args, **options):
+        for name, moved in ensure_partitions(months_ahead=options['months_ahead']):
+            self.stdout.write(f"Created {name}" + (f" (moved {moved} rows from the default partition)" if moved else ""))
+
+        for name, rows in expire_partitions(retention_months=options['retention_months'], drop=options['drop']):
+            action = "dropped" if options['drop'] else "detached"
+            self.stdout.write(f"Rolled up {name} into {rows} daily rows and {action} it")
+
+        self.stdout.write(self.style.SUCCESS("Price history partitions are up to date"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from cms.utils.change_feed import CATALOG_CHANGE_RETENTION_DAYS, prune_events, sequence_pending_events
+
+
+class Command(BaseCommand):
+    help = "Sequence pending catalog change events and delete the ones older than the retention window"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=CATALOG_CHANGE_RETENTION_DAYS,
+                            help="Days of change events to keep (default CATALOG_CHANGE_RETENTION_DAYS or 30)")
+
+    def handle(self, *args, **options):
+        sequenced = sequence_pending_events()
+        deleted = prune_events(retention_days=options['retention_days'])
+        self.stdout.write(self.style.SUCCESS(f"Sequenced {sequenced} and pruned {deleted} catalog change events"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from cms.models.facility import Cluster
+from cms.utils.cluster_price_summary import rebuild_cluster_price_summary
+
+
+class Command(BaseCommand):
+    help = "Rebuild the cluster price-update summaries read by /clusters/price-update-status/ from price history"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cluster-id', type=int, action='append', dest='cluster_ids',
+                            help="Only rebuild this cluster (repeatable)")
+
+    def handle(self, *args, **options):
+        cluster_ids = options.get('cluster_ids') or Cluster.objects.values_list('id', flat=True)
+        for cluster_id in cluster_ids:
+            summary = rebuild_cluster_price_summary(cluster_id)
+            self.stdout.write(f"Cluster {cluster_id}: {summary.total_updates} updates")
+        self.stdout.write(self.style.SUCCESS("Cluster price summaries rebuilt"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from cms.utils.cluster_pricing import refresh_cluster_prices
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product x cluster price summary used by /products-pricing/?type=cluster"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--product-id', type=int, action='append', dest='product_ids',
+                            help="Only refresh this product (repeatable)")
+
+    def handle(self, *args, **options):
+        rows = refresh_cluster_prices(product_ids=options.get('product_ids'))
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {rows} product cluster price rows"))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cms.models.job import CatalogJob
+from cms.utils.jobs import claimable_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "Run due background catalog jobs, including ones left pending or running by a restart"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--job-type', choices=[choice for choice, _ in CatalogJob.JOB_TYPES],
+                            help="Only run jobs of this type")
+        parser.add_argument('--loop', action='store_true', help="Keep polling for new jobs")
+        parser.add_argument('--interval', type=float, default=5.0, help="Polling interval in seconds with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            pending = claimable_jobs().order_by('creation_date')
+            if options.get('job_type'):
+                pending = pending.filter(job_type=options['job_type'])
+
+            ran = 0
+            for job_id in pending.values_list('id', flat=True):
+                if run_job(job_id):
+                    ran += 1
+
+            if ran:
+                self.stdout.write(self.style.SUCCESS(f"Ran {ran} catalog job(s)"))
+            if not options['loop']:
+                if not ran:
+                    self.stdout.write("No due catalog jobs")
+                return
+            time.sleep(options['interval'])
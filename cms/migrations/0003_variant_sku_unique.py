@@ -0,0 +1,34 @@
+# Generated by Django 4.2.24 on 2026-10-18 21:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0002_initial'),
+    ]
+
+    operations = [
+        # The old last-id based generator could hand the same SKU to two
+        # variants. Keep it on the oldest one and suffix the others with
+        # their id, so the constraint can be built on existing data.
+        migrations.RunSQL(
+            sql="""
+                UPDATE variants v SET sku = v.sku || '-' || v.id
+                FROM (
+                    SELECT id, row_number() OVER (PARTITION BY sku ORDER BY id) AS position
+                    FROM variants WHERE sku > ''
+                ) d
+                WHERE d.id = v.id AND d.position > 1;
+                -- Fire the deferred FK checks queued by the UPDATE, the index can't be built while they pend
+                SET CONSTRAINTS ALL IMMEDIATE;
+                SET CONSTRAINTS ALL DEFERRED;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='productvariant',
+            constraint=models.UniqueConstraint(condition=models.Q(('sku__gt', '')), fields=('sku',), name='variants_sku_unique'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.24 on 2026-10-18 21:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0003_variant_sku_unique'),
+    ]
+
+    operations = [
+        # Start past every SKU number already handed out by the old
+        # last-id based generator so existing SKUs are never reissued.
+        migrations.RunSQL(
+            sql="""
+                CREATE SEQUENCE IF NOT EXISTS product_sku_seq;
+                SELECT setval('product_sku_seq', GREATEST(
+                    (SELECT COALESCE(MAX(id), 0) FROM products),
+                    (SELECT COALESCE(MAX(substring(sku FROM '^ROZ([0-9]{1,18})$')::bigint), 0) FROM products)
+                ) + 1, false);
+                CREATE SEQUENCE IF NOT EXISTS variant_sku_seq;
+                SELECT setval('variant_sku_seq', (SELECT COALESCE(MAX(id), 0) FROM variants) + 1, false);
+            """,
+            reverse_sql="""
+                DROP SEQUENCE IF EXISTS product_sku_seq;
+                DROP SEQUENCE IF EXISTS variant_sku_seq;
+            """,
+        ),
+    ]
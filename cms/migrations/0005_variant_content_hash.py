@@ -0,0 +1,18 @@
+# Generated by Django 4.2.24 on 2026-10-18 21:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0004_sku_sequences'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productvariant',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.24 on 2026-10-18 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0005_variant_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GtinMetadata',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('creation_date', models.DateTimeField(auto_now_add=True)),
+                ('updation_date', models.DateTimeField(auto_now=True)),
+                ('gtin', models.CharField(max_length=20, unique=True)),
+                ('found', models.BooleanField(default=False)),
+                ('is_published', models.BooleanField(default=False)),
+                ('hsn_code', models.TextField(blank=True, null=True)),
+                ('tax_rate', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('cgst', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('sgst', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('igst', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('cess', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('payload', models.JSONField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'GTIN Metadata',
+                'verbose_name_plural': 'GTIN Metadata',
+                'db_table': 'gtin_metadata',
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.24 on 2026-10-18 21:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cms', '0006_gtin_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productvariant',
+            name='rejection_reason',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='CatalogJob',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('creation_date', models.DateTimeField(auto_now_add=True)),
+                ('updation_date', models.DateTimeField(auto_now=True)),
+                ('job_type', models.CharField(choices=[('ean_validation', 'EAN/RAN Validation')], max_length=50)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('source', models.CharField(blank=True, help_text='Endpoint or command that queued the job', max_length=100, null=True)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('total_count', models.PositiveIntegerField(default=0)),
+                ('processed_count', models.PositiveIntegerField(default=0)),
+                ('success_count', models.PositiveIntegerField(default=0)),
+                ('failure_count', models.PositiveIntegerField(default=0)),
+                ('result', models.JSONField(blank=True, default=dict)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_created_by', to=settings.AUTH_USER_MODEL)),
+                ('updated_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_updated_by', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'catalog_jobs',
+                'ordering': ['-creation_date'],
+                'indexes': [models.Index(fields=['job_type', 'status'], name='catalog_job_job_typ_03434b_idx'), models.Index(fields=['status', 'creation_date'], name='catalog_job_status_03d604_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.24 on 2026-10-18 21:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0008_price_override_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductClusterPrice',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('creation_date', models.DateTimeField(auto_now_add=True)),
+                ('updation_date', models.DateTimeField(auto_now=True)),
+                ('selling_price', models.FloatField(default=0.0)),
+                ('cluster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_prices', to='cms.cluster')),
+                ('facility_inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cluster_prices', to='cms.facilityinventory')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cluster_prices', to='cms.product')),
+                ('product_variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cluster_prices', to='cms.productvariant')),
+            ],
+            options={
+                'db_table': 'product_cluster_prices',
+                'indexes': [models.Index(fields=['cluster'], name='product_clu_cluster_744d4e_idx')],
+                'unique_together': {('product', 'cluster')},
+            },
+        ),
+        # Backfill the summary; afterwards signals and bulk writers keep it current
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO product_cluster_prices (
+                    product_id, cluster_id, product_variant_id, facility_inventory_id,
+                    selling_price, creation_date, updation_date
+                )
+                SELECT DISTINCT ON (v.product_id, cf.cluster_id)
+                    v.product_id, cf.cluster_id, v.id, fi.id, fi.selling_price, now(), now()
+                FROM variants v
+                JOIN facility_inventories fi ON fi.product_variant_id = v.id AND fi.is_active
+                JOIN clusters_facilities cf ON cf.facility_id = fi.facility_id
+                WHERE v.is_active
+                ORDER BY v.product_id, cf.cluster_id, fi.id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
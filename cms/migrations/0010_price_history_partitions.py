@@ -0,0 +1,134 @@
+# Generated by Django 4.2.24 on 2026-10-18 21:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0009_product_cluster_prices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductPriceHistoryDaily',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('creation_date', models.DateTimeField(auto_now_add=True)),
+                ('updation_date', models.DateTimeField(auto_now=True)),
+                ('day', models.DateField()),
+                ('change_type', models.CharField(max_length=50)),
+                ('change_count', models.PositiveIntegerField(default=0)),
+                ('first_old_price', models.FloatField()),
+                ('last_new_price', models.FloatField()),
+                ('first_old_csp', models.FloatField()),
+                ('last_new_csp', models.FloatField()),
+                ('min_new_price', models.FloatField()),
+                ('max_new_price', models.FloatField()),
+                ('avg_percentage_change', models.FloatField()),
+                ('cluster', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_price_history', to='cms.cluster')),
+                ('facility', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_price_history', to='cms.facility')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_price_history', to='cms.product')),
+                ('product_variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_price_history', to='cms.productvariant')),
+            ],
+            options={
+                'verbose_name': 'Product Price History (Daily)',
+                'verbose_name_plural': 'Product Price History (Daily)',
+                'db_table': 'product_price_history_daily',
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['product', 'day'], name='product_pri_product_fa6852_idx'), models.Index(fields=['facility', 'day'], name='product_pri_facilit_f0a9a4_idx')],
+                'unique_together': {('day', 'product_variant', 'facility', 'change_type')},
+            },
+        ),
+        # Rebuild product_price_history as a table range-partitioned by month
+        # on creation_date. Postgres requires the partition key in the primary
+        # key, and ids now come from a plain sequence. Existing rows are copied
+        # into monthly partitions from the oldest row through three months
+        # ahead; the default partition catches anything outside them.
+        migrations.RunSQL(
+            sql="""
+                ALTER TABLE product_price_history RENAME TO product_price_history_unpartitioned;
+                ALTER TABLE product_price_history_unpartitioned
+                    RENAME CONSTRAINT product_price_history_pkey TO product_price_history_unpartitioned_pkey;
+                ALTER TABLE product_price_history_unpartitioned ALTER COLUMN id DROP IDENTITY;
+
+                CREATE SEQUENCE product_price_history_id_seq AS integer;
+                CREATE TABLE product_price_history (
+                    id integer NOT NULL DEFAULT nextval('product_price_history_id_seq'),
+                    creation_date timestamp with time zone NOT NULL,
+                    updation_date timestamp with time zone NOT NULL,
+                    old_price double precision NOT NULL,
+                    new_price double precision NOT NULL,
+                    old_csp double precision NOT NULL,
+                    new_csp double precision NOT NULL,
+                    percentage_change double precision NOT NULL,
+                    change_reason text NULL,
+                    change_type varchar(50) NOT NULL,
+                    cluster_id integer NULL,
+                    facility_id integer NOT NULL,
+                    product_id integer NOT NULL,
+                    product_variant_id integer NOT NULL,
+                    user_id bigint NULL,
+                    PRIMARY KEY (id, creation_date)
+                ) PARTITION BY RANGE (creation_date);
+                ALTER SEQUENCE product_price_history_id_seq OWNED BY product_price_history.id;
+
+                CREATE TABLE product_price_history_default PARTITION OF product_price_history DEFAULT;
+
+                DO $$
+                DECLARE
+                    month date := date_trunc('month', COALESCE(
+                        (SELECT min(creation_date) FROM product_price_history_unpartitioned), now()
+                    ) AT TIME ZONE 'UTC')::date;
+                BEGIN
+                    WHILE month <= date_trunc('month', now() AT TIME ZONE 'UTC' + interval '3 months')::date LOOP
+                        EXECUTE format(
+                            'CREATE TABLE %I PARTITION OF product_price_history FOR VALUES FROM (%L) TO (%L)',
+                            'product_price_history_p' || to_char(month, 'YYYYMM'),
+                            month::timestamp AT TIME ZONE 'UTC',
+                            (month + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+                        );
+                        month := month + interval '1 month';
+                    END LOOP;
+                END $$;
+
+                INSERT INTO product_price_history (
+                    id, creation_date, updation_date, old_price, new_price, old_csp, new_csp,
+                    percentage_change, change_reason, change_type, cluster_id, facility_id,
+                    product_id, product_variant_id, user_id
+                )
+                SELECT
+                    id, creation_date, updation_date, old_price, new_price, old_csp, new_csp,
+                    percentage_change, change_reason, change_type, cluster_id, facility_id,
+                    product_id, product_variant_id, user_id
+                FROM product_price_history_unpartitioned;
+                SELECT setval('product_price_history_id_seq',
+                              (SELECT COALESCE(max(id), 0) FROM product_price_history) + 1, false);
+
+                DROP TABLE product_price_history_unpartitioned;
+
+                CREATE INDEX product_pri_creatio_0ebe25_idx ON product_price_history (creation_date);
+                CREATE INDEX product_pri_product_2e84d0_idx ON product_price_history (product_id, facility_id);
+                CREATE INDEX product_pri_product_5afee1_idx ON product_price_history (product_variant_id, facility_id);
+                CREATE INDEX product_price_history_cluster_id_846e81fb ON product_price_history (cluster_id);
+                CREATE INDEX product_price_history_facility_id_07b56961 ON product_price_history (facility_id);
+                CREATE INDEX product_price_history_product_id_ae1b743b ON product_price_history (product_id);
+                CREATE INDEX product_price_history_product_variant_id_c048d34c ON product_price_history (product_variant_id);
+                CREATE INDEX product_price_history_user_id_a51dcc3c ON product_price_history (user_id);
+
+                ALTER TABLE product_price_history
+                    ADD CONSTRAINT product_price_histor_product_variant_id_c048d34c_fk_variants_
+                        FOREIGN KEY (product_variant_id) REFERENCES variants (id) DEFERRABLE INITIALLY DEFERRED,
+                    ADD CONSTRAINT product_price_history_cluster_id_846e81fb_fk_clusters_id
+                        FOREIGN KEY (cluster_id) REFERENCES clusters (id) DEFERRABLE INITIALLY DEFERRED,
+                    ADD CONSTRAINT product_price_history_facility_id_07b56961_fk_facilities_id
+                        FOREIGN KEY (facility_id) REFERENCES facilities (id) DEFERRABLE INITIALLY DEFERRED,
+                    ADD CONSTRAINT product_price_history_product_id_ae1b743b_fk_products_id
+                        FOREIGN KEY (product_id) REFERENCES products (id) DEFERRABLE INITIALLY DEFERRED,
+                    ADD CONSTRAINT product_price_history_user_id_a51dcc3c_fk_user_user_id
+                        FOREIGN KEY (user_id) REFERENCES user_user (id) DEFERRABLE INITIALLY DEFERRED;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
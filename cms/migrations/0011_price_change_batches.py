@@ -0,0 +1,58 @@
+# Generated by Django 4.2.24 on 2026-10-18 21:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cms', '0010_price_history_partitions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='productpricehistory',
+            name='change_type',
+            field=models.CharField(blank=True, default='percentage_update', max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='productpricehistory',
+            name='percentage_change',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='PriceChangeBatch',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('creation_date', models.DateTimeField(auto_now_add=True)),
+                ('updation_date', models.DateTimeField(auto_now=True)),
+                ('percentage_change', models.FloatField(blank=True, null=True)),
+                ('change_type', models.CharField(max_length=50)),
+                ('change_reason', models.TextField(blank=True, null=True)),
+                ('source', models.CharField(blank=True, help_text='Endpoint or job that made the change', max_length=100, null=True)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('cluster', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='price_change_batches', to='cms.cluster')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='price_change_batches', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'price_change_batches',
+                'ordering': ['-creation_date'],
+            },
+        ),
+        migrations.AddField(
+            model_name='productpricehistory',
+            name='batch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='cms.pricechangebatch'),
+        ),
+        migrations.AddIndex(
+            model_name='pricechangebatch',
+            index=models.Index(fields=['cluster', 'creation_date'], name='price_chang_cluster_6a6a84_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pricechangebatch',
+            index=models.Index(fields=['change_type', 'creation_date'], name='price_chang_change__d4c1a4_idx'),
+        ),
+    ]
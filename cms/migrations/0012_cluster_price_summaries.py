@@ -0,0 +1,67 @@
+# Generated by Django 4.2.24 on 2026-10-18 21:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cms', '0011_price_change_batches'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClusterPriceSummary',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('creation_date', models.DateTimeField(auto_now_add=True)),
+                ('updation_date', models.DateTimeField(auto_now=True)),
+                ('last_update_at', models.DateTimeField(blank=True, null=True)),
+                ('last_percentage_change', models.FloatField(blank=True, null=True)),
+                ('last_change_type', models.CharField(blank=True, max_length=50, null=True)),
+                ('last_change_reason', models.TextField(blank=True, null=True)),
+                ('total_updates', models.PositiveIntegerField(default=0)),
+                ('unique_products', models.PositiveIntegerField(default=0)),
+                ('unique_variants', models.PositiveIntegerField(default=0)),
+                ('percentage_changes', models.JSONField(blank=True, default=list)),
+                ('recent_updates', models.JSONField(blank=True, default=list)),
+                ('cluster', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='price_summary', to='cms.cluster')),
+                ('last_batch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='cms.pricechangebatch')),
+                ('last_user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'cluster_price_summaries',
+            },
+        ),
+        migrations.CreateModel(
+            name='ClusterPriceSummaryVariant',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('creation_date', models.DateTimeField(auto_now_add=True)),
+                ('updation_date', models.DateTimeField(auto_now=True)),
+                ('cluster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cms.cluster')),
+                ('product_variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cms.productvariant')),
+            ],
+            options={
+                'db_table': 'cluster_price_summary_variants',
+                'unique_together': {('cluster', 'product_variant')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ClusterPriceSummaryProduct',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('creation_date', models.DateTimeField(auto_now_add=True)),
+                ('updation_date', models.DateTimeField(auto_now=True)),
+                ('cluster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cms.cluster')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cms.product')),
+            ],
+            options={
+                'db_table': 'cluster_price_summary_products',
+                'unique_together': {('cluster', 'product')},
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.24 on 2026-10-18 21:31
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cms', '0012_cluster_price_summaries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledPriceChange',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('creation_date', models.DateTimeField(auto_now_add=True)),
+                ('updation_date', models.DateTimeField(auto_now=True)),
+                ('cluster_ids', models.JSONField(blank=True, default=list)),
+                ('facility_ids', models.JSONField(blank=True, default=list)),
+                ('variant_ids', models.JSONField(blank=True, default=list, help_text='Empty means every matching variant')),
+                ('category_ids', models.JSONField(blank=True, default=list)),
+                ('brand_ids', models.JSONField(blank=True, default=list)),
+                ('product_name', models.CharField(blank=True, default='', max_length=255)),
+                ('variant_name', models.CharField(blank=True, default='', max_length=255)),
+                ('margin', models.FloatField()),
+                ('write_history', models.BooleanField(default=True)),
+                ('effective_at', models.DateTimeField()),
+                ('status', models.CharField(choices=[('scheduled', 'Scheduled'), ('applied', 'Applied'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='scheduled', max_length=20)),
+                ('applied_at', models.DateTimeField(blank=True, null=True)),
+                ('result', models.JSONField(blank=True, default=dict)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_created_by', to=settings.AUTH_USER_MODEL)),
+                ('updated_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_updated_by', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'scheduled_price_changes',
+                'ordering': ['effective_at', 'id'],
+                'indexes': [models.Index(fields=['status', 'effective_at'], name='scheduled_p_status_91bd98_idx')],
+            },
+        ),
+    ]
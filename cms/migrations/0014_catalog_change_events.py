@@ -0,0 +1,33 @@
+# Generated by Django 4.2.24 on 2026-10-18 21:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0013_scheduled_price_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('seq', models.BigIntegerField(blank=True, null=True, unique=True)),
+                ('txid', models.BigIntegerField()),
+                ('entity', models.CharField(choices=[('product', 'Product'), ('variant', 'Variant'), ('inventory', 'Inventory'), ('price', 'Price')], max_length=20)),
+                ('entity_id', models.IntegerField()),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=20)),
+                ('product_id', models.IntegerField(blank=True, null=True)),
+                ('product_variant_id', models.IntegerField(blank=True, null=True)),
+                ('facility_id', models.IntegerField(blank=True, null=True)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('creation_date', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'catalog_change_events',
+                'indexes': [models.Index(condition=models.Q(('seq__isnull', True)), fields=['id'], name='catalog_change_events_pending'), models.Index(fields=['entity', 'seq'], name='catalog_cha_entity_c3a513_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.24 on 2026-10-18 21:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0014_catalog_change_events'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='catalogjob',
+            name='job_type',
+            field=models.CharField(choices=[('ean_validation', 'EAN/RAN Validation'), ('price_override', 'Price Override'), ('facility_clone', 'Facility Clone')], max_length=50),
+        ),
+    ]
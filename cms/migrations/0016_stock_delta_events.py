@@ -0,0 +1,27 @@
+# Generated by Django 4.2.24 on 2026-10-18 21:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0015_facility_clone_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockDeltaEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('facility_id', models.IntegerField()),
+                ('product_variant_id', models.IntegerField()),
+                ('delta', models.IntegerField()),
+                ('source', models.CharField(blank=True, max_length=100, null=True)),
+                ('creation_date', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'stock_delta_events',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.24 on 2026-10-18 22:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0016_stock_delta_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogjob',
+            name='run_after',
+            field=models.DateTimeField(blank=True, help_text='Not started before this time (retries with backoff)', null=True),
+        ),
+    ]
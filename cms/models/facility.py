@@ -1,6 +1,8 @@
 from django.db import models
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
 from .models import TenantModel, BaseModel
-from .product import ProductVariant
+from .product import Product, ProductVariant, ProductVariantPrices, PriceChangeBatch
 from .master import Tax
 from django.core.exceptions import ValidationError
 from .category import Category
@@ -102,13 +104,12 @@ class FacilityInventory(BaseModel):
         unique_together = ('facility', 'product_variant')
 
     def save(self, *args, **kwargs):
-        # If mrp or selling_price is not provided, set them to 0
-        if self.mrp is None:
-            self.mrp = ProductVariant.objects.get(id=self.product_variant.id).mrp or 0.0
-        if self.base_price is None:
-            self.base_price = ProductVariant.objects.get(id=self.product_variant.id).base_price or 0.0
-        if self.selling_price is None:
-            self.selling_price = ProductVariant.objects.get(id=self.product_variant.id).selling_price or 0.0
+        # Prices that are not provided default to the variant's, read in one query
+        missing = [field for field in ('mrp', 'base_price', 'selling_price') if getattr(self, field) is None]
+        if missing:
+            defaults = ProductVariant.objects.filter(id=self.product_variant_id).values(*missing).first() or {}
+            for field in missing:
+                setattr(self, field, defaults.get(field) or 0.0)
 
         # Calculate cust_discount if it's not already set
         if self.cust_discount is None:
@@ -119,6 +120,203 @@ class FacilityInventory(BaseModel):
     def __str__(self):
         return f"{self.facility.name} - {self.product_variant.name}"
 
+
+class ProductClusterPrice(BaseModel):
+    """
+    Precomputed product x cluster price: the lowest-id active inventory row of
+    the product's active variants in the cluster's facilities. Maintained by
+    cms.utils.cluster_pricing from inventory, variant and cluster changes.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='cluster_prices')
+    cluster = models.ForeignKey(Cluster, on_delete=models.CASCADE, related_name='product_prices')
+    product_variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name='cluster_prices')
+    facility_inventory = models.ForeignKey(FacilityInventory, on_delete=models.CASCADE, related_name='cluster_prices')
+    selling_price = models.FloatField(default=0.0)
+
+    class Meta:
+        db_table = 'product_cluster_prices'
+        unique_together = ('product', 'cluster')
+        indexes = [
+            models.Index(fields=['cluster']),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.cluster_id}: {self.selling_price}"
+
+
+class ClusterPriceSummary(BaseModel):
+    """
+    Per-cluster price update status, maintained incrementally whenever price
+    history is written (cms.utils.cluster_price_summary). The status endpoint
+    reads this one row instead of scanning the cluster's history.
+    """
+    cluster = models.OneToOneField(Cluster, on_delete=models.CASCADE, related_name='price_summary')
+    last_batch = models.ForeignKey(PriceChangeBatch, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_update_at = models.DateTimeField(blank=True, null=True)
+    last_percentage_change = models.FloatField(blank=True, null=True)
+    last_change_type = models.CharField(max_length=50, blank=True, null=True)
+    last_change_reason = models.TextField(blank=True, null=True)
+    last_user = models.ForeignKey('user.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    total_updates = models.PositiveIntegerField(default=0)
+    unique_products = models.PositiveIntegerField(default=0)
+    unique_variants = models.PositiveIntegerField(default=0)
+    percentage_changes = models.JSONField(default=list, blank=True)
+    recent_updates = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        db_table = 'cluster_price_summaries'
+
+    def __str__(self):
+        return f"{self.cluster} ({self.total_updates} updates)"
+
+
+class ClusterPriceSummaryProduct(BaseModel):
+    """Products ever repriced in a cluster; exact distinct counter for ClusterPriceSummary"""
+    cluster = models.ForeignKey(Cluster, on_delete=models.CASCADE, related_name='+')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        db_table = 'cluster_price_summary_products'
+        unique_together = ('cluster', 'product')
+
+
+class ClusterPriceSummaryVariant(BaseModel):
+    """Variants ever repriced in a cluster; exact distinct counter for ClusterPriceSummary"""
+    cluster = models.ForeignKey(Cluster, on_delete=models.CASCADE, related_name='+')
+    product_variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        db_table = 'cluster_price_summary_variants'
+        unique_together = ('cluster', 'product_variant')
+
+
+class CatalogChangeEvent(models.Model):
+    """
+    Append-only catalog change feed entry. ``seq`` is assigned once the
+    writing transaction has settled (cms.utils.change_feed), so consumers
+    can page with ``seq > after`` without missing late commits. Entity ids
+    are plain integers: events outlive the rows they describe.
+    """
+    ENTITY_CHOICES = [
+        ('product', 'Product'),
+        ('variant', 'Variant'),
+        ('inventory', 'Inventory'),
+        ('price', 'Price'),
+    ]
+    ACTION_CHOICES = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    seq = models.BigIntegerField(unique=True, blank=True, null=True)
+    txid = models.BigIntegerField()
+    entity = models.CharField(max_length=20, choices=ENTITY_CHOICES)
+    entity_id = models.IntegerField()
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    product_id = models.IntegerField(blank=True, null=True)
+    product_variant_id = models.IntegerField(blank=True, null=True)
+    facility_id = models.IntegerField(blank=True, null=True)
+    payload = models.JSONField(default=dict, blank=True)
+    creation_date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'catalog_change_events'
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(seq__isnull=True), name='catalog_change_events_pending'),
+            models.Index(fields=['entity', 'seq']),
+        ]
+
+    def __str__(self):
+        return f"#{self.seq or '-'} {self.entity} {self.entity_id} {self.action}"
+
+
+class StockDeltaEvent(models.Model):
+    """
+    Buffered stock movement of a facility inventory row, waiting to be
+    coalesced into ``facility_inventories.stock`` (cms.utils.stock_deltas).
+    Rows are deleted once applied.
+    """
+    id = models.BigAutoField(primary_key=True)
+    facility_id = models.IntegerField()
+    product_variant_id = models.IntegerField()
+    delta = models.IntegerField()
+    source = models.CharField(max_length=100, blank=True, null=True)
+    creation_date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'stock_delta_events'
+
+    def __str__(self):
+        return f"{self.facility_id}/{self.product_variant_id} {self.delta:+d}"
+
+
+@receiver(post_save, sender=FacilityInventory)
+@receiver(post_delete, sender=FacilityInventory)
+def refresh_cluster_price_for_inventory(sender, instance, **kwargs):
+    from cms.utils.cluster_pricing import schedule_cluster_price_refresh
+    schedule_cluster_price_refresh(variant_ids=[instance.product_variant_id])
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def refresh_cluster_price_for_variant(sender, instance, **kwargs):
+    # By product: a deleted variant can no longer be resolved to its product
+    from cms.utils.cluster_pricing import schedule_cluster_price_refresh
+    schedule_cluster_price_refresh(product_ids=[instance.product_id])
+
+
+@receiver(post_save, sender=FacilityInventory)
+@receiver(post_delete, sender=FacilityInventory)
+@receiver(post_save, sender=ProductVariantPrices)
+@receiver(post_delete, sender=ProductVariantPrices)
+def invalidate_effective_price_for_price_row(sender, instance, **kwargs):
+    from cms.utils.effective_price import invalidate_effective_prices
+    invalidate_effective_prices(variant_ids=[instance.product_variant_id if sender is FacilityInventory else instance.variant_id])
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def invalidate_effective_price_for_variant(sender, instance, **kwargs):
+    from cms.utils.effective_price import invalidate_effective_prices
+    invalidate_effective_prices(variant_ids=[instance.id])
+
+
+CHANGE_FEED_ENTITIES = {Product: 'product', ProductVariant: 'variant', FacilityInventory: 'inventory'}
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_save, sender=FacilityInventory)
+def record_catalog_save(sender, instance, created, raw=False, **kwargs):
+    from cms.utils.change_feed import record_change
+    if not raw:
+        record_change(CHANGE_FEED_ENTITIES[sender], 'created' if created else 'updated', instance)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_delete, sender=FacilityInventory)
+def record_catalog_delete(sender, instance, **kwargs):
+    from cms.utils.change_feed import record_change
+    record_change(CHANGE_FEED_ENTITIES[sender], 'deleted', instance)
+
+
+@receiver(m2m_changed, sender=Cluster.facilities.through)
+def refresh_cluster_price_for_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    from cms.utils.cluster_pricing import schedule_cluster_price_refresh
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if action == 'post_clear':
+        # The removed facilities are gone from the relation already
+        schedule_cluster_price_refresh()
+    elif reverse:
+        schedule_cluster_price_refresh(facility_ids=[instance.pk])
+    else:
+        schedule_cluster_price_refresh(facility_ids=list(pk_set))
+
+
 class FacilityCategorys(BaseModel):
     facility = models.ForeignKey(Facility, on_delete=models.CASCADE, related_name='facility_categorys')
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='facility_main_categories', null=True, blank=True)
@@ -0,0 +1,60 @@
+from django.db import models
+
+from .models import TenantModel
+
+
+class CatalogJob(TenantModel):
+    """
+    Background catalog job (validation passes, bulk repricing, facility clones).
+    Progress counters are updated as the job runs so clients can poll status.
+    """
+    EAN_VALIDATION = 'ean_validation'
+    PRICE_OVERRIDE = 'price_override'
+    FACILITY_CLONE = 'facility_clone'
+    JOB_TYPES = [
+        (EAN_VALIDATION, 'EAN/RAN Validation'),
+        (PRICE_OVERRIDE, 'Price Override'),
+        (FACILITY_CLONE, 'Facility Clone'),
+    ]
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    STATUSES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (COMPLETED, 'Completed'),
+        (FAILED, 'Failed'),
+    ]
+
+    job_type = models.CharField(max_length=50, choices=JOB_TYPES)
+    status = models.CharField(max_length=20, choices=STATUSES, default=PENDING)
+    source = models.CharField(max_length=100, blank=True, null=True, help_text='Endpoint or command that queued the job')
+    params = models.JSONField(default=dict, blank=True)
+    total_count = models.PositiveIntegerField(default=0)
+    processed_count = models.PositiveIntegerField(default=0)
+    success_count = models.PositiveIntegerField(default=0)
+    failure_count = models.PositiveIntegerField(default=0)
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True, null=True)
+    run_after = models.DateTimeField(blank=True, null=True, help_text='Not started before this time (retries with backoff)')
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'catalog_jobs'
+        ordering = ['-creation_date']
+        indexes = [
+            models.Index(fields=['job_type', 'status']),
+            models.Index(fields=['status', 'creation_date']),
+        ]
+
+    @property
+    def progress(self):
+        if not self.total_count:
+            return 100.0 if self.status == self.COMPLETED else 0.0
+        return round(self.processed_count * 100.0 / self.total_count, 1)
+
+    def __str__(self):
+        return f"{self.get_job_type_display()} #{self.id} ({self.status})"
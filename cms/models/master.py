@@ -19,4 +19,29 @@ class Tax(BaseModel):
     class Meta:
         db_table = 'taxes'
         verbose_name = "Tax"
-        verbose_name_plural = "Taxes"
\ No newline at end of file
+        verbose_name_plural = "Taxes"
+
+class GtinMetadata(BaseModel):
+    """
+    Cached GS1 lookup result for a GTIN/EAN, shared by every validation path.
+    Not-found codes are cached too (found=False) with a shorter expiry.
+    """
+    gtin         = models.CharField(max_length=20, unique=True)  # Normalized digits, no leading zeros
+    found        = models.BooleanField(default=False)
+    is_published = models.BooleanField(default=False)
+    hsn_code     = models.TextField(blank=True, null=True)
+    tax_rate     = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    cgst         = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    sgst         = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    igst         = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    cess         = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    payload      = models.JSONField(blank=True, null=True)  # Raw GS1 item as returned by the API
+    expires_at   = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.gtin} ({'found' if self.found else 'not found'})"
+
+    class Meta:
+        db_table = 'gtin_metadata'
+        verbose_name = "GTIN Metadata"
+        verbose_name_plural = "GTIN Metadata"
@@ -6,6 +6,9 @@ from django.core.validators import MinValueValidator
 from .models import TenantModel, BaseModel
 from .category import Category, Brand
 from .setting import CustomField, AttributeValue, SizeMeasurement
+from cms.utils.sku import (
+    allocate_product_sku, name_variant_sku, reserve_sequence_values, taken_variant_skus, variant_sku, VARIANT_SKU_SEQUENCE,
+)
 
 def product_image_upload_path(instance, filename):
     """Generate upload path for product thumbnail images"""
@@ -40,14 +43,15 @@ class Product(TenantModel):
     def save(self, *args, **kwargs):
         # Automatically generate SKU if it's not provided
         if not self.sku:
-            prefix = 'ROZ'
-            # Get the last product ID and add 1
-            last_product = Product.objects.order_by('id').last()
-            next_id = (last_product.id + 1) if last_product else 1
-            self.sku = f'{prefix}{next_id:02d}'
+            self.sku = allocate_product_sku()
 
+        is_new = self._state.adding
         super(Product, self).save(*args, **kwargs)
 
+        # Product fields are part of every variant's import fingerprint
+        if not is_new:
+            ProductVariant.objects.filter(product=self, content_hash__isnull=False).update(content_hash=None)
+
     def __str__(self):
         return self.name
 
@@ -245,6 +249,10 @@ class ProductVariant(BaseModel):
     is_visible = models.PositiveIntegerField(default=0, help_text='0: Offline, 1: Online, 2: Both')
     is_published = models.BooleanField(default=False)
     is_rejected = models.BooleanField(default=False)
+    rejection_reason = models.TextField(blank=True, null=True)
+
+    # Fingerprint of the last imported row, see cms.utils.fingerprint
+    content_hash = models.CharField(max_length=64, blank=True, null=True)
 
     class Meta:
         db_table = 'variants'
@@ -255,8 +263,15 @@ class ProductVariant(BaseModel):
             models.Index(fields=['ean_number']),
             models.Index(fields=['is_published', 'is_active']),
         ]
+        constraints = [
+            # Variant SKUs are the merge key for catalog imports (ON CONFLICT (sku))
+            models.UniqueConstraint(fields=['sku'], condition=models.Q(sku__gt=''), name='variants_sku_unique'),
+        ]
 
-    def save(self, *args, **kwargs):
+    def fill_generated_fields(self):
+        """Derive the fields save() fills in; bulk_create callers run this themselves"""
+        # Any edit outside the bulk import makes the stored fingerprint stale
+        self.content_hash = None
 
         # Automatically calculate margin if selling_price and base_price are available
         if self.selling_price is not None and self.base_price is not None:
@@ -265,22 +280,13 @@ class ProductVariant(BaseModel):
         # Automatically generate SKU if it's not provided
         if not self.sku and self.product:
             # Use product SKU as base, generate if product doesn't have one
-            if not self.product.sku:
-                # Generate product SKU using the same logic as Product model
-                last_product = Product.objects.order_by('id').last()
-                next_id = (last_product.id + 1) if last_product else 1
-                product_sku = f'ROZ{next_id:02d}'
-            else:
-                product_sku = self.product.sku
-
-            # Add variant name if available, otherwise use a counter
-            if self.name:
-                variant_suffix = slugify(self.name).upper()
-            else:
-                variant_count = ProductVariant.objects.filter(product=self.product).count() + 1
-                variant_suffix = f'V{variant_count:02d}'
+            product_sku = self.product.sku or allocate_product_sku()
 
-            self.sku = f'{product_sku}-{variant_suffix}'
+            # Add variant name if it gives a free SKU, otherwise a sequence number
+            sku = name_variant_sku(product_sku, self.name)
+            if sku is None or taken_variant_skus([sku], exclude_id=self.pk):
+                sku = variant_sku(product_sku, number=reserve_sequence_values(VARIANT_SKU_SEQUENCE, 1)[0])
+            self.sku = sku
 
         # Generate slug
         if not self.slug:
@@ -305,6 +311,8 @@ class ProductVariant(BaseModel):
             # Combine all parts into one slug
             self.slug = '-'.join(slug_parts)
 
+    def save(self, *args, **kwargs):
+        self.fill_generated_fields()
         super(ProductVariant, self).save(*args, **kwargs)
 
 
@@ -576,27 +584,99 @@ class Collection(BaseModel):
         return self.name
 
 
+class PriceChangeBatch(BaseModel):
+    """
+    One repricing operation (an override, a cluster update). Holds the
+    metadata shared by all of its ProductPriceHistory rows, so the rows only
+    carry ids and old/new prices.
+    """
+    user = models.ForeignKey('user.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='price_change_batches')
+    cluster = models.ForeignKey('cms.Cluster', on_delete=models.SET_NULL, related_name='price_change_batches', null=True, blank=True)
+    percentage_change = models.FloatField(blank=True, null=True)
+    change_type = models.CharField(max_length=50)
+    change_reason = models.TextField(blank=True, null=True)
+    source = models.CharField(max_length=100, blank=True, null=True, help_text='Endpoint or job that made the change')
+    row_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'price_change_batches'
+        ordering = ['-creation_date']
+        indexes = [
+            models.Index(fields=['cluster', 'creation_date']),
+            models.Index(fields=['change_type', 'creation_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.change_type} #{self.id} ({self.row_count} rows)"
+
+
+class ScheduledPriceChange(TenantModel):
+    """
+    A margin override prepared ahead of time and applied at ``effective_at``
+    by ``manage.py apply_scheduled_price_changes``. Targets are stored like
+    OverridePriceView's request and resolved when the change is applied.
+    """
+    SCHEDULED = 'scheduled'
+    APPLIED = 'applied'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    STATUSES = [
+        (SCHEDULED, 'Scheduled'),
+        (APPLIED, 'Applied'),
+        (FAILED, 'Failed'),
+        (CANCELLED, 'Cancelled'),
+    ]
+
+    cluster_ids = models.JSONField(default=list, blank=True)
+    facility_ids = models.JSONField(default=list, blank=True)
+    variant_ids = models.JSONField(default=list, blank=True, help_text='Empty means every matching variant')
+    category_ids = models.JSONField(default=list, blank=True)
+    brand_ids = models.JSONField(default=list, blank=True)
+    product_name = models.CharField(max_length=255, blank=True, default='')
+    variant_name = models.CharField(max_length=255, blank=True, default='')
+    margin = models.FloatField()
+    write_history = models.BooleanField(default=True)
+    effective_at = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=STATUSES, default=SCHEDULED)
+    applied_at = models.DateTimeField(blank=True, null=True)
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'scheduled_price_changes'
+        ordering = ['effective_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'effective_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.margin}% at {self.effective_at:%Y-%m-%d %H:%M} ({self.status})"
+
+
 class ProductPriceHistory(BaseModel):
     """
     Model to track price changes for products in specific clusters.
     Maintains audit trail of price modifications with user and reason.
+    Rows written as part of a PriceChangeBatch leave user, percentage,
+    type and reason empty; the ``effective_*`` properties resolve them.
     """
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='price_history')
     product_variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name='price_history')
     cluster = models.ForeignKey('cms.Cluster', on_delete=models.CASCADE, related_name='price_history', null=True, blank=True)
     facility = models.ForeignKey('cms.Facility', on_delete=models.CASCADE, related_name='price_history')
     user = models.ForeignKey('user.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='price_changes')
+    batch = models.ForeignKey(PriceChangeBatch, on_delete=models.CASCADE, related_name='rows', null=True, blank=True)
     
     # Price information
     old_price = models.FloatField()
     new_price = models.FloatField()
     old_csp = models.FloatField()
     new_csp = models.FloatField()
-    percentage_change = models.FloatField()
+    percentage_change = models.FloatField(blank=True, null=True)
     
     # Additional metadata
     change_reason = models.TextField(blank=True, null=True)
-    change_type = models.CharField(max_length=50, default='percentage_update')  # percentage_update, manual_update, etc.
+    change_type = models.CharField(max_length=50, default='percentage_update', blank=True, null=True)  # percentage_update, manual_update, etc.
     
     class Meta:
         db_table = 'product_price_history'
@@ -622,6 +702,65 @@ class ProductPriceHistory(BaseModel):
         """Calculate the absolute CSP difference"""
         return self.new_csp - self.old_csp
 
+    def _shared(self, field):
+        value = getattr(self, field)
+        if value is None and self.batch_id:
+            return getattr(self.batch, field)
+        return value
+
+    @property
+    def effective_user(self):
+        return self._shared('user')
+
+    @property
+    def effective_percentage_change(self):
+        return self._shared('percentage_change')
+
+    @property
+    def effective_change_type(self):
+        return self._shared('change_type')
+
+    @property
+    def effective_change_reason(self):
+        return self._shared('change_reason')
+
+
+class ProductPriceHistoryDaily(BaseModel):
+    """
+    Daily rollup of ProductPriceHistory per variant, facility and change type.
+    Monthly history partitions are rolled up here before they are detached
+    by the retention policy (see cms.utils.price_history).
+    """
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_price_history')
+    product_variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name='daily_price_history')
+    cluster = models.ForeignKey('cms.Cluster', on_delete=models.CASCADE, related_name='daily_price_history', null=True, blank=True)
+    facility = models.ForeignKey('cms.Facility', on_delete=models.CASCADE, related_name='daily_price_history')
+    change_type = models.CharField(max_length=50)
+
+    change_count = models.PositiveIntegerField(default=0)
+    first_old_price = models.FloatField()
+    last_new_price = models.FloatField()
+    first_old_csp = models.FloatField()
+    last_new_csp = models.FloatField()
+    min_new_price = models.FloatField()
+    max_new_price = models.FloatField()
+    avg_percentage_change = models.FloatField()
+
+    class Meta:
+        db_table = 'product_price_history_daily'
+        ordering = ['-day']
+        verbose_name = 'Product Price History (Daily)'
+        verbose_name_plural = 'Product Price History (Daily)'
+        unique_together = ('day', 'product_variant', 'facility', 'change_type')
+        indexes = [
+            models.Index(fields=['product', 'day']),
+            models.Index(fields=['facility', 'day']),
+        ]
+
+    def __str__(self):
+        return f"{self.product_variant_id} @ {self.facility_id} on {self.day} ({self.change_count} changes)"
+
 
 class ProductSizeChartValue(BaseModel):
     """
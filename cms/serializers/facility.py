@@ -5,6 +5,8 @@ from cms.models.facility import Cluster, Facility, FacilityInventory
 from cms.models.product import Product, ProductVariant
 from cms.models.product_image import ProductImage
 from cms.models.category import Category, Brand
+from cms.utils.catalog_assignment import SELECTORS
+from cms.utils.facility_clone import PARTS as FACILITY_CLONE_PARTS
 
 
 class ClusterFacilitySerializer(serializers.ModelSerializer):
@@ -103,15 +105,20 @@ class ProductVariantViewSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'slug', 'sku', 'description', 'tags', 'base_price', 'mrp', 'selling_price', 'stock', 'cust_discount',
             'tax', 'max_purchase_limit', 'outofstock_threshold', 'ean_number', 'ran_number', 'hsn_code',
-            'weight', 'net_qty', 'packaging_type', 'is_active', 'is_online', 'is_offline', 'in_app', 'status', 'is_combo', 'combo_details'
+            'weight', 'net_qty', 'packaging_type', 'is_active', 'status', 'is_combo', 'combo_details'
         ]
 
     def _get_facility_inventory(self, obj):
-        """Fetch inventory data for the variant specific to the facility"""
-        facility_ids = self.context.get("facility_scope", [])
-        if not facility_ids:
-            return None
-        return obj.facility_inventories.filter(facility_id__in=facility_ids).first()
+        """
+        Inventory row of the variant in the facility scope. FacilityProductViewSet
+        prefetches it as ``scoped_inventories``; otherwise it is read once per variant.
+        """
+        if not hasattr(obj, 'scoped_inventories'):
+            facility_ids = self.context.get("facility_scope", [])
+            obj.scoped_inventories = list(
+                obj.facility_inventories.filter(facility_id__in=facility_ids).order_by('id')[:1]
+            ) if facility_ids else []
+        return obj.scoped_inventories[0] if obj.scoped_inventories else None
     
     def get_base_price(self, obj):
         inv = self._get_facility_inventory(obj)
@@ -135,7 +142,7 @@ class ProductVariantViewSerializer(serializers.ModelSerializer):
 
     def get_tax(self, obj):
         inv = self._get_facility_inventory(obj)
-        return inv.tax if inv else None
+        return inv.tax_id if inv else None
 
     def get_max_purchase_limit(self, obj):
         inv = self._get_facility_inventory(obj)
@@ -154,8 +161,33 @@ class ProductVariantViewSerializer(serializers.ModelSerializer):
         return inv.is_active if inv else None
 
     def get_combo_details(self, obj):
-        """Get combo details if this variant is a combo product"""
-        return obj.combo_details
+        """
+        Combo details of a combo variant, as ProductVariant.combo_details. Built
+        from the combo and its ``active_items`` when FacilityProductViewSet
+        prefetched them; otherwise read once per variant.
+        """
+        if not obj.is_combo:
+            return None
+        combo = getattr(obj, 'combo_product', None)
+        if combo is None:
+            return None
+        if not hasattr(combo, 'active_items'):
+            return obj.combo_details
+        items = [{
+            'id': item.id,
+            'variant_id': item.product_variant.id,
+            'variant_name': item.product_variant.name,
+            'variant_sku': item.product_variant.sku,
+            'product_name': item.product_variant.product.name,
+            'quantity': item.quantity
+        } for item in combo.active_items]
+        return {
+            'combo_id': combo.id,
+            'combo_name': combo.name,
+            'combo_description': combo.description,
+            'items': items,
+            'items_count': len(items)
+        }
 
 
 class ProductListSerializer(serializers.ModelSerializer):
@@ -191,3 +223,44 @@ class FacilityInventoryItemSerializer(serializers.ModelSerializer):
             "max_purchase_limit", "outofstock_threshold",
             "status", "is_active", "tax_id",
         ]
+
+
+class InventoryAssignmentSerializer(serializers.Serializer):
+    """Facilities plus at least one variant selector, see cms.utils.catalog_assignment"""
+    facility_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    variant_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    product_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    category_id = serializers.IntegerField(required=False)
+    brand_id = serializers.IntegerField(required=False)
+    collection_id = serializers.IntegerField(required=False)
+    include_inactive = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if not any(selector in attrs for selector in SELECTORS):
+            raise serializers.ValidationError(
+                "Provide at least one selector: variant_ids, product_ids, category_id, brand_id or collection_id"
+            )
+        return attrs
+
+
+class FacilityCloneSerializer(serializers.Serializer):
+    """Targets and options of a facility clone, see cms.utils.facility_clone"""
+    target_facility_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    parts = serializers.ListField(
+        child=serializers.ChoiceField(choices=FACILITY_CLONE_PARTS), required=False, default=list(FACILITY_CLONE_PARTS)
+    )
+    margin = serializers.FloatField(required=False, allow_null=True, default=None, help_text="Selling price adjustment in percent")
+    copy_stock = serializers.BooleanField(default=False)
+    run_async = serializers.BooleanField(default=True)
+
+
+class StockDeltaSerializer(serializers.Serializer):
+    facility_id = serializers.IntegerField()
+    product_variant_id = serializers.IntegerField()
+    delta = serializers.IntegerField()
+
+
+class StockDeltaBatchSerializer(serializers.Serializer):
+    """A batch of stock movements, see cms.utils.stock_deltas"""
+    events = StockDeltaSerializer(many=True, allow_empty=False)
+    source = serializers.CharField(max_length=100, required=False, allow_null=True, default=None)
@@ -0,0 +1,16 @@
+from rest_framework import serializers
+from cms.models.job import CatalogJob
+
+
+class CatalogJobSerializer(serializers.ModelSerializer):
+    progress = serializers.FloatField(read_only=True)
+    created_by = serializers.CharField(source='created_by.username', read_only=True, default=None)
+
+    class Meta:
+        model = CatalogJob
+        fields = [
+            'id', 'job_type', 'status', 'source', 'total_count', 'processed_count',
+            'success_count', 'failure_count', 'progress', 'result', 'error',
+            'run_after', 'started_at', 'finished_at', 'created_by', 'creation_date', 'updation_date'
+        ]
+        read_only_fields = fields
@@ -1,10 +1,15 @@
 from rest_framework import serializers
-from cms.models.product import Product, ProductOption, ProductVariant, ProductVariantImage, Collection, ProductLinkVariant, ProductPriceHistory, ProductVariantCustomField, ProductSizeChartValue, ComboProduct, ComboProductItem  
+from django.db import transaction
+from django.db.models import Q
+from cms.models.product import Product, ProductOption, ProductVariant, ProductVariantImage, Collection, ProductLinkVariant, ProductPriceHistory, PriceChangeBatch, ScheduledPriceChange, ProductVariantCustomField, ProductSizeChartValue, ComboProduct, ComboProductItem  
 from cms.models.product_image import ProductImage
 from cms.models.category import Category, Brand
 from cms.models.facility import Facility, Cluster, FacilityInventory
 from cms.models.setting import CustomField, SizeChart, SizeMeasurement, AttributeValue
-import requests
+from cms.utils.cluster_pricing import cluster_pricing_context
+from cms.utils.change_feed import record_changes
+from cms.utils.effective_price import price_key, resolve_prices
+from cms.utils.sku import assign_skus
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -817,185 +822,162 @@ class SmartBrandProductSerializer(serializers.ModelSerializer):
                 return None
 
     def create(self, validated_data):
-        variants_data = validated_data.pop('variants', [])
-        validated_data.pop('id', None)
-
-        import os
-        GS1_API_URL = os.environ.get("GS1_API_URL", "https://api.gs1datakart.org/console/retailer/products")
-        GS1_API_TOKEN = os.environ.get("GS1_API_TOKEN", "")
-
-        failed_products = []
-        product = None
-        try:
-            product = Product.objects.create(**validated_data)
-        except Exception as e:
-            failed_products.append({
-                'data': validated_data,
-                'error': str(e)
-            })
-
-        ean_rejected_products = []
-        created_variants = []
-        failed_variants = []
-        has_ean_validation_failures = False
-
-        if product:
-            for var in variants_data:
-                var.pop('id', None)
-
-                # Handle attributes mapping for color, size, etc.
-                attributes = {}
-                if 'color' in var:
-                    attributes['color'] = var.pop('color')
-                if 'size' in var:
-                    attributes['size'] = var.pop('size')
-
-                # Handle attributes array format and convert to dict
-                existing_attrs = var.get('attributes', {})
-                if isinstance(existing_attrs, list):
-                    # Convert array format to dict format
-                    converted_attrs = {}
-                    for attr in existing_attrs:
-                        if isinstance(attr, dict) and 'attribute_id' in attr and 'value' in attr:
-                            # You might want to get the attribute name from the ID
-                            # For now, just use the value as key
-                            converted_attrs[f"attr_{attr['attribute_id']}"] = attr['value']
-                    var['attributes'] = converted_attrs
-                elif isinstance(existing_attrs, dict):
-                    # Already in dict format, merge with color/size if any
-                    existing_attrs.update(attributes)
-                    var['attributes'] = existing_attrs
-                else:
-                    var['attributes'] = attributes
-
-                # Handle images - remove as it's not a direct field
-                var.pop('images', None)
-                
-                # Handle size chart data - capture before removing
-                size_chart_values = var.pop('size_chart_values', None)
-                var.pop('size_chart_data', None)
-                print(f"DEBUG: Captured size_chart_values for variant: {size_chart_values}")
-                
-                # Handle empty strings for numeric fields - convert to None
-                if var.get('ean_number') == '' or var.get('ean_number') is None:
-                    var['ean_number'] = None
-                if var.get('ran_number') == '' or var.get('ran_number') is None:
-                    var['ran_number'] = None
-
+        return self.create_many([validated_data])[0]
+
+    def _prepare_variant_data(self, var):
+        """Normalize one variant payload in place; returns its size chart values"""
+        var.pop('id', None)
+
+        # Handle attributes mapping for color, size, etc.
+        attributes = {}
+        if 'color' in var:
+            attributes['color'] = var.pop('color')
+        if 'size' in var:
+            attributes['size'] = var.pop('size')
+
+        # Handle attributes array format and convert to dict
+        existing_attrs = var.get('attributes', {})
+        if isinstance(existing_attrs, list):
+            # Convert array format to dict format
+            converted_attrs = {}
+            for attr in existing_attrs:
+                if isinstance(attr, dict) and 'attribute_id' in attr and 'value' in attr:
+                    # You might want to get the attribute name from the ID
+                    # For now, just use the value as key
+                    converted_attrs[f"attr_{attr['attribute_id']}"] = attr['value']
+            var['attributes'] = converted_attrs
+        elif isinstance(existing_attrs, dict):
+            # Already in dict format, merge with color/size if any
+            existing_attrs.update(attributes)
+            var['attributes'] = existing_attrs
+        else:
+            var['attributes'] = attributes
+
+        # Handle images - remove as it's not a direct field
+        var.pop('images', None)
+
+        # Handle size chart data - capture before removing
+        size_chart_values = var.pop('size_chart_values', None)
+        var.pop('size_chart_data', None)
+
+        # Handle empty strings for numeric fields - convert to None
+        if var.get('ean_number') == '' or var.get('ean_number') is None:
+            var['ean_number'] = None
+        if var.get('ran_number') == '' or var.get('ran_number') is None:
+            var['ran_number'] = None
+        return size_chart_values
+
+    def create_many(self, items, user=None):
+        """
+        Create products from a list of validated_data dicts the way create()
+        would, returning one result dict per item. SKUs for the whole batch
+        are reserved with a single assign_skus() call and the rows are
+        written with one bulk_create per model.
+        """
+        results, variants_data = [], []
+        for validated_data in items:
+            validated_data = dict(validated_data)
+            variants_data.append(validated_data.pop('variants', []))
+            validated_data.pop('id', None)
+            result = {
+                'product': None,
+                'variants': [],
+                'ean_rejected_products': [],
+                'failed_products': [],
+                'failed_variants': [],
+                'validation_variant_ids': [],
+            }
+            try:
+                result['product'] = Product(created_by=user, updated_by=user, **validated_data)
+            except Exception as e:
+                result['failed_products'].append({
+                    'data': validated_data,
+                    'error': str(e)
+                })
+            results.append(result)
+
+        size_charts = {}
+        for result, product_variants in zip(results, variants_data):
+            for var in product_variants:
+                size_charts[id(var)] = self._prepare_variant_data(var)
+
+        # One lookup for every EAN/RAN in the batch; numbers of variants created
+        # earlier in the batch count as taken too, as they did row by row
+        batch = [var for result, product_variants in zip(results, variants_data) if result['product']
+                 for var in product_variants]
+        eans = {var['ean_number'] for var in batch if var['ean_number']}
+        rans = {var['ran_number'] for var in batch if var['ran_number'] and not var['ean_number']}
+        taken_eans, taken_rans = set(), set()
+        if eans or rans:
+            for ean, ran in ProductVariant.objects.filter(
+                Q(ean_number__in=eans) | Q(ran_number__in=rans)
+            ).values_list('ean_number', 'ran_number'):
+                taken_eans.add(ean)
+                taken_rans.add(ran)
+
+        new_variants = []
+        for result, product_variants in zip(results, variants_data):
+            product = result['product']
+            if not product:
+                continue
+            for var in product_variants:
                 ean_number = var.get('ean_number')
                 ran_number = var.get('ran_number')
 
                 # Determine which number to validate (prioritize EAN over RAN)
                 validation_number = ean_number if ean_number else ran_number
+                if ean_number and ean_number in taken_eans:
+                    var['is_rejected'] = True
+                    var['rejection_reason'] = f'EAN {ean_number} already exists in another product'
+                    result['ean_rejected_products'].append(var)
+                    validation_number = None
+                if ran_number and not ean_number and ran_number in taken_rans:
+                    var['is_rejected'] = True
+                    var['rejection_reason'] = f'RAN {ran_number} already exists in another product'
+                    result['ean_rejected_products'].append(var)
+                    validation_number = None
 
-                if validation_number:
-                    # Check if EAN/RAN already exists in database
-                    if ean_number:
-                        existing_variant = ProductVariant.objects.filter(ean_number=ean_number).first()
-                        if existing_variant:
-                            print(f"EAN {ean_number} already exists in product variant: {existing_variant.name} (ID: {existing_variant.id})")
-                            var['is_rejected'] = True
-                            var['rejection_reason'] = f'EAN {ean_number} already exists in another product'
-                            ean_rejected_products.append(var)
-                            has_ean_validation_failures = True
-                            # Skip GS1 validation if duplicate found
-                            validation_number = None
-
-                    if ran_number and not ean_number:
-                        existing_variant = ProductVariant.objects.filter(ran_number=ran_number).first()
-                        if existing_variant:
-                            print(f"RAN {ran_number} already exists in product variant: {existing_variant.name} (ID: {existing_variant.id})")
-                            var['is_rejected'] = True
-                            var['rejection_reason'] = f'RAN {ran_number} already exists in another product'
-                            ean_rejected_products.append(var)
-                            has_ean_validation_failures = True
-                            # Skip GS1 validation if duplicate found
-                            validation_number = None
-
-                    # Validate with GS1 API if not duplicate
-                    if validation_number:
-                        try:
-                            import json
-                            gtin_param = json.dumps([validation_number])
-                            response = requests.get(
-                                GS1_API_URL,
-                                params={'gtin': gtin_param, 'status': 'published'},
-                                headers={'Authorization': f'Bearer {GS1_API_TOKEN}'}
-                            )
-                            data = response.json()
-                            number_type = 'EAN' if ean_number else 'RAN'
-                            print(f'RESPONSE FROM GS1 for {number_type} {validation_number}:', data)
-
-                            if data.get('status') and data.get('items'):
-                                item = data['items'][0]
-                                var['hsn_code'] = item.get('hs_code')
-
-                                # Map tax breakdown fields from GS1 response
-                                cgst_value = float(item.get('cgst', 0)) if item.get('cgst') else 0.0
-                                sgst_value = float(item.get('sgst', 0)) if item.get('sgst') else 0.0
-                                igst_value = float(item.get('igst', 0)) if item.get('igst') else 0.0
-
-                                var['cgst'] = cgst_value
-                                var['sgst'] = sgst_value
-                                var['igst'] = igst_value
-                                var['cess'] = 0.0  # Default as GS1 doesn't provide cess
-
-                                # Calculate total tax (IGST for inter-state, CGST+SGST for intra-state)
-                                total_tax = igst_value if igst_value > 0 else (cgst_value + sgst_value)
-                                var['tax'] = total_tax
-
-                                var['is_rejected'] = False
-                                var['is_active'] = False
-                            else:
-                                var['is_rejected'] = True
-                                var['rejection_reason'] = f'{number_type} {validation_number} not found in GS1 database'
-                                ean_rejected_products.append(var)
-                                has_ean_validation_failures = True
-                        except Exception as e:
-                            number_type = 'EAN' if ean_number else 'RAN'
-                            print(f"GS1 API error for {number_type} {validation_number}: {e}")
-                            var['is_rejected'] = True
-                            var['rejection_reason'] = f'GS1 API validation failed for {number_type} {validation_number}'
-                            ean_rejected_products.append(var)
-                            has_ean_validation_failures = True
                 try:
-                    print(f"Creating variant with data: {var}")
-                    created_variant = ProductVariant.objects.create(product=product, **var)
-                    created_variants.append(created_variant)
-                    print(f"Successfully created variant: {created_variant.name} (ID: {created_variant.id})")
-                    
-                    # Handle size chart values if they were provided
-                    if size_chart_values:
-                        print(f"Size chart values found for variant {created_variant.name}: {size_chart_values}")
-                        from cms.views.product import handle_product_size_chart
-                        try:
-                            handle_product_size_chart(created_variant, {'size_chart_values': size_chart_values})
-                            print(f"Successfully processed size chart values for variant: {created_variant.name}")
-                        except Exception as e:
-                            print(f"Error processing size chart values for variant {created_variant.name}: {str(e)}")
-                    else:
-                        print(f"No size chart values found for variant: {created_variant.name}")
-                    
+                    variant = ProductVariant(product=product, **var)
                 except Exception as e:
                     print(f"Failed to create variant: {str(e)}")
-                    print(f"Variant data: {var}")
-                    failed_variants.append({
+                    result['failed_variants'].append({
                         'data': var,
                         'error': str(e)
                     })
+                    continue
+                taken_eans.add(ean_number)
+                taken_rans.add(ran_number)
+                result['variants'].append(variant)
+                new_variants.append((result, variant, validation_number, size_charts[id(var)]))
 
             # Set product as inactive if any EAN validation failed
-            if has_ean_validation_failures:
+            if result['ean_rejected_products']:
                 product.is_active = False
-                product.save()
-                print(f"Product '{product.name}' set to inactive due to EAN validation failures")
-
-        return {
-            'product': product,
-            'ean_rejected_products': ean_rejected_products,
-            'failed_products': failed_products,
-            'failed_variants': failed_variants
-        }
+
+        products = [result['product'] for result in results if result['product']]
+        variants = [variant for _, variant, _, _ in new_variants]
+        with transaction.atomic():
+            assign_skus(products=products, variants=variants)
+            Product.objects.bulk_create(products)
+            for variant in variants:
+                variant.fill_generated_fields()
+            ProductVariant.objects.bulk_create(variants, batch_size=1000)
+            record_changes('product', 'created', [product.id for product in products])
+            record_changes('variant', 'created', [variant.id for variant in variants])
+
+        for result, variant, validation_number, size_chart_values in new_variants:
+            if validation_number:
+                # GS1 validation runs in the background after commit
+                result['validation_variant_ids'].append(variant.id)
+            # Handle size chart values if they were provided
+            if size_chart_values:
+                from cms.views.product import handle_product_size_chart
+                try:
+                    handle_product_size_chart(variant, {'size_chart_values': size_chart_values})
+                except Exception as e:
+                    print(f"Error processing size chart values for variant {variant.name}: {str(e)}")
+        return results
 
 
 class ProductExportSerializer(serializers.ModelSerializer):
@@ -1172,56 +1154,32 @@ class ProductWithClusterPricingSerializer(serializers.ModelSerializer):
     
     def get_base_price(self, obj):
         """Get the base price from the first active variant"""
-        first_variant = obj.variants.filter(is_active=True).first()
-        if first_variant:
-            return first_variant.base_price
+        # Iterate the prefetched variants instead of querying per product
+        for variant in obj.variants.all():
+            if variant.is_active:
+                return variant.base_price
         return None
     
     def get_clusters(self, obj):
-        """Get cluster pricing information for this product"""
-        # Get all clusters
-        all_clusters = Cluster.objects.filter(is_active=True)
+        """
+        Get cluster pricing information for this product from the precomputed
+        product_cluster_prices summary. The list view passes the page's prices
+        in the context; a standalone serializer loads them for this product.
+        """
+        context = self.context
+        if 'cluster_prices' not in context:
+            context = cluster_pricing_context([obj.id])
+
         cluster_data = []
-        
-        # Get all variants for this product
-        product_variants = obj.variants.filter(is_active=True)
-        
-        for cluster in all_clusters:
-            # Get facilities in this cluster (include inactive facilities too)
-            cluster_facilities = cluster.facilities.all()
-            
-            # Check if any variant of this product has inventory in this cluster
-            facility_inventories = FacilityInventory.objects.filter(
-                facility__in=cluster_facilities,
-                product_variant__in=product_variants,
-                is_active=True
-            )
-            
-            if facility_inventories.exists():
-                # Get the first inventory record for pricing
-                inventory = facility_inventories.first()
-                # Use variant base_price for base_price, inventory selling_price for selling_price
-                variant_base_price = inventory.product_variant.base_price if inventory.product_variant else None
-                actual_selling_price = inventory.selling_price if inventory.selling_price and inventory.selling_price > 0 else variant_base_price
-                
-                cluster_info = {
-                    'cluster_id': cluster.id,
-                    'cluster_name': cluster.name,
-                    'region': cluster.region,
-                    'base_price': variant_base_price,  # Always use variant's base_price
-                    'selling_price': actual_selling_price  # Use inventory's selling_price
-                }
-            else:
-                # No pricing available for this product in this cluster
-                cluster_info = {
-                    'cluster_id': cluster.id,
-                    'cluster_name': cluster.name,
-                    'region': cluster.region,
-                    'base_price': None,
-                    'selling_price': None
-                }
-            
-            cluster_data.append(cluster_info)
+        for cluster in context['active_clusters']:
+            base_price, selling_price = context['cluster_prices'].get((obj.id, cluster['id']), (None, None))
+            cluster_data.append({
+                'cluster_id': cluster['id'],
+                'cluster_name': cluster['name'],
+                'region': cluster['region'],
+                'base_price': base_price,  # Always use variant's base_price
+                'selling_price': selling_price  # Effective price of the cluster's inventory
+            })
         
         return cluster_data
 
@@ -1267,6 +1225,11 @@ class ProductWithFacilityPricingSerializer(serializers.ModelSerializer):
             if facility_id not in inventory_lookup:
                 inventory_lookup[facility_id] = []
             inventory_lookup[facility_id].append(inventory)
+
+        # Effective price of the inventory shown per facility, one lookup for the product
+        effective_prices = resolve_prices(
+            (facility_id, inventories[0].product_variant_id) for facility_id, inventories in inventory_lookup.items()
+        )
         
         facilities_data = []
         for facility in all_facilities:
@@ -1290,9 +1253,9 @@ class ProductWithFacilityPricingSerializer(serializers.ModelSerializer):
                 inventory = inventories[0]
                 variant = inventory.product_variant
                 
-                # Use variant base_price for base_price, inventory selling_price for selling_price
+                # Use variant base_price for base_price, the effective price for selling_price
                 variant_base_price = variant.base_price if variant else None
-                actual_selling_price = inventory.selling_price if inventory.selling_price and inventory.selling_price > 0 else variant_base_price
+                actual_selling_price = effective_prices[price_key(facility.id, inventory.product_variant_id)].selling_price
                 
                 facility_data = {
                     'facility_id': facility.id,
@@ -1300,7 +1263,7 @@ class ProductWithFacilityPricingSerializer(serializers.ModelSerializer):
                     'is_active': facility.is_active,
                     'city': facility.city,
                     'base_price': variant_base_price,  # Always show variant's base_price
-                    'selling_price': actual_selling_price  # Show inventory's selling_price
+                    'selling_price': actual_selling_price  # Effective price (cms.utils.effective_price)
                 }
             else:
                 # Product is NOT available in this facility - return null values
@@ -1351,19 +1314,23 @@ class ClusterPriceUpdateSerializer(serializers.Serializer):
 
 # Serializer for price history
 class ProductPriceHistorySerializer(serializers.ModelSerializer):
-    """Serializer for product price history"""
+    """Serializer for product price history; batched rows report their batch's metadata"""
     product_name = serializers.CharField(source='product.name', read_only=True)
     variant_name = serializers.CharField(source='product_variant.name', read_only=True)
     cluster_name = serializers.CharField(source='cluster.name', read_only=True)
     facility_name = serializers.CharField(source='facility.name', read_only=True)
+    user = serializers.SerializerMethodField()
     user_name = serializers.SerializerMethodField()
+    percentage_change = serializers.FloatField(source='effective_percentage_change', read_only=True)
+    change_type = serializers.CharField(source='effective_change_type', read_only=True)
+    change_reason = serializers.CharField(source='effective_change_reason', read_only=True)
     base_price_difference = serializers.ReadOnlyField()
     selling_price_difference = serializers.ReadOnlyField()
     
     class Meta:
         model = ProductPriceHistory
         fields = [
-            'id', 'product', 'product_name', 'product_variant', 'variant_name',
+            'id', 'batch', 'product', 'product_name', 'product_variant', 'variant_name',
             'cluster', 'cluster_name', 'facility', 'facility_name', 'user', 'user_name',
             'old_price', 'new_price', 'old_csp', 'new_csp', 'percentage_change',
             'base_price_difference', 'selling_price_difference', 'change_type', 'change_reason',
@@ -1371,8 +1338,47 @@ class ProductPriceHistorySerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'creation_date', 'updation_date']
     
+    def get_user(self, obj):
+        user = obj.effective_user
+        return user.id if user else None
+
     def get_user_name(self, obj):
         """Get user name or return 'System' if no user"""
+        user = obj.effective_user
+        if user:
+            return f"{user.first_name} {user.last_name}" if user.first_name else user.username
+        return "System"
+
+
+class ScheduledPriceChangeSerializer(serializers.ModelSerializer):
+    """Scheduled override; created through OverridePriceView with effective_at"""
+    created_by = serializers.CharField(source='created_by.username', read_only=True, default=None)
+
+    class Meta:
+        model = ScheduledPriceChange
+        fields = [
+            'id', 'cluster_ids', 'facility_ids', 'variant_ids', 'category_ids', 'brand_ids',
+            'product_name', 'variant_name', 'margin', 'write_history', 'effective_at',
+            'status', 'applied_at', 'result', 'error', 'created_by', 'creation_date', 'updation_date'
+        ]
+        read_only_fields = fields
+
+
+class PriceChangeBatchSerializer(serializers.ModelSerializer):
+    """Batch-level summary of one repricing"""
+    cluster_name = serializers.CharField(source='cluster.name', read_only=True)
+    user_name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PriceChangeBatch
+        fields = [
+            'id', 'change_type', 'change_reason', 'percentage_change', 'source',
+            'cluster', 'cluster_name', 'user', 'user_name', 'row_count',
+            'creation_date', 'updation_date'
+        ]
+        read_only_fields = fields
+
+    def get_user_name(self, obj):
         if obj.user:
             return f"{obj.user.first_name} {obj.user.last_name}" if obj.user.first_name else obj.user.username
         return "System"
\ No newline at end of file
@@ -1,3 +1,117 @@
-from django.test import TestCase
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse, parse_qs
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from cms.utils.gs1_client import GS1Client, GS1NotConfigured, is_valid_gtin
+
+
+class StubGS1Handler(BaseHTTPRequestHandler):
+    """Answers like the GS1 products API; GTINs ending in 0 are 'published'"""
+
+    def do_GET(self):
+        server = self.server
+        gtins = json.loads(parse_qs(urlparse(self.path).query)['gtin'][0])
+        with server.lock:
+            server.calls.append(gtins)
+            failure = server.failures.pop(0) if server.failures else None
+
+        if failure:
+            self.send_response(failure)
+            self.end_headers()
+            return
+
+        items = [
+            {'gtin': gtin, 'hs_code': '19053100', 'cgst': 9, 'sgst': 9, 'igst': 18, 'cess': 0, 'tax_rate': 18}
+            for gtin in gtins if gtin.endswith('0')
+        ]
+        body = json.dumps({'status': bool(items), 'items': items}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def gtin_with_check_digit(body):
+    """Append the GS1 mod-10 check digit to a 12-digit body"""
+    total = sum(int(d) * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(body)))
+    return body + str((10 - total % 10) % 10)
+
+
+class GS1ClientTests(SimpleTestCase):
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), StubGS1Handler)
+        self.server.calls = []
+        self.server.failures = []
+        self.server.lock = threading.Lock()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}/products'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def gs1_client(self, **kwargs):
+        options = dict(url=self.url, token='test-token', timeout=2, backoff=0.01)
+        options.update(kwargs)
+        return GS1Client(**options)
+
+    def test_check_digit(self):
+        self.assertTrue(is_valid_gtin('4006381333931'))
+        self.assertTrue(is_valid_gtin(4006381333931))
+        self.assertTrue(is_valid_gtin('96385074'))  # EAN-8
+        self.assertFalse(is_valid_gtin('4006381333932'))
+        self.assertFalse(is_valid_gtin('abc'))
+        self.assertFalse(is_valid_gtin(None))
+
+    def test_invalid_gtins_never_reach_the_network(self):
+        items, failed = self.gs1_client().fetch_items(['4006381333932', 'not-a-gtin'])
+        self.assertEqual((items, failed), ({}, set()))
+        self.assertEqual(self.server.calls, [])
+
+    def test_chunks_requests(self):
+        gtins = [gtin_with_check_digit(f'890000000{i:03d}') for i in range(25)]
+        items, failed = self.gs1_client(chunk_size=10, max_workers=3).fetch_items(gtins)
+
+        self.assertEqual(sorted(len(call) for call in self.server.calls), [5, 10, 10])
+        self.assertEqual(failed, set())
+        self.assertEqual(set(items), {gtin for gtin in gtins if gtin.endswith('0')})
+        self.assertEqual(next(iter(items.values()))['hs_code'], '19053100')
+
+    def test_retries_transient_failures(self):
+        self.server.failures = [503, 502]
+        gtin = gtin_with_check_digit('890000000010')
+        items, failed = self.gs1_client(max_retries=3).fetch_items([gtin])
+
+        self.assertEqual(len(self.server.calls), 3)
+        self.assertEqual(failed, set())
+
+    def test_reports_failed_chunks_after_retries(self):
+        self.server.failures = [500] * 10
+        gtin = gtin_with_check_digit('890000000010')
+        items, failed = self.gs1_client(max_retries=1).fetch_items([gtin])
+
+        self.assertEqual(items, {})
+        self.assertEqual(failed, {gtin})
+        self.assertEqual(len(self.server.calls), 2)
+
+    def test_circuit_breaker_short_circuits(self):
+        self.server.failures = [500] * 10
+        client = self.gs1_client(max_retries=0, breaker_threshold=2, breaker_cooldown=60)
+        gtin = gtin_with_check_digit('890000000010')
+        client.fetch_items([gtin])
+        client.fetch_items([gtin])
+        self.assertTrue(client.breaker.is_open)
+
+        items, failed = client.fetch_items([gtin])
+        self.assertEqual(failed, {gtin})
+        self.assertEqual(len(self.server.calls), 2)
+
+    def test_requires_token(self):
+        with self.assertRaises(GS1NotConfigured):
+            self.gs1_client(token='').fetch_items(['4006381333931'])
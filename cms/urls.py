@@ -5,13 +5,13 @@ from .views.category import CategoryViewSet, BrandViewSet, BrandExportView, Cate
 from .views.product import (
     ProductViewSet, CollectionViewSet, ProductVariantViewSet,
     ProductStatusUpdateView, BulkCreateProductsView, BulkUpdateProductsView, ProductExportView,
-    ProductPricingViewSet, ProductClusterPriceUpdateView,
-    ProductPriceHistoryViewSet,
+    ProductPricingViewSet, ProductPriceGridView, ProductClusterPriceUpdateView, CatalogChangeFeedView,
+    ProductPriceHistoryViewSet, PriceChangeBatchViewSet,
     # BulkPriceUpdateView,
-    OverridePriceView,
+    OverridePriceView, ScheduledPriceChangeViewSet,
     ClusterPriceUpdateStatusView, SmartBrandBulkCreateProductsView,
     CategoryRequiredFieldsView, GS1APIView, CollectionExportView,
-    ComboProductViewSet
+    ComboProductViewSet, CatalogStagingIngestView
 )
 from .views.upload import UploadImagesView
 from .views.setting import (
@@ -19,6 +19,7 @@ from .views.setting import (
     CustomTabViewSet, CustomSectionViewSet, CustomFieldViewSet
 )
 from .views.search import GlobalSearchView
+from .views.job import CatalogJobViewSet
 router = DefaultRouter()
 router.register(r'clusters', ClusterViewSet)
 router.register(r'facilities', FacilityViewSet)
@@ -34,6 +35,8 @@ router.register(r'variants', ProductVariantViewSet, basename='variants')
 router.register(r'combo-products', ComboProductViewSet, basename='combo-products')
 router.register(r'products-pricing', ProductPricingViewSet, basename='products-pricing')
 router.register(r'product-price-history', ProductPriceHistoryViewSet, basename='product-price-history')
+router.register(r'price-change-batches', PriceChangeBatchViewSet, basename='price-change-batches')
+router.register(r'scheduled-price-changes', ScheduledPriceChangeViewSet, basename='scheduled-price-changes')
 router.register(r'attributes', AttributeViewSet, basename='attributes')
 router.register(r'attribute-values', AttributeValueViewSet, basename='attribute-values')
 router.register(r'product-types', ProductTypeViewSet, basename='product-types')
@@ -42,12 +45,15 @@ router.register(r'size-measurements', SizeMeasurementViewSet, basename='size-mea
 router.register(r'custom-tabs', CustomTabViewSet, basename='custom-tabs')
 router.register(r'custom-sections', CustomSectionViewSet, basename='custom-sections')
 router.register(r'custom-fields', CustomFieldViewSet, basename='custom-fields')
+router.register(r'jobs', CatalogJobViewSet, basename='jobs')
 
 urlpatterns = [
     path('products/bulk-create/', BulkCreateProductsView.as_view(), name='bulk-create-products'),
     path('products/bulk-update/', BulkUpdateProductsView.as_view(), name='bulk-update-products'),
     path('products/smart-brand-bulk-create/', SmartBrandBulkCreateProductsView.as_view(), name='smart-brand-bulk-create-products'),
+    path('products/staging-ingest/', CatalogStagingIngestView.as_view(), name='catalog-staging-ingest'),
     path('products/export/', ProductExportView.as_view(), name='product-export'),
+    path('products-pricing/grid/', ProductPriceGridView.as_view(), name='products-pricing-grid'),
     path('products/<int:product_id>/cluster-pricing/', ProductClusterPriceUpdateView.as_view(), name='product-cluster-pricing-update'),
     # path('bulk-price-update/', BulkPriceUpdateView.as_view(), name='bulk-price-update'),
     path('clusters/price-update-status/', ClusterPriceUpdateStatusView.as_view(), name='cluster-price-update-status'),
@@ -58,6 +64,7 @@ urlpatterns = [
     path('collections/export/', CollectionExportView.as_view(), name='collection-export'),
     path('clusters/export/', ClusterExportView.as_view(), name='cluster-export'),
     path('override-price/', OverridePriceView.as_view(), name='override-price'),
+    path('changes/', CatalogChangeFeedView.as_view(), name='catalog-changes'),
 
     path('facilities/export/', FacilityExportView.as_view(), name='facility-export'),
     path('', include(router.urls)),
@@ -0,0 +1,94 @@
+"""
+Set-based assignment of variants to facilities.
+
+``assign_variants`` creates the missing inventory rows for every facility of
+a set times every variant a selector picks, with one ``INSERT ... SELECT ...
+ON CONFLICT DO NOTHING``. Selectors combine with AND:
+
+- ``variant_ids``: explicit variants,
+- ``product_ids``: every variant of the products,
+- ``category_id``: products in the category or any of its descendants
+  (one recursive CTE over ``categories.parent_id``),
+- ``brand_id``: products of the brand,
+- ``collection_id``: products in the collection.
+
+New rows start with no stock and take their prices from the variant columns,
+with ``cust_discount`` derived as FacilityInventory.save() derives it. Pairs
+that already have a row are left untouched.
+"""
+from django.db import connection, transaction
+
+from cms.models.product import Collection
+from cms.utils.change_feed import record_changes
+from cms.utils.cluster_pricing import schedule_cluster_price_refresh
+from cms.utils.effective_price import invalidate_effective_prices
+
+
+SELECTORS = ('variant_ids', 'product_ids', 'category_id', 'brand_id', 'collection_id')
+
+
+def assign_variants(facility_ids, variant_ids=None, product_ids=None, category_id=None, brand_id=None,
+                    collection_id=None, active_only=True):
+    """
+    Create the missing (facility, variant) inventory rows; returns
+    ``(inventory_id, variant_id)`` of the rows created. ``active_only`` skips
+    inactive variants and products.
+    """
+    facility_ids = sorted({int(facility_id) for facility_id in facility_ids})
+    if not facility_ids:
+        return []
+
+    ctes, conditions, params = [], [], []
+    if category_id is not None:
+        ctes.append("""
+            subtree AS (
+                SELECT id FROM categories WHERE id = %s
+                UNION
+                SELECT c.id FROM categories c JOIN subtree s ON c.parent_id = s.id
+            )
+        """)
+        params.append(category_id)
+        conditions.append("p.category_id IN (SELECT id FROM subtree)")
+    params.append(facility_ids)
+    if variant_ids is not None:
+        conditions.append("v.id = ANY(%s)")
+        params.append(list(variant_ids))
+    if product_ids is not None:
+        conditions.append("v.product_id = ANY(%s)")
+        params.append(list(product_ids))
+    if brand_id is not None:
+        conditions.append("p.brand_id = %s")
+        params.append(brand_id)
+    if collection_id is not None:
+        conditions.append(
+            f"p.id IN (SELECT product_id FROM {Collection.products.through._meta.db_table} WHERE collection_id = %s)"
+        )
+        params.append(collection_id)
+    if active_only:
+        conditions.append("v.is_active AND p.is_active")
+
+    with_sql = f"WITH RECURSIVE {', '.join(ctes)}" if ctes else ""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"""
+            {with_sql}
+            INSERT INTO facility_inventories (
+                facility_id, product_variant_id, stock, base_price, mrp, selling_price, cust_discount,
+                status, is_active, creation_date, updation_date
+            )
+            SELECT f.id, v.id, 0, COALESCE(v.base_price, 0), COALESCE(v.mrp, 0), COALESCE(v.selling_price, 0),
+                   trunc(COALESCE(v.mrp, 0) - COALESCE(v.selling_price, 0)), 'Active', TRUE, now(), now()
+            FROM unnest(%s::integer[]) AS f(id)
+            CROSS JOIN variants v
+            JOIN products p ON p.id = v.product_id
+            WHERE {' AND '.join(conditions) or 'TRUE'}
+            ON CONFLICT (facility_id, product_variant_id) DO NOTHING
+            RETURNING id, product_variant_id
+        """, params)
+        created = cursor.fetchall()
+
+        if created:
+            variant_ids = {variant_id for _, variant_id in created}
+            record_changes('inventory', 'created', [inventory_id for inventory_id, _ in created])
+            invalidate_effective_prices(variant_ids=variant_ids)
+            schedule_cluster_price_refresh(variant_ids=list(variant_ids))
+    return created
@@ -0,0 +1,355 @@
+"""
+COPY-based catalog ingest.
+
+Large partner catalogs are streamed into an UNLOGGED staging table with
+``COPY FROM STDIN`` and then merged into ``products`` / ``variants`` with
+set-based ``INSERT ... ON CONFLICT (sku)`` statements, so a load of a few
+hundred thousand variants is a handful of SQL statements instead of one ORM
+round trip per row. The merges append their change feed events in the same
+statements.
+"""
+import csv
+import io
+import uuid
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from cms.models.product import Product, ProductVariant
+from cms.utils.change_feed import EVENT_COLUMNS, payload_sql, returning_fields
+from cms.utils.ean_validation import queue_ean_validation
+from cms.utils.effective_price import invalidate_effective_prices
+from cms.utils.sku import PRODUCT_SKU_PREFIX, PRODUCT_SKU_SEQUENCE
+
+
+# Columns accepted in the normalized CSV, in staging-table order.
+# Everything is staged as text and cast during the merge so that one bad
+# value rejects its row instead of aborting the whole COPY. Rows without a
+# product_sku are treated as new products and numbered from the SKU sequence.
+STAGING_COLUMNS = [
+    'product_sku', 'product_name', 'category', 'brand', 'description',
+    'variant_sku', 'variant_name', 'base_price', 'mrp', 'selling_price', 'psp',
+    'ean_number', 'ran_number', 'hsn_code', 'weight', 'net_qty', 'uom',
+    'packaging_type', 'shelf_life',
+]
+REQUIRED_COLUMNS = ['product_name', 'category', 'variant_name']
+
+NUMERIC_COLUMNS = ['base_price', 'mrp', 'selling_price', 'psp']
+# Column -> largest value its cast target holds (18 digits always fit a bigint)
+INTEGER_COLUMNS = {'ean_number': None, 'ran_number': None, 'shelf_life': 2147483647}
+# Staged text column -> model field whose max_length bounds it
+LENGTH_LIMITED_COLUMNS = {
+    'product_sku': (Product, 'sku'),
+    'product_name': (Product, 'name'),
+    'variant_sku': (ProductVariant, 'sku'),
+    'variant_name': (ProductVariant, 'name'),
+    'weight': (ProductVariant, 'weight'),
+    'net_qty': (ProductVariant, 'net_qty'),
+    'uom': (ProductVariant, 'uom'),
+    'packaging_type': (ProductVariant, 'packaging_type'),
+}
+
+# Integer part capped so every accepted value casts to double precision
+NUMERIC_PATTERN = r'^\s*-?[0-9]{1,15}(\.[0-9]+)?\s*$'
+INTEGER_PATTERN = r'^\s*[0-9]{1,18}\s*$'
+
+REJECTED_SAMPLE_SIZE = 100
+
+# slugify() equivalent used for variant SKUs and slugs generated in SQL
+SLUG_SQL = "btrim(regexp_replace(lower(coalesce({0}, '')), '[^a-z0-9]+', '-', 'g'), '-')"
+
+
+def _model_defaults(model, exclude):
+    """
+    Return (columns, params) for every concrete column of ``model`` that the
+    merge doesn't set explicitly, using the model field defaults. Django
+    defaults live in Python, not in the database, so a raw INSERT has to
+    supply them itself.
+    """
+    columns, params = [], []
+    for field in model._meta.concrete_fields:
+        if field.primary_key or field.column in exclude:
+            continue
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            continue
+        columns.append(field.column)
+        params.append(field.get_db_prep_save(field.get_default(), connection))
+    return columns, params
+
+
+def _read_header(stream):
+    """Read and validate the CSV header, returning the staging column list"""
+    header_line = stream.readline()
+    if not header_line:
+        raise ValueError("The file is empty.")
+
+    header = [column.strip().lower() for column in next(csv.reader([header_line]))]
+    unknown = [column for column in header if column not in STAGING_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}. Allowed columns: {', '.join(STAGING_COLUMNS)}")
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+    if len(set(header)) != len(header):
+        raise ValueError("Duplicate column names in header.")
+    return header
+
+
+def ingest_catalog_csv(file_obj, user=None, run_validation_async=True):
+    """
+    Stream a normalized catalog CSV into staging and merge it into the catalog.
+
+    ``file_obj`` may be a text or binary file object (e.g. an uploaded file).
+    Returns a report dict with staged, rejected, inserted and updated counts,
+    plus the id of the EAN/RAN validation job queued for new or changed codes.
+    Raises ValueError when the header is invalid.
+    """
+    file_obj = getattr(file_obj, 'file', file_obj)
+    if isinstance(file_obj.read(0), bytes):
+        file_obj = io.TextIOWrapper(file_obj, encoding='utf-8-sig', newline='')
+
+    header = _read_header(file_obj)
+    staging_table = f"catalog_staging_{uuid.uuid4().hex[:12]}"
+    user_id = getattr(user, 'pk', None)
+    started_at = timezone.now()
+
+    with connection.cursor() as cursor:
+        column_ddl = ', '.join(f'{column} text' for column in STAGING_COLUMNS)
+        cursor.execute(
+            f"CREATE UNLOGGED TABLE {staging_table} (line_no bigserial, {column_ddl})"
+        )
+        try:
+            # psycopg2 cursor: stream the rest of the file straight into staging
+            cursor.cursor.copy_expert(
+                f"COPY {staging_table} ({', '.join(header)}) FROM STDIN WITH (FORMAT csv)",
+                file_obj,
+            )
+            cursor.execute(f"ANALYZE {staging_table}")
+
+            with transaction.atomic():
+                report = _merge_staging(cursor, staging_table, user_id)
+                if report['variants_updated']:
+                    # Prices of any merged variant may have changed
+                    invalidate_effective_prices()
+                validation_job = queue_ean_validation(
+                    report.pop('validation_variant_ids'), user=user,
+                    source='products/staging-ingest', run_async=run_validation_async,
+                )
+        finally:
+            cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+
+    report['validation_job_id'] = validation_job.id if validation_job else None
+    report['duration_seconds'] = round((timezone.now() - started_at).total_seconds(), 2)
+    return report
+
+
+def _merge_staging(cursor, staging_table, user_id):
+    """Validate staged rows and merge them into products and variants"""
+    # Normalize blanks and fill variant SKUs the same way ProductVariant.save() does
+    set_blanks = ', '.join(f"{column} = NULLIF(btrim({column}), '')" for column in STAGING_COLUMNS)
+    cursor.execute(f"UPDATE {staging_table} SET {set_blanks}")
+    # Rows without a product SKU get one per product name, reserved from the SKU sequence
+    cursor.execute(f"""
+        WITH allocated AS (
+            SELECT product_name, nextval(%s) AS number
+            FROM (SELECT DISTINCT product_name FROM {staging_table}
+                  WHERE product_sku IS NULL AND product_name IS NOT NULL) names
+        )
+        UPDATE {staging_table} s
+        SET product_sku = %s || CASE WHEN a.number < 10 THEN '0' ELSE '' END || a.number
+        FROM allocated a
+        WHERE s.product_sku IS NULL AND s.product_name = a.product_name
+    """, [PRODUCT_SKU_SEQUENCE, PRODUCT_SKU_PREFIX])
+    cursor.execute(
+        f"UPDATE {staging_table} SET variant_sku = product_sku || '-' || upper({SLUG_SQL.format('variant_name')}) "
+        f"WHERE variant_sku IS NULL AND product_sku IS NOT NULL"
+    )
+
+    cursor.execute(f"SELECT count(*) FROM {staging_table}")
+    staged_rows = cursor.fetchone()[0]
+
+    # Name lookups: category/brand names are not unique, the oldest row wins
+    lookups = f"""
+        CREATE TEMP TABLE {staging_table}_categories ON COMMIT DROP AS
+            SELECT DISTINCT ON (lower(name)) lower(name) AS key, id
+            FROM categories ORDER BY lower(name), id;
+        CREATE TEMP TABLE {staging_table}_brands ON COMMIT DROP AS
+            SELECT DISTINCT ON (lower(name)) lower(name) AS key, id
+            FROM brands ORDER BY lower(name), id;
+    """
+    cursor.execute(lookups)
+
+    checks = [
+        ("product_name IS NULL", "Missing product_name"),
+        ("variant_name IS NULL", "Missing variant_name"),
+        ("c.id IS NULL", "Unknown category"),
+        ("s.brand IS NOT NULL AND b.id IS NULL", "Unknown brand"),
+    ]
+    checks += [
+        (f"s.{column} !~ '{NUMERIC_PATTERN}'", f"Invalid {column}") for column in NUMERIC_COLUMNS
+    ]
+    checks += [
+        (f"s.{column} !~ '{INTEGER_PATTERN}'", f"Invalid {column}") for column in INTEGER_COLUMNS
+    ]
+    checks += [
+        (f"s.{column}::numeric > {maximum}", f"{column} out of range")
+        for column, maximum in INTEGER_COLUMNS.items() if maximum is not None
+    ]
+    checks += [
+        (f"char_length(s.{column}) > {model._meta.get_field(field).max_length}",
+         f"{column} longer than {model._meta.get_field(field).max_length} characters")
+        for column, (model, field) in LENGTH_LIMITED_COLUMNS.items()
+    ]
+    # The merge never moves an existing variant to another product
+    checks.append(("ev.id IS NOT NULL AND ep.sku IS DISTINCT FROM s.product_sku", "variant_sku belongs to another product"))
+    reason_sql = 'CASE ' + ' '.join(f"WHEN {condition} THEN '{reason}'" for condition, reason in checks) + ' END'
+
+    cursor.execute(f"""
+        CREATE TEMP TABLE {staging_table}_rejected ON COMMIT DROP AS
+        SELECT * FROM (
+            SELECT s.line_no, s.product_sku, s.variant_sku, {reason_sql} AS reason
+            FROM {staging_table} s
+            LEFT JOIN {staging_table}_categories c ON c.key = lower(s.category)
+            LEFT JOIN {staging_table}_brands b ON b.key = lower(s.brand)
+            LEFT JOIN variants ev ON ev.sku = s.variant_sku AND ev.sku > ''
+            LEFT JOIN products ep ON ep.id = ev.product_id
+        ) r
+        WHERE r.reason IS NOT NULL
+    """)
+    cursor.execute(f"""
+        SELECT line_no + 1, product_sku, variant_sku, reason
+        FROM {staging_table}_rejected ORDER BY line_no LIMIT {REJECTED_SAMPLE_SIZE}
+    """)
+    rejected_sample = [
+        {'line': line, 'product_sku': product_sku, 'variant_sku': variant_sku, 'reason': reason}
+        for line, product_sku, variant_sku, reason in cursor.fetchall()
+    ]
+    cursor.execute(f"""
+        DELETE FROM {staging_table} s USING {staging_table}_rejected r WHERE r.line_no = s.line_no
+    """)
+    rejected_rows = cursor.rowcount
+
+    products = _merge_products(cursor, staging_table, user_id)
+    variants = _merge_variants(cursor, staging_table)
+
+    return {
+        'staged_rows': staged_rows,
+        'rejected_rows': rejected_rows,
+        'rejected': rejected_sample,
+        'products_created': products[0],
+        'products_updated': products[1],
+        'variants_created': variants[0],
+        'variants_updated': variants[1],
+        'validation_variant_ids': variants[2] or [],
+    }
+
+
+def _merge_products(cursor, staging_table, user_id):
+    explicit = [
+        'name', 'sku', 'description', 'category_id', 'brand_id',
+        'created_by_id', 'updated_by_id',
+    ]
+    default_columns, default_params = _model_defaults(Product, explicit)
+    default_values = ', '.join(['%s'] * len(default_columns))
+
+    cursor.execute(f"""
+        WITH merged AS (
+            INSERT INTO products ({', '.join(explicit + default_columns)}, creation_date, updation_date)
+            SELECT DISTINCT ON (s.product_sku)
+                s.product_name, s.product_sku, s.description, c.id, b.id, %s, %s,
+                {default_values}, now(), now()
+            FROM {staging_table} s
+            JOIN {staging_table}_categories c ON c.key = lower(s.category)
+            LEFT JOIN {staging_table}_brands b ON b.key = lower(s.brand)
+            ORDER BY s.product_sku, s.line_no DESC
+            ON CONFLICT (sku) DO UPDATE SET
+                name = EXCLUDED.name,
+                description = COALESCE(EXCLUDED.description, products.description),
+                category_id = EXCLUDED.category_id,
+                brand_id = COALESCE(EXCLUDED.brand_id, products.brand_id),
+                updated_by_id = COALESCE(EXCLUDED.updated_by_id, products.updated_by_id),
+                updation_date = now()
+            RETURNING products.id, {returning_fields('product', 'products')}, (xmax = 0) AS inserted
+        ),
+        events AS (
+            INSERT INTO catalog_change_events ({EVENT_COLUMNS})
+            SELECT txid_current(), 'product', m.id, CASE WHEN m.inserted THEN 'created' ELSE 'updated' END,
+                   m.id, NULL, NULL, {payload_sql('product', 'm')}, now()
+            FROM merged m
+        )
+        SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM merged
+    """, [user_id, user_id] + default_params)
+    return cursor.fetchone()
+
+
+def _merge_variants(cursor, staging_table):
+    explicit = [
+        'product_id', 'name', 'sku', 'slug', 'description',
+        'base_price', 'mrp', 'selling_price', 'psp', 'margin',
+        'ean_number', 'ran_number', 'hsn_code', 'weight', 'net_qty', 'uom',
+        'packaging_type', 'shelf_life',
+    ]
+    default_columns, default_params = _model_defaults(ProductVariant, explicit)
+    default_values = ', '.join(['%s'] * len(default_columns))
+
+    slug_sql = (
+        f"left({SLUG_SQL.format('p.name')} || '-' || {SLUG_SQL.format('s.variant_name')}"
+        f" || CASE WHEN s.weight IS NOT NULL THEN '-' || {SLUG_SQL.format('s.weight')} ELSE '' END, "
+        f"{ProductVariant._meta.get_field('slug').max_length})"
+    )
+    # Columns left blank in the file keep their current value on update
+    keep_existing = [
+        'description', 'base_price', 'mrp', 'selling_price', 'psp', 'ean_number',
+        'ran_number', 'hsn_code', 'weight', 'net_qty', 'uom', 'packaging_type', 'shelf_life',
+    ]
+    update_sql = ',\n'.join(
+        f"{column} = COALESCE(EXCLUDED.{column}, variants.{column})" for column in keep_existing
+    )
+
+    # All CTEs read the same snapshot, so ``previous`` holds the pre-merge EAN/RAN
+    cursor.execute(f"""
+        WITH previous AS (
+            SELECT v.id, v.ean_number, v.ran_number
+            FROM variants v
+            JOIN {staging_table} s ON s.variant_sku = v.sku
+        ),
+        merged AS (
+            INSERT INTO variants ({', '.join(explicit + default_columns)}, creation_date, updation_date)
+            SELECT DISTINCT ON (s.variant_sku)
+                p.id, s.variant_name, s.variant_sku, {slug_sql}, s.description,
+                s.base_price::double precision, s.mrp::double precision,
+                s.selling_price::double precision, s.psp::double precision,
+                s.selling_price::double precision - s.base_price::double precision,
+                s.ean_number::bigint, s.ran_number::bigint, s.hsn_code, s.weight, s.net_qty, s.uom,
+                s.packaging_type, s.shelf_life::integer,
+                {default_values}, now(), now()
+            FROM {staging_table} s
+            JOIN products p ON p.sku = s.product_sku
+            ORDER BY s.variant_sku, s.line_no DESC
+            ON CONFLICT (sku) WHERE sku > '' DO UPDATE SET
+                name = EXCLUDED.name,
+                {update_sql},
+                margin = COALESCE(EXCLUDED.selling_price, variants.selling_price)
+                         - COALESCE(EXCLUDED.base_price, variants.base_price),
+                content_hash = NULL,
+                updation_date = now()
+            RETURNING variants.id, variants.product_id, variants.ean_number, variants.ran_number,
+                      {returning_fields('variant', 'variants')}, (xmax = 0) AS inserted
+        ),
+        events AS (
+            INSERT INTO catalog_change_events ({EVENT_COLUMNS})
+            SELECT txid_current(), 'variant', m.id, CASE WHEN m.inserted THEN 'created' ELSE 'updated' END,
+                   m.product_id, m.id, NULL, {payload_sql('variant', 'm')}, now()
+            FROM merged m
+        )
+        SELECT
+            count(*) FILTER (WHERE m.inserted),
+            count(*) FILTER (WHERE NOT m.inserted),
+            array_agg(m.id) FILTER (
+                WHERE (m.ean_number IS NOT NULL OR m.ran_number IS NOT NULL)
+                AND (m.inserted OR (m.ean_number, m.ran_number) IS DISTINCT FROM (p.ean_number, p.ran_number))
+            )
+        FROM merged m
+        LEFT JOIN previous p ON p.id = m.id
+    """, default_params)
+    return cursor.fetchone()
@@ -0,0 +1,255 @@
+"""
+Catalog change feed (``catalog_change_events``).
+
+Product, variant, inventory and price writes append one compact event each.
+Downstream consumers poll ``/changes/?after=<seq>`` and sync incrementally
+instead of re-reading the catalog. A new consumer, or one whose cursor was
+pruned, takes the head with ``?after=latest`` before resyncing from the
+catalog and then follows the feed from there.
+
+Saves and deletes are captured by signals (see cms.models.facility). Bulk
+writes that bypass signals append their events set-based with the helpers
+below, in the same transaction as the write.
+
+Ids are handed out when a row is inserted, not when its transaction commits,
+so a reader could see event 11 before a slower transaction commits event 10.
+Every event therefore records its writer's ``txid_current()``, and ``seq``
+is assigned later by ``sequence_pending_events``. That only numbers events
+whose transaction is older than every running one. Numbering is serialized
+by an advisory lock, so ``seq`` only ever grows in commit-visible order and
+``after=<last seq>`` never skips an event.
+"""
+import datetime
+import os
+
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, Func
+from django.utils import timezone
+
+
+CHANGE_FEED_LOCK = (7303, 0)  # two-int advisory lock key, see cms.utils.price_override
+SEQUENCE_BATCH_SIZE = 10000
+CHANGE_FEED_PAGE_SIZE = 500
+CHANGE_FEED_MAX_PAGE_SIZE = 5000
+CATALOG_CHANGE_RETENTION_DAYS = int(os.environ.get("CATALOG_CHANGE_RETENTION_DAYS", 30))
+
+# Fields copied into each event's payload, per entity
+PAYLOAD_FIELDS = {
+    'product': ('name', 'sku', 'category_id', 'brand_id', 'is_active', 'is_published'),
+    'variant': ('name', 'sku', 'base_price', 'mrp', 'selling_price', 'is_active', 'is_published'),
+    'inventory': ('stock', 'base_price', 'mrp', 'selling_price', 'is_active'),
+}
+
+EVENT_COLUMNS = (
+    'txid, entity, entity_id, action, product_id, product_variant_id, facility_id, payload, creation_date'
+)
+
+
+class CurrentTxid(Func):
+    template = 'txid_current()'
+    output_field = BigIntegerField()
+
+
+def payload_sql(entity, alias):
+    """``json_build_object`` of the entity's payload fields read from ``alias``"""
+    pairs = ', '.join(f"'{field}', {alias}.{field}" for field in PAYLOAD_FIELDS[entity])
+    return f"json_build_object({pairs})"
+
+
+def returning_fields(entity, table):
+    """``RETURNING`` list of the entity's payload fields read from ``table``"""
+    return ', '.join(f"{table}.{field}" for field in PAYLOAD_FIELDS[entity])
+
+
+# Per entity: FROM clause, then the entity, product, variant and facility id columns
+ENTITY_SOURCES = {
+    'product': ("products p", "p", "p.id", "p.id", "NULL::integer", "NULL::integer"),
+    'variant': ("variants v", "v", "v.id", "v.product_id", "v.id", "NULL::integer"),
+    'inventory': (
+        "facility_inventories fi JOIN variants v ON v.id = fi.product_variant_id",
+        "fi", "fi.id", "v.product_id", "v.id", "fi.facility_id",
+    ),
+}
+
+
+def events_sql(entity, action, where_sql):
+    """
+    ``INSERT ... SELECT`` appending one ``entity`` event per row matching
+    ``where_sql`` (aliases as in ENTITY_SOURCES).
+    """
+    source, alias, entity_id, product_id, variant_id, facility_id = ENTITY_SOURCES[entity]
+    return f"""
+        INSERT INTO catalog_change_events ({EVENT_COLUMNS})
+        SELECT txid_current(), '{entity}', {entity_id}, '{action}', {product_id}, {variant_id}, {facility_id},
+               {payload_sql(entity, alias)}, now()
+        FROM {source}
+        WHERE {where_sql}
+    """
+
+
+def price_events_sql(old_price_sql, new_price_sql, where_sql):
+    """
+    ``INSERT ... SELECT`` appending a ``price`` event per ``facility_inventories
+    fi, variants v`` row matching ``where_sql``, read before the UPDATE.
+    """
+    return f"""
+        INSERT INTO catalog_change_events ({EVENT_COLUMNS})
+        SELECT txid_current(), 'price', fi.id, 'updated', v.product_id, v.id, fi.facility_id,
+               json_build_object('old_selling_price', {old_price_sql}, 'selling_price', {new_price_sql}), now()
+        FROM facility_inventories fi, variants v
+        WHERE {where_sql}
+    """
+
+
+def record_change(entity, action, instance):
+    """Append one event for a saved or deleted model instance"""
+    from cms.models.facility import CatalogChangeEvent
+    from cms.models.product import ProductVariant
+
+    if entity == 'product':
+        product_id, variant_id, facility_id = instance.id, None, None
+    elif entity == 'variant':
+        product_id, variant_id, facility_id = instance.product_id, instance.id, None
+    else:
+        variant_id, facility_id = instance.product_variant_id, instance.facility_id
+        product_id = ProductVariant.objects.filter(id=variant_id).values_list('product_id', flat=True).first()
+
+    CatalogChangeEvent.objects.create(
+        txid=CurrentTxid(),
+        entity=entity,
+        entity_id=instance.id,
+        action=action,
+        product_id=product_id,
+        product_variant_id=variant_id,
+        facility_id=facility_id,
+        payload={field: getattr(instance, field) for field in PAYLOAD_FIELDS[entity]},
+    )
+
+
+def record_changes(entity, action, ids):
+    """Append events for rows written in bulk (``bulk_create``, ``bulk_update``, ``update``), one statement"""
+    ids = [entity_id for entity_id in ids if entity_id is not None]
+    if not ids:
+        return 0
+    alias = ENTITY_SOURCES[entity][1]
+    with connection.cursor() as cursor:
+        cursor.execute(events_sql(entity, action, f"{alias}.id = ANY(%s)"), [ids])
+        return cursor.rowcount
+
+
+def record_inventory_changes(action, facility_ids, variant_ids):
+    """Append events for the inventories of the given (facility, variant) pairs, one statement"""
+    if not facility_ids:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(events_sql(
+            'inventory', action,
+            "(fi.facility_id, fi.product_variant_id) IN ("
+            "SELECT * FROM unnest(%s::integer[], %s::integer[]))",
+        ), [list(facility_ids), list(variant_ids)])
+        return cursor.rowcount
+
+
+def record_price_changes(rows):
+    """
+    Append ``price`` events for ``rows`` of ``(product_id, variant_id,
+    facility_id, old_price, new_price)``, one statement.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    product_ids, variant_ids, facility_ids, old_prices, new_prices = (list(column) for column in zip(*rows))
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO catalog_change_events ({EVENT_COLUMNS})
+            SELECT txid_current(), 'price', fi.id, 'updated', r.product_id, r.variant_id, r.facility_id,
+                   json_build_object('old_selling_price', r.old_price, 'selling_price', r.new_price), now()
+            FROM unnest(%s::integer[], %s::integer[], %s::integer[], %s::double precision[], %s::double precision[])
+                AS r(product_id, variant_id, facility_id, old_price, new_price)
+            JOIN facility_inventories fi ON fi.facility_id = r.facility_id AND fi.product_variant_id = r.variant_id
+        """, [product_ids, variant_ids, facility_ids, old_prices, new_prices])
+        return cursor.rowcount
+
+
+def sequence_pending_events():
+    """
+    Number the settled events that have no ``seq`` yet; returns how many.
+    Concurrent callers skip the work while another one holds the lock.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_xact_lock(%s, %s)", list(CHANGE_FEED_LOCK))
+        if not cursor.fetchone()[0]:
+            return 0
+        cursor.execute("""
+            WITH pending AS (
+                SELECT id, row_number() OVER (ORDER BY id) AS n
+                FROM (
+                    SELECT id FROM catalog_change_events
+                    WHERE seq IS NULL AND txid < txid_snapshot_xmin(txid_current_snapshot())
+                    ORDER BY id
+                    LIMIT %s
+                ) settled
+            )
+            UPDATE catalog_change_events e
+            SET seq = (SELECT COALESCE(max(seq), 0) FROM catalog_change_events) + pending.n
+            FROM pending
+            WHERE e.id = pending.id
+        """, [SEQUENCE_BATCH_SIZE])
+        return cursor.rowcount
+
+
+def events_after(after, limit, entities=None):
+    """
+    Up to ``limit`` sequenced events with ``seq > after``, compact dicts in
+    ``seq`` order, and whether more are waiting.
+    """
+    from cms.models.facility import CatalogChangeEvent
+
+    sequence_pending_events()
+    events = CatalogChangeEvent.objects.filter(seq__gt=after).order_by('seq')
+    if entities:
+        events = events.filter(entity__in=entities)
+    rows = list(events.values_list(
+        'seq', 'entity', 'entity_id', 'action', 'product_id', 'product_variant_id', 'facility_id',
+        'payload', 'creation_date',
+    )[:limit + 1])
+    return [
+        {
+            'seq': seq, 'entity': entity, 'id': entity_id, 'action': action,
+            'product_id': product_id, 'variant_id': variant_id, 'facility_id': facility_id,
+            'data': payload, 'at': creation_date.isoformat(),
+        }
+        for seq, entity, entity_id, action, product_id, variant_id, facility_id, payload, creation_date
+        in rows[:limit]
+    ], len(rows) > limit
+
+
+def oldest_retained_seq():
+    from cms.models.facility import CatalogChangeEvent
+
+    return CatalogChangeEvent.objects.filter(seq__isnull=False).order_by('seq').values_list('seq', flat=True).first()
+
+
+def latest_seq():
+    """Seq of the newest event (0 when there is none), after numbering the settled ones"""
+    from cms.models.facility import CatalogChangeEvent
+
+    sequence_pending_events()
+    return CatalogChangeEvent.objects.filter(seq__isnull=False).order_by('-seq').values_list('seq', flat=True).first() or 0
+
+
+def prune_events(retention_days=None):
+    """
+    Delete sequenced events older than the retention window; returns how many.
+    The latest event is always kept so numbering continues after it.
+    """
+    from cms.models.facility import CatalogChangeEvent
+
+    if retention_days is None:
+        retention_days = CATALOG_CHANGE_RETENTION_DAYS
+    latest = CatalogChangeEvent.objects.filter(seq__isnull=False).order_by('-seq').values_list('seq', flat=True).first()
+    if latest is None:
+        return 0
+    cutoff = timezone.now() - datetime.timedelta(days=retention_days)
+    deleted, _ = CatalogChangeEvent.objects.filter(seq__lt=latest, creation_date__lt=cutoff).delete()
+    return deleted
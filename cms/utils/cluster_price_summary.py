@@ -0,0 +1,182 @@
+"""
+Incrementally maintained cluster price-update status (``cluster_price_summaries``).
+
+Every PriceChangeBatch of a status-tracked change type bumps its cluster's
+summary row. The row gets the latest update, the row total, exact distinct
+product and variant counts, the margins used, and the recent updates.
+Distinct counts come from the ``cluster_price_summary_products`` and
+``cluster_price_summary_variants`` membership tables. Only rows inserted
+there with ``ON CONFLICT DO NOTHING`` add to the counters.
+
+A cluster without a summary yet is rebuilt from its full history once.
+"""
+import datetime
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+
+from cms.models.facility import ClusterPriceSummary
+from cms.models.product import Product, ProductPriceHistory
+
+
+# Change types reported by the cluster price-update status endpoint
+STATUS_CHANGE_TYPES = ['bulk_cluster_update', 'percentage_update']
+MAX_RECENT_UPDATES = 10
+
+
+def user_info(user):
+    if not user:
+        return {"id": None, "username": "System", "name": "System"}
+    return {
+        "id": user.id,
+        "username": user.username,
+        "name": f"{user.first_name} {user.last_name}".strip() if user.first_name else user.username,
+    }
+
+
+def _entry(history_id, batch_id, date, percentage_change, user, change_type, change_reason, product_names):
+    return {
+        "id": history_id,
+        "batch_id": batch_id,
+        "date": date.isoformat(),
+        "percentage_change": percentage_change,
+        "updated_by": user_info(user),
+        "change_type": change_type,
+        "change_reason": change_reason,
+        "products_affected": ", ".join(product_names) or "Unknown",
+    }
+
+
+def _add_members(cursor, cluster_id, where_sql, params):
+    """Record the cluster's repriced products/variants; returns (new products, new variants)"""
+    counts = []
+    for table, column in (
+        ('cluster_price_summary_products', 'product_id'),
+        ('cluster_price_summary_variants', 'product_variant_id'),
+    ):
+        cursor.execute(f"""
+            INSERT INTO {table} (cluster_id, {column}, creation_date, updation_date)
+            SELECT DISTINCT %s::integer, h.{column}, now(), now()
+            FROM product_price_history h
+            LEFT JOIN price_change_batches b ON b.id = h.batch_id
+            WHERE {where_sql}
+            ON CONFLICT DO NOTHING
+        """, [cluster_id, *params])
+        counts.append(cursor.rowcount)
+    return tuple(counts)
+
+
+def record_price_change_batch(batch, row_count):
+    """Fold ``row_count`` history rows just written for ``batch`` into its cluster's summary"""
+    if not batch.cluster_id or batch.change_type not in STATUS_CHANGE_TYPES or not row_count:
+        return
+
+    with transaction.atomic():
+        summary = ClusterPriceSummary.objects.select_for_update().filter(cluster_id=batch.cluster_id).first()
+        if summary is None:
+            rebuild_cluster_price_summary(batch.cluster_id)
+            return
+
+        batch_rows = ProductPriceHistory.objects.filter(
+            batch=batch, creation_date__gte=batch.creation_date - datetime.timedelta(days=1)
+        )
+        with connection.cursor() as cursor:
+            new_products, new_variants = _add_members(
+                cursor, batch.cluster_id,
+                "h.batch_id = %s AND h.creation_date >= %s",
+                [batch.id, batch.creation_date - datetime.timedelta(days=1)],
+            )
+        product_names = list(
+            Product.objects.filter(id__in=batch_rows.values('product_id')).values_list('name', flat=True)[:3]
+        )
+        last_row_id = batch_rows.order_by('-id').values_list('id', flat=True).first()
+
+        summary.last_batch = batch
+        summary.last_update_at = batch.creation_date
+        summary.last_percentage_change = batch.percentage_change
+        summary.last_change_type = batch.change_type
+        summary.last_change_reason = batch.change_reason
+        summary.last_user = batch.user
+        summary.total_updates += row_count
+        summary.unique_products += new_products
+        summary.unique_variants += new_variants
+        if batch.percentage_change not in summary.percentage_changes:
+            summary.percentage_changes = summary.percentage_changes + [batch.percentage_change]
+        summary.recent_updates = [_entry(
+            last_row_id, batch.id, batch.creation_date, batch.percentage_change, batch.user,
+            batch.change_type, batch.change_reason, product_names,
+        )] + summary.recent_updates[:MAX_RECENT_UPDATES - 1]
+        summary.save()
+
+
+def _cluster_history(cluster_id, **window):
+    return ProductPriceHistory.objects.filter(
+        Q(change_type__in=STATUS_CHANGE_TYPES) | Q(batch__change_type__in=STATUS_CHANGE_TYPES),
+        cluster_id=cluster_id,
+        **window
+    )
+
+
+def _history_fields(history):
+    """Summary fields other than the distinct counts, computed from ``history``"""
+    # Recent updates: one entry per batch, or per row for pre-batch history
+    recent, seen_batches = [], set()
+    rows = history.select_related('product', 'user', 'batch', 'batch__user').order_by('-creation_date', '-id')
+    for row in rows[:MAX_RECENT_UPDATES * 10]:
+        if row.batch_id in seen_batches:
+            continue
+        if row.batch_id:
+            seen_batches.add(row.batch_id)
+        recent.append((row, _entry(
+            row.id, row.batch_id, row.creation_date, row.effective_percentage_change, row.effective_user,
+            row.effective_change_type, row.effective_change_reason, [row.product.name],
+        )))
+        if len(recent) == MAX_RECENT_UPDATES:
+            break
+
+    last = recent[0][0] if recent else None
+    return {
+        'last_batch': last.batch if last else None,
+        'last_update_at': last.creation_date if last else None,
+        'last_percentage_change': last.effective_percentage_change if last else None,
+        'last_change_type': last.effective_change_type if last else None,
+        'last_change_reason': last.effective_change_reason if last else None,
+        'last_user': last.effective_user if last else None,
+        'total_updates': history.count(),
+        'percentage_changes': list(
+            history.order_by().values_list(
+                Coalesce('percentage_change', 'batch__percentage_change'), flat=True
+            ).distinct()
+        ),
+        'recent_updates': [entry for _, entry in recent],
+    }
+
+
+def rebuild_cluster_price_summary(cluster_id):
+    """Recompute a cluster's summary and membership from its full price history"""
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM cluster_price_summary_products WHERE cluster_id = %s", [cluster_id])
+            cursor.execute("DELETE FROM cluster_price_summary_variants WHERE cluster_id = %s", [cluster_id])
+            unique_products, unique_variants = _add_members(
+                cursor, cluster_id,
+                "h.cluster_id = %s AND COALESCE(h.change_type, b.change_type) = ANY(%s)",
+                [cluster_id, STATUS_CHANGE_TYPES],
+            )
+
+        fields = _history_fields(_cluster_history(cluster_id))
+        fields.update(unique_products=unique_products, unique_variants=unique_variants)
+        summary, _ = ClusterPriceSummary.objects.update_or_create(cluster_id=cluster_id, defaults=fields)
+    return summary
+
+
+def summarize_history_window(cluster_id, window):
+    """Unsaved summary of the cluster's history within ``window`` (creation_date filters)"""
+    history = _cluster_history(cluster_id, **window)
+    fields = _history_fields(history)
+    fields.update(
+        unique_products=history.values('product').distinct().count(),
+        unique_variants=history.values('product_variant').distinct().count(),
+    )
+    return ClusterPriceSummary(cluster_id=cluster_id, **fields)
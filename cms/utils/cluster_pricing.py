@@ -0,0 +1,98 @@
+"""
+Maintenance of the product x cluster price summary (``product_cluster_prices``).
+
+Each row holds the representative inventory of a product in a cluster, i.e.
+the lowest-id active inventory row of the product's active variants in any
+of the cluster's facilities. ``/products-pricing/?type=cluster`` reads the
+summary with one join instead of probing inventories per cluster.
+
+Saves and deletes refresh the affected products through signals (see
+cms.models.facility). Bulk writes that bypass signals call
+``schedule_cluster_price_refresh`` themselves. Either way the ids scheduled
+in one transaction are refreshed together, once, after it commits.
+``manage.py refresh_cluster_prices`` rebuilds the whole table.
+"""
+from django.db import connection, transaction
+
+from cms.utils.commit_batch import on_commit_batch
+
+
+def _scope(column, product_ids=None, variant_ids=None, facility_ids=None):
+    """SQL predicate on a product id ``column`` and its params; no scope means all products"""
+    if product_ids is not None:
+        return f"{column} = ANY(%s)", [list(product_ids)]
+    if variant_ids is not None:
+        return f"{column} IN (SELECT product_id FROM variants WHERE id = ANY(%s))", [list(variant_ids)]
+    if facility_ids is not None:
+        return (
+            f"{column} IN (SELECT sv.product_id FROM facility_inventories sfi"
+            " JOIN variants sv ON sv.id = sfi.product_variant_id WHERE sfi.facility_id = ANY(%s))",
+            [list(facility_ids)],
+        )
+    return "TRUE", []
+
+
+def refresh_cluster_prices(product_ids=None, variant_ids=None, facility_ids=None):
+    """Recompute the summary rows of the products in scope (all when no scope is given)"""
+    scope = dict(product_ids=product_ids, variant_ids=variant_ids, facility_ids=facility_ids)
+    with transaction.atomic(), connection.cursor() as cursor:
+        predicate, params = _scope('product_id', **scope)
+        cursor.execute(f"DELETE FROM product_cluster_prices WHERE {predicate}", params)
+
+        predicate, params = _scope('v.product_id', **scope)
+        cursor.execute(f"""
+            INSERT INTO product_cluster_prices (
+                product_id, cluster_id, product_variant_id, facility_inventory_id,
+                selling_price, creation_date, updation_date
+            )
+            SELECT DISTINCT ON (v.product_id, cf.cluster_id)
+                v.product_id, cf.cluster_id, v.id, fi.id, fi.selling_price, now(), now()
+            FROM variants v
+            JOIN facility_inventories fi ON fi.product_variant_id = v.id AND fi.is_active
+            JOIN clusters_facilities cf ON cf.facility_id = fi.facility_id
+            WHERE v.is_active AND {predicate}
+            ORDER BY v.product_id, cf.cluster_id, fi.id
+            ON CONFLICT (product_id, cluster_id) DO UPDATE SET
+                product_variant_id = EXCLUDED.product_variant_id,
+                facility_inventory_id = EXCLUDED.facility_inventory_id,
+                selling_price = EXCLUDED.selling_price,
+                updation_date = now()
+        """, params)
+        return cursor.rowcount
+
+
+def schedule_cluster_price_refresh(product_ids=None, variant_ids=None, facility_ids=None):
+    """Refresh once the current transaction commits (immediately outside one), batched per scope"""
+    if product_ids is not None:
+        on_commit_batch('cluster_prices:products', product_ids, lambda ids: refresh_cluster_prices(product_ids=ids))
+    elif variant_ids is not None:
+        on_commit_batch('cluster_prices:variants', variant_ids, lambda ids: refresh_cluster_prices(variant_ids=ids))
+    elif facility_ids is not None:
+        on_commit_batch('cluster_prices:facilities', facility_ids, lambda ids: refresh_cluster_prices(facility_ids=ids))
+    else:
+        on_commit_batch('cluster_prices:all', None, lambda _: refresh_cluster_prices())
+
+
+def cluster_pricing_context(product_ids):
+    """
+    Serializer context for ProductWithClusterPricingSerializer: the active
+    clusters and {(product_id, cluster_id): (base_price, selling_price)}.
+    The selling price is the effective price of the cluster's representative
+    inventory (cms.utils.effective_price).
+    """
+    from cms.models.facility import Cluster, ProductClusterPrice
+    from cms.utils.effective_price import price_key, resolve_prices
+
+    clusters = list(Cluster.objects.filter(is_active=True).order_by('id').values('id', 'name', 'region'))
+    rows = list(ProductClusterPrice.objects.filter(
+        product_id__in=product_ids, cluster__is_active=True
+    ).values_list(
+        'product_id', 'cluster_id', 'product_variant__base_price',
+        'facility_inventory__facility_id', 'product_variant_id',
+    ))
+    effective_prices = resolve_prices((facility_id, variant_id) for _, _, _, facility_id, variant_id in rows)
+    prices = {
+        (product_id, cluster_id): (base_price, effective_prices[price_key(facility_id, variant_id)].selling_price)
+        for product_id, cluster_id, base_price, facility_id, variant_id in rows
+    }
+    return {'active_clusters': clusters, 'cluster_prices': prices}
@@ -0,0 +1,54 @@
+"""
+Per-transaction batching of after-commit work.
+
+Signal receivers fire once per saved row, so a loop saving N rows would
+register N ``on_commit`` callbacks doing the same refresh N times.
+``on_commit_batch`` collects the ids passed by every call in the current
+transaction under one key and registers a single callback that gets them
+all once the transaction commits.
+"""
+from django.db import transaction
+
+
+class _Batch:
+    def __init__(self, batches, key, callback):
+        self.batches = batches
+        self.key = key
+        self.callback = callback
+        self.ids = set()
+
+    def add(self, ids):
+        # None means "everything" and absorbs any ids added later
+        if ids is None:
+            self.ids = None
+        elif self.ids is not None:
+            self.ids.update(ids)
+
+    def run(self):
+        if self.batches.get(self.key) is self:
+            del self.batches[self.key]
+        self.callback(self.ids)
+
+
+def _is_registered(connection, batch):
+    """False once the callback was dropped by a rollback to before it was registered"""
+    return any(entry[1] == batch.run for entry in connection.run_on_commit)
+
+
+def on_commit_batch(key, ids, callback):
+    """
+    Add ``ids`` (None for everything) to the ``key`` batch of the current
+    transaction and call ``callback`` with the set of all of them (or None)
+    once after it commits. Outside a transaction the callback runs now.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        callback(None if ids is None else set(ids))
+        return
+
+    batches = connection.__dict__.setdefault('commit_batches', {})
+    batch = batches.get(key)
+    if batch is None or not _is_registered(connection, batch):
+        batch = batches[key] = _Batch(batches, key, callback)
+        transaction.on_commit(batch.run)
+    batch.add(ids)
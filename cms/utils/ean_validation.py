@@ -0,0 +1,160 @@
+"""
+Background EAN/RAN validation.
+
+Import endpoints write variants without calling GS1 and queue the ids of
+rows whose EAN/RAN was written or changed. After the import commits, the
+``ean_validation`` job validates them in batches through the GTIN cache.
+Each variant then gets its HSN/tax fields from GS1, or is marked
+``is_rejected`` with a ``rejection_reason``.
+
+Variants GS1 could not answer for (timeouts, outages) are queued again as a
+follow-up job, delayed EAN_VALIDATION_RETRY_DELAY seconds and doubling per
+attempt, up to EAN_VALIDATION_MAX_ATTEMPTS passes.
+"""
+import os
+from datetime import timedelta
+
+from django.db.models import Min
+from django.utils import timezone
+
+from cms.models.job import CatalogJob
+from cms.models.product import Product, ProductVariant
+from cms.utils.change_feed import record_changes
+from cms.utils.gs1 import is_valid_gtin, lookup_gtins, normalize_gtin
+from cms.utils.jobs import enqueue_job, update_progress
+
+
+EAN_VALIDATION_BATCH_SIZE = int(os.environ.get("EAN_VALIDATION_BATCH_SIZE", 500))
+EAN_VALIDATION_RETRY_DELAY = int(os.environ.get("EAN_VALIDATION_RETRY_DELAY", 300))
+EAN_VALIDATION_MAX_ATTEMPTS = int(os.environ.get("EAN_VALIDATION_MAX_ATTEMPTS", 5))
+MAX_REPORTED_REJECTIONS = 500
+
+VALIDATED_FIELDS = ['hsn_code', 'tax', 'cgst', 'sgst', 'igst', 'cess', 'is_rejected', 'rejection_reason']
+
+
+def queue_ean_validation(variant_ids, user=None, source=None, run_async=True, attempt=1, run_after=None):
+    """Queue a validation pass for ``variant_ids``; returns the job or None"""
+    variant_ids = sorted({int(variant_id) for variant_id in variant_ids if variant_id})
+    if not variant_ids:
+        return None
+    return enqueue_job(
+        CatalogJob.EAN_VALIDATION,
+        params={'variant_ids': variant_ids, 'attempt': attempt},
+        user=user,
+        source=source,
+        total_count=len(variant_ids),
+        run_async=run_async,
+        run_after=run_after,
+    )
+
+
+def _first_owners(field, numbers):
+    """number -> id of the oldest variant holding it; later holders are duplicates"""
+    if not numbers:
+        return {}
+    return dict(
+        ProductVariant.objects.filter(**{f'{field}__in': numbers})
+        .values(field)
+        .annotate(first_id=Min('id'))
+        .values_list(field, 'first_id')
+    )
+
+
+def _validate_batch(variants):
+    """Apply GS1 results to ``variants``; returns (validated, rejected, unverified)"""
+    ean_owners = _first_owners('ean_number', {v.ean_number for v in variants if v.ean_number})
+    ran_owners = _first_owners('ran_number', {v.ran_number for v in variants if v.ran_number and not v.ean_number})
+
+    to_lookup = []
+    rejected, pending = [], []
+    for variant in variants:
+        if variant.ean_number:
+            number_type, number, owner = 'EAN', variant.ean_number, ean_owners.get(variant.ean_number)
+        else:
+            number_type, number, owner = 'RAN', variant.ran_number, ran_owners.get(variant.ran_number)
+
+        if owner != variant.id:
+            rejected.append((variant, f'{number_type} {number} already exists in another product'))
+        elif not is_valid_gtin(number):
+            rejected.append((variant, f'{number_type} {number} has an invalid check digit'))
+        else:
+            pending.append((variant, number_type, number))
+            to_lookup.append(number)
+
+    results = lookup_gtins(to_lookup)
+
+    validated, unverified = [], []
+    for variant, number_type, number in pending:
+        metadata = results.get(normalize_gtin(number))
+        if metadata is None:
+            # GS1 couldn't answer; leave the row untouched for the next pass
+            unverified.append(variant)
+        elif metadata.found:
+            variant.hsn_code = metadata.hsn_code
+            variant.cgst = metadata.cgst
+            variant.sgst = metadata.sgst
+            variant.igst = metadata.igst
+            variant.cess = 0  # GS1 doesn't provide cess
+            variant.tax = metadata.igst if metadata.igst > 0 else metadata.cgst + metadata.sgst
+            variant.is_rejected = False
+            variant.rejection_reason = None
+            validated.append(variant)
+        else:
+            rejected.append((variant, f'{number_type} {number} not found in GS1 database'))
+
+    for variant, reason in rejected:
+        variant.is_rejected = True
+        variant.rejection_reason = reason
+
+    return validated, rejected, unverified
+
+
+def run_ean_validation(job):
+    variant_ids = job.params.get('variant_ids', [])
+    result = {'validated': 0, 'rejected': 0, 'unverified': 0, 'rejections': [], 'unverified_variant_ids': []}
+
+    for start in range(0, len(variant_ids), EAN_VALIDATION_BATCH_SIZE):
+        chunk = variant_ids[start:start + EAN_VALIDATION_BATCH_SIZE]
+        variants = list(
+            ProductVariant.objects.filter(id__in=chunk)
+            .exclude(ean_number__isnull=True, ran_number__isnull=True)
+            .only('id', 'sku', 'product_id', 'ean_number', 'ran_number', *VALIDATED_FIELDS)
+        )
+
+        validated, rejected, unverified = _validate_batch(variants)
+
+        # bulk_update skips save(), so row fingerprints of the import stay valid
+        ProductVariant.objects.bulk_update(validated + [v for v, _ in rejected], VALIDATED_FIELDS)
+        record_changes('variant', 'updated', [v.id for v in validated] + [v.id for v, _ in rejected])
+
+        # Same rule as the import endpoints: a product with a rejected EAN is taken offline
+        rejected_product_ids = {v.product_id for v, _ in rejected}
+        if rejected_product_ids:
+            deactivated_ids = list(
+                Product.objects.filter(id__in=rejected_product_ids, is_active=True).values_list('id', flat=True)
+            )
+            Product.objects.filter(id__in=deactivated_ids).update(is_active=False)
+            record_changes('product', 'updated', deactivated_ids)
+
+        result['validated'] += len(validated)
+        result['rejected'] += len(rejected)
+        result['unverified'] += len(unverified)
+        result['unverified_variant_ids'].extend(v.id for v in unverified)
+        room = MAX_REPORTED_REJECTIONS - len(result['rejections'])
+        result['rejections'].extend(
+            {'variant_id': v.id, 'sku': v.sku, 'product_id': v.product_id, 'reason': reason}
+            for v, reason in rejected[:max(room, 0)]
+        )
+
+        job.result = result
+        update_progress(job, processed=len(chunk), success=len(validated), failure=len(rejected))
+
+    # GS1 didn't answer for these: check them again later, backing off per attempt
+    attempt = job.params.get('attempt', 1)
+    if result['unverified_variant_ids'] and attempt < EAN_VALIDATION_MAX_ATTEMPTS:
+        retry = queue_ean_validation(
+            result['unverified_variant_ids'], user=job.created_by, source=job.source, attempt=attempt + 1,
+            run_after=timezone.now() + timedelta(seconds=EAN_VALIDATION_RETRY_DELAY * 2 ** (attempt - 1)),
+        )
+        result['retry_job_id'] = retry.id
+        job.save(update_fields=['result', 'updation_date'])
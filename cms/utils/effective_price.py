@@ -0,0 +1,197 @@
+"""
+Effective selling price of a variant in a facility, optionally for a pack.
+
+A (facility, variant, pack) key resolves to the first of these that is set
+and positive:
+
+1. the pack's ProductVariantPrices row in the facility (pack keys only),
+2. the active FacilityInventory selling price,
+3. the facility's pack-less ProductVariantPrices row,
+4. the variant's base price, then its selling price.
+
+Steps 2 and 4 are what the pricing screens and repricing used to compute by
+hand (inventory price, else base price). A key without a facility resolves
+from the variant alone. ``effective_price_sql`` is the same rule as a SQL
+expression, for set-based writers that price many rows in one statement.
+
+``resolve_prices`` resolves a batch of keys with one query for the cache
+misses. Results are cached per variant for EFFECTIVE_PRICE_CACHE_TTL
+seconds and dropped once a write to the variant commits: signals cover
+inventory, variant and ProductVariantPrices saves (cms.models.facility),
+and bulk writers call ``invalidate_effective_prices`` themselves. Writes
+that price from the current price pass ``cached=False``.
+
+Invalidations come from web workers and management commands alike, so the
+cache is only used with a shared backend; with the per-process local-memory
+default every call queries. An invalidation also bumps the variant's
+version, and each entry stores the version it was read under, so a reader
+that queried before the commit cannot write a stale entry back.
+"""
+import os
+import uuid
+from collections import namedtuple
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection
+
+from cms.utils.commit_batch import on_commit_batch
+
+
+EFFECTIVE_PRICE_CACHE_TTL = int(os.environ.get("EFFECTIVE_PRICE_CACHE_TTL", 300))
+GENERATION_KEY = 'effective_price:generation'
+
+EffectivePrice = namedtuple('EffectivePrice', ['selling_price', 'source'])
+
+
+def price_key(facility_id, variant_id, pack_id=None):
+    return (facility_id, variant_id, pack_id)
+
+
+def _generation():
+    return cache.get_or_set(GENERATION_KEY, 1, None)
+
+
+def _cache_key(generation, variant_id):
+    return f'effective_price:{generation}:{variant_id}'
+
+
+def _version_key(variant_id):
+    return f'effective_price:version:{variant_id}'
+
+
+def _shared_cache():
+    """False for the local-memory backend, which other processes' invalidations never reach"""
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def _price_row_sql(v, facility_sql, packs_condition):
+    return f"""(
+        SELECT p.selling_price FROM product_variant_prices p
+        WHERE p.facility_id = {facility_sql} AND p.variant_id = {v}.id
+          AND {packs_condition} AND p.selling_price > 0
+        ORDER BY p.id DESC LIMIT 1
+    )"""
+
+
+def _steps_sql(fi, v, facility_sql, pack_sql):
+    """(source, price of that step or NULL) in resolution order, before the base price fallback"""
+    return [
+        ('pack_price', _price_row_sql(v, facility_sql, f"p.packs_id = {pack_sql}")),
+        ('inventory', f"CASE WHEN {fi}.is_active AND {fi}.selling_price > 0 THEN {fi}.selling_price END"),
+        ('facility_price', _price_row_sql(v, facility_sql, "p.packs_id IS NULL")),
+        ('variant_base_price', f"CASE WHEN {v}.base_price > 0 THEN {v}.base_price END"),
+        ('variant_selling_price', f"CASE WHEN {v}.selling_price > 0 THEN {v}.selling_price END"),
+    ]
+
+
+def effective_price_sql(fi='fi', v='v', facility_sql=None, pack_sql='NULL'):
+    """
+    SQL expression of the effective price for a ``facility_inventories``
+    alias ``fi`` (its row may be missing, e.g. from a LEFT JOIN) and a
+    ``variants`` alias ``v``. The facility defaults to ``fi``'s.
+    """
+    facility_sql = facility_sql or f'{fi}.facility_id'
+    prices = [price for _, price in _steps_sql(fi, v, facility_sql, pack_sql)]
+    return f"COALESCE({', '.join(prices)}, {v}.base_price)"
+
+
+def _query(keys):
+    facility_ids, variant_ids, pack_ids = (list(column) for column in zip(*keys))
+    steps = _steps_sql('fi', 'v', 'k.facility_id', 'k.pack_id')
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT k.facility_id, k.variant_id, k.pack_id,
+                COALESCE({', '.join(f's.{source}' for source, _ in steps)}, v.base_price),
+                CASE {' '.join(f"WHEN s.{source} IS NOT NULL THEN '{source}'" for source, _ in steps)} ELSE 'none' END
+            FROM unnest(%s::integer[], %s::integer[], %s::integer[]) AS k(facility_id, variant_id, pack_id)
+            JOIN variants v ON v.id = k.variant_id
+            LEFT JOIN facility_inventories fi
+                ON fi.facility_id = k.facility_id AND fi.product_variant_id = k.variant_id
+            CROSS JOIN LATERAL (
+                SELECT {', '.join(f'{price} AS {source}' for source, price in steps)}
+            ) s
+        """, [facility_ids, variant_ids, pack_ids])
+        return {
+            price_key(facility_id, variant_id, pack_id): EffectivePrice(selling_price, source)
+            for facility_id, variant_id, pack_id, selling_price, source in cursor.fetchall()
+        }
+
+
+def resolve_prices(keys, cached=True):
+    """
+    {key: EffectivePrice} for ``keys`` of ``(facility_id, variant_id[, pack_id])``.
+    Keys of unknown variants are left out.
+    """
+    keys = {price_key(*key) for key in keys}
+    if not keys:
+        return {}
+    if not cached or not _shared_cache():
+        return _query(keys)
+
+    generation = _generation()
+    variant_ids = {variant_id for _, variant_id, _ in keys}
+    entry_keys = {variant_id: _cache_key(generation, variant_id) for variant_id in variant_ids}
+    version_keys = {variant_id: _version_key(variant_id) for variant_id in variant_ids}
+    found = cache.get_many([*entry_keys.values(), *version_keys.values()])
+    versions = {variant_id: found.get(version_keys[variant_id]) for variant_id in variant_ids}
+
+    # An entry is (version it was read under, {key: EffectivePrice})
+    entries = {}
+    for variant_id in variant_ids:
+        entry = found.get(entry_keys[variant_id])
+        if entry is not None and entry[0] == versions[variant_id]:
+            entries[variant_id] = entry[1]
+
+    results, missing = {}, []
+    for key in keys:
+        prices = entries.get(key[1])
+        if prices is not None and key in prices:
+            results[key] = prices[key]
+        else:
+            missing.append(key)
+
+    if missing:
+        resolved = _query(missing)
+        results.update(resolved)
+        # Only write back what no invalidation has touched since the versions were read
+        current = cache.get_many([GENERATION_KEY, *(version_keys[key[1]] for key in missing)])
+        if current.get(GENERATION_KEY) == generation:
+            updates = {}
+            for key, price in resolved.items():
+                variant_id = key[1]
+                if current.get(version_keys[variant_id]) != versions[variant_id]:
+                    continue
+                entry_key = entry_keys[variant_id]
+                if entry_key not in updates:
+                    updates[entry_key] = (versions[variant_id], dict(entries.get(variant_id) or {}))
+                updates[entry_key][1][key] = price
+            cache.set_many(updates, EFFECTIVE_PRICE_CACHE_TTL)
+    return results
+
+
+def resolve_price(facility_id, variant_id, pack_id=None, cached=True):
+    """EffectivePrice of one key, or None for an unknown variant"""
+    key = price_key(facility_id, variant_id, pack_id)
+    return resolve_prices([key], cached=cached).get(key)
+
+
+def _invalidate(variant_ids):
+    if variant_ids is None:
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.set(GENERATION_KEY, 2, None)
+        return
+    variant_ids = set(variant_ids)
+    cache.set_many({_version_key(variant_id): uuid.uuid4().hex for variant_id in variant_ids}, None)
+    generation = _generation()
+    cache.delete_many([_cache_key(generation, variant_id) for variant_id in variant_ids])
+
+
+def invalidate_effective_prices(variant_ids=None):
+    """
+    Drop cached prices of ``variant_ids`` (all variants when None) once the
+    transaction commits, with one cache call for the whole transaction
+    """
+    on_commit_batch('effective_prices', variant_ids, _invalidate)
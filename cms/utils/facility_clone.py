@@ -0,0 +1,211 @@
+"""
+Clone a template facility's assortment into other facilities.
+
+``clone_facility`` copies, for each target facility, with one ``INSERT ...
+SELECT`` per table:
+
+- ``inventory``: FacilityInventory rows. Stock starts at 0 unless
+  ``copy_stock`` is set.
+- ``prices``: Packs and their ProductVariantPrices, plus the pack-less
+  ProductVariantPrices rows.
+- ``categories``: FacilityCategorys assignments.
+- ``collections``: collection memberships.
+
+An optional ``margin`` (percent) adjusts every copied selling price, capped
+at a positive MRP. Rows a target already has are kept, so a clone can be
+re-run: inventory and collections by their unique keys, category
+assignments by their four columns, pack-less prices per variant. Packs have
+no natural key, so they are only cloned into targets without packs.
+
+Large clones run as a ``facility_clone`` CatalogJob that commits one target
+at a time (``run_facility_clone_job``).
+"""
+from django.db import connection, transaction
+
+from cms.models.facility import Facility, FacilityCategorys, FacilityInventory
+from cms.models.product import Collection, Packs, ProductVariantPrices
+from cms.utils.change_feed import record_changes
+from cms.utils.cluster_pricing import schedule_cluster_price_refresh
+from cms.utils.effective_price import invalidate_effective_prices
+from cms.utils.jobs import enqueue_job, update_progress
+
+
+PARTS = ('inventory', 'prices', 'categories', 'collections')
+
+
+def _copied_columns(model):
+    """Every column but the key, the facility and the timestamps"""
+    skip = {'id', 'facility_id', 'creation_date', 'updation_date'}
+    return [field.column for field in model._meta.concrete_fields if field.column not in skip]
+
+
+# Joined into every copy so the optional margin is bound once
+MARGIN_JOIN = "CROSS JOIN (SELECT %s::double precision AS margin) adj"
+
+
+def _adjusted_price_sql(alias):
+    """Selling price scaled by ``1 + margin / 100`` and capped at a positive MRP (a NULL margin keeps it)"""
+    return f"""CASE WHEN adj.margin IS NULL THEN {alias}.selling_price
+        WHEN COALESCE({alias}.mrp, 0) > 0 THEN LEAST({alias}.selling_price * (1 + adj.margin / 100), {alias}.mrp)
+        ELSE {alias}.selling_price * (1 + adj.margin / 100) END"""
+
+
+def _insert_sql(table, columns, values, source_sql):
+    return f"""
+        INSERT INTO {table} (facility_id, {', '.join(columns)}, creation_date, updation_date)
+        SELECT %s, {', '.join(values)}, now(), now()
+        {source_sql}
+    """
+
+
+def _clone_inventory(cursor, source_id, target_id, margin, copy_stock):
+    columns = _copied_columns(FacilityInventory)
+    overrides = {
+        'selling_price': _adjusted_price_sql('s'),
+        'cust_discount': f"CASE WHEN adj.margin IS NULL THEN s.cust_discount ELSE trunc(s.mrp - {_adjusted_price_sql('s')}) END",
+        'stock': 's.stock' if copy_stock else '0',
+    }
+    values = [overrides.get(column, f's.{column}') for column in columns]
+    cursor.execute(_insert_sql(FacilityInventory._meta.db_table, columns, values, f"""
+        FROM {FacilityInventory._meta.db_table} s {MARGIN_JOIN}
+        WHERE s.facility_id = %s
+        ON CONFLICT (facility_id, product_variant_id) DO NOTHING
+        RETURNING id, product_variant_id
+    """), [target_id, margin, source_id])
+    return cursor.fetchall()
+
+
+def _clone_prices(cursor, source_id, target_id, margin):
+    packs_table, prices_table = Packs._meta.db_table, ProductVariantPrices._meta.db_table
+    price_columns = _copied_columns(ProductVariantPrices)
+    price_values = [_adjusted_price_sql('s') if column == 'selling_price' else f's.{column}' for column in price_columns]
+
+    # Pack-less prices, one row per variant
+    cursor.execute(_insert_sql(prices_table, price_columns, price_values, f"""
+        FROM {prices_table} s {MARGIN_JOIN}
+        WHERE s.facility_id = %s AND s.packs_id IS NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM {prices_table} t
+              WHERE t.facility_id = %s AND t.packs_id IS NULL AND t.variant_id = s.variant_id
+          )
+    """), [target_id, margin, source_id, target_id])
+    price_rows = cursor.rowcount
+
+    cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {packs_table} WHERE facility_id = %s)", [target_id])
+    if cursor.fetchone()[0]:
+        return 0, price_rows
+
+    # New pack ids are drawn up front so the pack prices can point at them in the same statement
+    pack_columns = _copied_columns(Packs)
+    pack_price_values = ['m.new_id' if column == 'packs_id' else value for column, value in zip(price_columns, price_values)]
+    cursor.execute(f"""
+        WITH m AS MATERIALIZED (
+            SELECT id AS old_id, nextval(pg_get_serial_sequence('{packs_table}', 'id')) AS new_id
+            FROM {packs_table} WHERE facility_id = %s
+        ),
+        new_packs AS (
+            INSERT INTO {packs_table} (id, facility_id, {', '.join(pack_columns)}, creation_date, updation_date)
+            SELECT m.new_id, %s, {', '.join(f's.{column}' for column in pack_columns)}, now(), now()
+            FROM m JOIN {packs_table} s ON s.id = m.old_id
+            RETURNING id
+        ),
+        new_prices AS (
+            {_insert_sql(prices_table, price_columns, pack_price_values, f"FROM m JOIN {prices_table} s ON s.packs_id = m.old_id {MARGIN_JOIN}")}
+            RETURNING id
+        )
+        SELECT (SELECT count(*) FROM new_packs), (SELECT count(*) FROM new_prices)
+    """, [source_id, target_id, target_id, margin])
+    pack_rows, pack_price_rows = cursor.fetchone()
+    return pack_rows, price_rows + pack_price_rows
+
+
+def _clone_categories(cursor, source_id, target_id):
+    table = FacilityCategorys._meta.db_table
+    columns = _copied_columns(FacilityCategorys)
+    cursor.execute(_insert_sql(table, columns, [f's.{column}' for column in columns], f"""
+        FROM {table} s
+        WHERE s.facility_id = %s
+          AND NOT EXISTS (
+              SELECT 1 FROM {table} t
+              WHERE t.facility_id = %s
+                AND t.category_id IS NOT DISTINCT FROM s.category_id
+                AND t.sub_category_id IS NOT DISTINCT FROM s.sub_category_id
+                AND t.sub_sub_category_id IS NOT DISTINCT FROM s.sub_sub_category_id
+          )
+    """), [target_id, source_id, target_id])
+    return cursor.rowcount
+
+
+def _clone_collections(cursor, source_id, target_id):
+    table = Collection.facilities.through._meta.db_table
+    cursor.execute(f"""
+        INSERT INTO {table} (collection_id, facility_id)
+        SELECT collection_id, %s FROM {table} WHERE facility_id = %s
+        ON CONFLICT DO NOTHING
+    """, [target_id, source_id])
+    return cursor.rowcount
+
+
+def clone_facility(source_id, target_id, parts=PARTS, margin=None, copy_stock=False):
+    """
+    Copy ``parts`` of facility ``source_id`` into ``target_id`` in one
+    transaction; returns the number of rows created per table.
+    """
+    counts = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        if 'inventory' in parts:
+            created = _clone_inventory(cursor, source_id, target_id, margin, copy_stock)
+            counts['inventory'] = len(created)
+            record_changes('inventory', 'created', [inventory_id for inventory_id, _ in created])
+        if 'prices' in parts:
+            counts['packs'], counts['variant_prices'] = _clone_prices(cursor, source_id, target_id, margin)
+        if 'categories' in parts:
+            counts['categories'] = _clone_categories(cursor, source_id, target_id)
+        if 'collections' in parts:
+            counts['collections'] = _clone_collections(cursor, source_id, target_id)
+
+        # A new facility's prices touch a large share of the catalog: drop the whole cache once
+        invalidate_effective_prices()
+        schedule_cluster_price_refresh(facility_ids=[target_id])
+    return counts
+
+
+def queue_facility_clone(source_id, target_ids, parts=PARTS, margin=None, copy_stock=False, user=None,
+                         source=None, run_async=True):
+    """Queue a ``facility_clone`` job; returns the job"""
+    from cms.models.job import CatalogJob
+
+    target_ids = sorted({int(target_id) for target_id in target_ids})
+    return enqueue_job(
+        CatalogJob.FACILITY_CLONE,
+        params={
+            'source_facility_id': source_id,
+            'target_facility_ids': target_ids,
+            'parts': list(parts),
+            'margin': margin,
+            'copy_stock': copy_stock,
+        },
+        user=user,
+        source=source,
+        total_count=len(target_ids),
+        run_async=run_async,
+    )
+
+
+def run_facility_clone_job(job):
+    """``facility_clone`` handler: clone into one committed target facility at a time"""
+    params = job.params
+    source_id = params['source_facility_id']
+    job.result = {'targets': {}}
+    for target_id in params['target_facility_ids']:
+        if not Facility.objects.filter(id=target_id).exists():
+            job.result['targets'][str(target_id)] = {'error': 'Facility not found'}
+            update_progress(job, processed=1, failure=1)
+            continue
+        job.result['targets'][str(target_id)] = clone_facility(
+            source_id, target_id,
+            parts=params.get('parts', PARTS),
+            margin=params.get('margin'),
+            copy_stock=params.get('copy_stock', False),
+        )
+        update_progress(job, processed=1, success=1)
@@ -0,0 +1,39 @@
+"""
+Row fingerprints for repeated catalog uploads.
+
+Each imported variant row is hashed over its importable fields (plus the
+product-level fields sent with it) and the hash is stored on the variant.
+A re-import compares incoming hashes with the stored ones and only rows
+whose fingerprint changed are written.
+"""
+import hashlib
+import json
+
+
+# Product fields the bulk update endpoint applies
+PRODUCT_IMPORT_FIELDS = ['name', 'description', 'category', 'brand', 'is_active', 'is_published', 'tags']
+
+# Variant fields the bulk update endpoint applies directly to the model
+VARIANT_IMPORT_FIELDS = [
+    'name', 'description', 'tags', 'base_price', 'mrp', 'selling_price',
+    'ean_number', 'ran_number', 'hsn_code', 'tax', 'cgst', 'sgst', 'igst', 'cess',
+    'weight', 'net_qty', 'packaging_type', 'product_dimensions', 'package_dimensions',
+    'shelf_life', 'uom', 'attributes', 'is_pack', 'pack_qty', 'is_active',
+    'is_b2b_enable', 'is_pp_enable', 'is_visible', 'is_published', 'is_rejected',
+]
+
+# Nested variant data handled outside the field mapping
+VARIANT_RELATED_FIELDS = ['images', 'custom_fields']
+
+
+def row_fingerprint(product_data, variant_data):
+    """SHA-256 over the importable fields of one product/variant row"""
+    payload = {
+        'product': {field: product_data[field] for field in PRODUCT_IMPORT_FIELDS if field in product_data},
+        'variant': {
+            field: variant_data[field]
+            for field in VARIANT_IMPORT_FIELDS + VARIANT_RELATED_FIELDS if field in variant_data
+        },
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
@@ -0,0 +1,114 @@
+"""
+Read-through GS1 GTIN lookups.
+
+Every EAN/RAN validation path goes through ``lookup_gtins``: cached rows in
+``gtin_metadata`` are served from the database and only expired or unknown
+GTINs are fetched from the GS1 API, in batched calls. Not-found codes are
+cached as well (with a shorter TTL) so bad EANs aren't re-queried on every
+retry.
+
+The network side (pooling, chunking, retries, circuit breaker, check-digit
+validation) lives in ``cms.utils.gs1_client``.
+"""
+import os
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.utils import timezone
+
+from cms.models.master import GtinMetadata
+from cms.utils.gs1_client import (  # noqa: F401 - re-exported for callers
+    GS1Error, GS1NotConfigured, GS1CircuitOpen, get_gs1_client, is_valid_gtin, normalize_gtin,
+)
+
+
+GS1_CACHE_TTL = timedelta(days=int(os.environ.get("GS1_CACHE_TTL_DAYS", 30)))
+GS1_NEGATIVE_CACHE_TTL = timedelta(hours=int(os.environ.get("GS1_NEGATIVE_CACHE_TTL_HOURS", 24)))
+
+
+def _decimal(value):
+    try:
+        return Decimal(str(value)) if value not in (None, '') else Decimal('0')
+    except InvalidOperation:
+        return Decimal('0')
+
+
+def _cache_row(gtin, item, now):
+    if item is None:
+        return GtinMetadata(gtin=gtin, found=False, expires_at=now + GS1_NEGATIVE_CACHE_TTL)
+    return GtinMetadata(
+        gtin=gtin,
+        found=True,
+        is_published=True,  # lookups are filtered on status=published
+        hsn_code=item.get('hs_code'),
+        tax_rate=_decimal(item.get('tax_rate')),
+        cgst=_decimal(item.get('cgst')),
+        sgst=_decimal(item.get('sgst')),
+        igst=_decimal(item.get('igst')),
+        cess=_decimal(item.get('cess')),
+        payload=item,
+        expires_at=now + GS1_CACHE_TTL,
+    )
+
+
+def lookup_gtins(values):
+    """
+    Resolve GTINs through the cache, fetching only misses from GS1.
+
+    Returns {normalized gtin: GtinMetadata} for every GTIN with a definite
+    answer; check ``.found`` for not-found codes. Non-numeric GTINs, GTINs
+    with a bad check digit and GTINs whose fetch failed are left out, and
+    nothing is cached for failed fetches.
+    """
+    # Keep the caller's spelling (leading zeros included) for the API call
+    originals = {}
+    for value in values:
+        gtin = normalize_gtin(value)
+        if gtin and is_valid_gtin(gtin):
+            originals.setdefault(gtin, str(value).strip())
+    gtins = set(originals)
+    if not gtins:
+        return {}
+
+    now = timezone.now()
+    results = {
+        row.gtin: row for row in GtinMetadata.objects.filter(gtin__in=gtins, expires_at__gt=now)
+    }
+    misses = sorted(gtins - set(results))
+    if not misses:
+        return results
+
+    items, failed = get_gs1_client().fetch_items([originals[gtin] for gtin in misses])
+    rows = [_cache_row(gtin, items.get(gtin), now) for gtin in misses if gtin not in failed]
+    GtinMetadata.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['gtin'],
+        update_fields=[
+            'found', 'is_published', 'hsn_code', 'tax_rate', 'cgst', 'sgst', 'igst',
+            'cess', 'payload', 'expires_at', 'updation_date',
+        ],
+    )
+    results.update({row.gtin: row for row in rows})
+    return results
+
+
+def lookup_gtin(value):
+    """
+    Single-GTIN wrapper around ``lookup_gtins``. Returns None for malformed
+    GTINs and raises GS1Error when GS1 couldn't answer.
+    """
+    gtin = normalize_gtin(value)
+    if gtin is None or not is_valid_gtin(gtin):
+        return None
+    metadata = lookup_gtins([value]).get(gtin)
+    if metadata is None:
+        raise GS1Error(f"GS1 lookup failed for {value}")
+    return metadata
+
+
+def gs1_response(metadata):
+    """Rebuild the GS1 API response shape for a cached lookup"""
+    if metadata is None or not metadata.found:
+        return {'status': False, 'items': []}
+    return {'status': True, 'items': [metadata.payload]}
@@ -0,0 +1,231 @@
+"""
+Shared GS1 API client.
+
+One pooled session per process. GTIN arrays are split into chunks and fetched
+with bounded concurrency. Transient failures are retried with exponential
+backoff, and a circuit breaker stops hammering GS1 while it is down. GTINs
+with a bad check digit are rejected locally and never sent.
+"""
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+GS1_DEFAULT_URL = "https://api.gs1datakart.org/console/retailer/products"
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class GS1Error(Exception):
+    """The GS1 API could not be reached or returned an unusable response"""
+
+
+class GS1NotConfigured(GS1Error):
+    """GS1_API_TOKEN is not set"""
+
+
+class GS1CircuitOpen(GS1Error):
+    """Calls are short-circuited after repeated GS1 failures"""
+
+
+def normalize_gtin(value):
+    """Canonical form of an EAN/GTIN: digits only, no leading zeros"""
+    text = str(value).strip() if value is not None else ''
+    if not text.isdigit():
+        return None
+    return str(int(text))
+
+
+def is_valid_gtin(value):
+    """
+    Check the GS1 mod-10 check digit of an EAN-8/UPC-A/EAN-13/GTIN-14.
+    Leading zeros may have been lost (EANs are stored as integers), so the
+    digits are right-aligned into a GTIN-14 before checking.
+    """
+    gtin = normalize_gtin(value)
+    if gtin is None or not 7 <= len(gtin) <= 14:
+        return False
+    digits = [int(d) for d in gtin.zfill(14)]
+    body, check_digit = digits[:-1], digits[-1]
+    total = sum(d * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(body)))
+    return (10 - total % 10) % 10 == check_digit
+
+
+class CircuitBreaker:
+    """
+    Opens after ``threshold`` consecutive failures for ``cooldown`` seconds.
+    Once the cooldown is over it is half-open: a single trial call goes
+    through, and everyone else is refused until that call records its result.
+    """
+
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._trial_at = None
+        self._lock = threading.Lock()
+
+    def _blocked(self, now):
+        if self._opened_at is None:
+            return False
+        if now - self._opened_at < self.cooldown:
+            return True
+        # A trial that never reported back (e.g. its thread died) stops blocking after a cooldown
+        return self._trial_at is not None and now - self._trial_at < self.cooldown
+
+    def allow(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._blocked(now):
+                return False
+            if self._opened_at is not None:
+                self._trial_at = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_at = None
+            if self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self._blocked(time.monotonic())
+
+
+class GS1Client:
+    def __init__(self, url=None, token=None, timeout=10.0, chunk_size=100, max_workers=4,
+                 max_retries=3, backoff=0.5, breaker_threshold=5, breaker_cooldown=30.0):
+        self.url = url or GS1_DEFAULT_URL
+        self.token = token
+        self.timeout = timeout
+        self.chunk_size = max(1, chunk_size)
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max(0, max_retries)
+        self.backoff = backoff
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if token:
+            self.session.headers.update({'Authorization': f'Bearer {token}'})
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            url=os.environ.get("GS1_API_URL", GS1_DEFAULT_URL),
+            token=os.environ.get("GS1_API_TOKEN", ""),
+            timeout=float(os.environ.get("GS1_TIMEOUT_SECONDS", 10)),
+            chunk_size=int(os.environ.get("GS1_CHUNK_SIZE", 100)),
+            max_workers=int(os.environ.get("GS1_MAX_WORKERS", 4)),
+            max_retries=int(os.environ.get("GS1_MAX_RETRIES", 3)),
+            backoff=float(os.environ.get("GS1_BACKOFF_SECONDS", 0.5)),
+            breaker_threshold=int(os.environ.get("GS1_BREAKER_THRESHOLD", 5)),
+            breaker_cooldown=float(os.environ.get("GS1_BREAKER_COOLDOWN_SECONDS", 30)),
+        )
+
+    def fetch_items(self, gtins):
+        """
+        Look up ``gtins`` and return (items, failed).
+
+        ``items`` maps normalized GTIN -> GS1 item for every GTIN GS1 knows.
+        ``failed`` is the set of normalized GTINs whose chunk could not be
+        fetched; every other GTIN got a definite answer (found or not).
+        GTINs with an invalid check digit are dropped without a call.
+        """
+        if not self.token:
+            raise GS1NotConfigured("GS1_API_TOKEN is not configured")
+
+        gtins = [str(gtin).strip() for gtin in gtins if is_valid_gtin(gtin)]
+        chunks = [gtins[i:i + self.chunk_size] for i in range(0, len(gtins), self.chunk_size)]
+        items, failed = {}, set()
+        if not chunks:
+            return items, failed
+
+        workers = min(self.max_workers, len(chunks))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for chunk, result in zip(chunks, executor.map(self._fetch_chunk_safe, chunks)):
+                if result is None:
+                    failed.update(normalize_gtin(gtin) for gtin in chunk)
+                else:
+                    items.update(result)
+        return items, failed
+
+    def _fetch_chunk_safe(self, chunk):
+        try:
+            return self._fetch_chunk(chunk)
+        except GS1Error as e:
+            print(f"❌ GS1 lookup failed for {len(chunk)} GTINs: {e}")
+            return None
+
+    def _fetch_chunk(self, chunk):
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise GS1CircuitOpen("GS1 circuit breaker is open")
+            try:
+                response = self.session.get(
+                    self.url,
+                    params={'gtin': json.dumps(chunk), 'status': 'published'},
+                    timeout=self.timeout,
+                )
+                if response.status_code in RETRY_STATUS_CODES:
+                    raise GS1Error(f"GS1 API returned {response.status_code}")
+            except (requests.exceptions.RequestException, GS1Error) as e:
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise GS1Error(str(e))
+                # Exponential backoff with jitter
+                time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random() / 2))
+                attempt += 1
+                continue
+
+            self.breaker.record_success()
+            return self._parse(response)
+
+    def _parse(self, response):
+        # Only a definite answer may be reported; auth errors must not look like "not found"
+        if response.status_code == 404:
+            return {}
+        if response.status_code != 200:
+            raise GS1Error(f"GS1 API returned {response.status_code}")
+        try:
+            data = response.json()
+        except ValueError:
+            raise GS1Error("GS1 API returned a non-JSON response")
+
+        items = {}
+        for item in (data.get('items') or []) if data.get('status') else []:
+            gtin = normalize_gtin(item.get('gtin'))
+            if gtin:
+                items[gtin] = item
+        return items
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_gs1_client():
+    """Process-wide client, so the connection pool and breaker are shared"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GS1Client.from_env()
+        return _client
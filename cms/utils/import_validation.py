@@ -0,0 +1,331 @@
+"""
+Validation-only pass for the bulk import endpoints (``?dry_run=true``).
+
+Runs every check the create/update paths would hit, but with a fixed number
+of set-based lookups for the whole payload and no writes, and returns the
+complete error report in one response.
+
+``price_guardrail_errors`` is also run by the bulk endpoints before they
+write, so a supplied selling price outside its variant's pricing limits is
+rejected up front.
+"""
+import numpy as np
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from cms.models.category import Category, Brand
+from cms.models.product import ProductVariant, validate_dimensions
+from cms.models.setting import Attribute, CustomField, SizeChart
+from cms.utils.price_guardrails import LIMIT_FIELDS, evaluate_guardrails, limit_arrays
+
+
+MODE_CREATE = 'create'
+MODE_UPDATE = 'update'
+
+
+def is_dry_run(request):
+    """True when the request asks for a validation-only pass"""
+    return str(request.query_params.get('dry_run', '')).lower() in ('true', '1', 'yes')
+
+
+def _as_int(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value.strip())
+    return None
+
+
+def _as_float(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_blank(value):
+    return value is None or (isinstance(value, str) and not value.strip()) or value in ([], {})
+
+
+def _custom_field_keys(custom_fields):
+    """Field ids and names supplied with a non-empty value, for both payload formats"""
+    ids, names = set(), set()
+    if isinstance(custom_fields, list):
+        for entry in custom_fields:
+            if isinstance(entry, dict) and not _is_blank(entry.get('value')):
+                field_id = _as_int(entry.get('field_id'))
+                if field_id is not None:
+                    ids.add(field_id)
+    elif isinstance(custom_fields, dict):
+        names = {str(name).lower() for name, value in custom_fields.items() if not _is_blank(value)}
+    return ids, names
+
+
+def validate_import_payload(items, mode=MODE_CREATE, unknown_brands_ok=False):
+    """
+    Validate a bulk import payload without writing anything.
+
+    ``items`` is the list of product dicts accepted by the bulk endpoints,
+    each with a ``variants`` list. In create mode the category rules from
+    CategoryRequiredFieldsView (shelf life, size chart, required attributes
+    and custom fields) are enforced; in update mode only the fields present
+    in the payload are checked and every SKU must already exist.
+    ``unknown_brands_ok`` matches SmartBrandProductSerializer, which imports
+    a brand it can't find as no brand instead of rejecting it.
+    """
+    errors = []
+
+    def add_error(product_index, field, message, variant_index=None, value=None):
+        error = {'product_index': product_index, 'field': field, 'error': message}
+        if variant_index is not None:
+            error['variant_index'] = variant_index
+        if value is not None:
+            error['value'] = value
+        errors.append(error)
+
+    if not isinstance(items, list):
+        return _report([], 0, [{'product_index': None, 'field': None, 'error': 'Payload must be a list of products.'}])
+
+    # Pass 1: shape checks and collect every key that needs a lookup
+    products, variants = [], []
+    category_ids, brand_ids, brand_names = set(), set(), set()
+    skus, eans, rans = set(), set(), set()
+
+    for idx, item in enumerate(items):
+        if not isinstance(item, dict):
+            add_error(idx, None, 'Item must be a JSON object.')
+            continue
+        products.append((idx, item))
+
+        if mode == MODE_CREATE and _is_blank(item.get('name')):
+            add_error(idx, 'name', 'Product name is required.')
+
+        if 'category' in item or mode == MODE_CREATE:
+            category_id = _as_int(item.get('category'))
+            if category_id is None:
+                add_error(idx, 'category', 'A valid category id is required.', value=item.get('category'))
+            else:
+                category_ids.add(category_id)
+
+        brand = item.get('brand')
+        if not _is_blank(brand) and not unknown_brands_ok:
+            brand_id = _as_int(brand)
+            if brand_id is not None:
+                brand_ids.add(brand_id)
+            else:
+                brand_names.add(str(brand).strip().lower())
+
+        item_variants = item.get('variants')
+        if item_variants is None and mode == MODE_CREATE:
+            item_variants = []
+        if not isinstance(item_variants, list):
+            add_error(idx, 'variants', 'Product must have a "variants" array.')
+            continue
+
+        for variant_idx, variant in enumerate(item_variants):
+            if not isinstance(variant, dict):
+                add_error(idx, None, 'Variant must be a JSON object.', variant_idx)
+                continue
+            variants.append((idx, variant_idx, item, variant))
+
+            sku = variant.get('sku')
+            if mode == MODE_CREATE and sku:
+                add_error(idx, 'sku', 'SKUs are not allowed in creation; use bulk-update for existing variants.', variant_idx, sku)
+            if mode == MODE_UPDATE:
+                if not sku:
+                    add_error(idx, 'sku', 'SKU is required for updating.', variant_idx)
+                else:
+                    skus.add(sku)
+            if mode == MODE_CREATE and _is_blank(variant.get('name')):
+                add_error(idx, 'name', 'Variant name is required.', variant_idx)
+
+            for field, bucket in (('ean_number', eans), ('ran_number', rans)):
+                value = variant.get(field)
+                if _is_blank(value):
+                    continue
+                number = _as_int(value)
+                if number is None:
+                    add_error(idx, field, f'{field} must be numeric.', variant_idx, value)
+                else:
+                    bucket.add(number)
+
+            for field in ('product_dimensions', 'package_dimensions'):
+                if variant.get(field):
+                    try:
+                        validate_dimensions(variant[field])
+                    except ValidationError as e:
+                        add_error(idx, field, '; '.join(e.messages), variant_idx)
+
+    # Pass 2: set-based lookups, one query each
+    categories = {
+        row['id']: row for row in Category.objects.filter(id__in=category_ids).values('id', 'shelf_life_required')
+    }
+    known_brand_ids, known_brand_names = set(), set()
+    if brand_ids or brand_names:
+        for brand_id, name in (Brand.objects.annotate(name_lower=Lower('name'))
+                               .filter(Q(id__in=brand_ids) | Q(name_lower__in=brand_names))
+                               .values_list('id', 'name_lower')):
+            known_brand_ids.add(brand_id)
+            known_brand_names.add(name)
+
+    existing_by_sku, ean_owners, ran_owners = {}, {}, {}
+    if skus or eans or rans:
+        for variant_id, sku, ean, ran in ProductVariant.objects.filter(
+            Q(sku__in=skus) | Q(ean_number__in=eans) | Q(ran_number__in=rans)
+        ).values_list('id', 'sku', 'ean_number', 'ran_number'):
+            if sku in skus:
+                existing_by_sku[sku] = variant_id
+            if ean in eans:
+                ean_owners.setdefault(ean, {})[variant_id] = sku
+            if ran in rans:
+                ran_owners.setdefault(ran, {})[variant_id] = sku
+
+    rule_category_ids = set(categories) if mode == MODE_CREATE else set()
+    required_custom_fields = {}
+    required_attributes = {}
+    size_chart_categories = set()
+    if rule_category_ids:
+        for row in CustomField.objects.filter(
+            is_required=True, is_active=True, section__is_active=True,
+            section__tabs__is_active=True, section__tabs__category_id__in=rule_category_ids,
+        ).values('id', 'name', 'label', 'section__tabs__category_id').distinct():
+            required_custom_fields.setdefault(row['section__tabs__category_id'], {})[row['id']] = row
+        for row in Attribute.objects.filter(
+            is_required=True, is_active=True,
+            product_types__is_active=True, product_types__category_id__in=rule_category_ids,
+        ).values('name', 'product_types__category_id').distinct():
+            required_attributes.setdefault(row['product_types__category_id'], set()).add(row['name'])
+        size_chart_categories = set(
+            SizeChart.objects.filter(category_id__in=rule_category_ids, is_active=True).values_list('category_id', flat=True)
+        )
+
+    # Pass 3: evaluate every row against the lookups
+    for idx, item in products:
+        category_id = _as_int(item.get('category'))
+        if category_id is not None and category_id not in categories:
+            add_error(idx, 'category', f'Category {category_id} does not exist.', value=category_id)
+        brand = item.get('brand')
+        if not _is_blank(brand) and not unknown_brands_ok:
+            brand_id = _as_int(brand)
+            if (brand_id is not None and brand_id not in known_brand_ids) or \
+                    (brand_id is None and str(brand).strip().lower() not in known_brand_names):
+                add_error(idx, 'brand', f'Brand "{brand}" does not exist.', value=brand)
+
+    seen_skus, seen_eans, seen_rans = {}, {}, {}
+    for idx, variant_idx, item, variant in variants:
+        sku = variant.get('sku') or None
+        location = (idx, variant_idx)
+
+        if mode == MODE_UPDATE and sku:
+            if sku in seen_skus:
+                add_error(idx, 'sku', f'Duplicate SKU in file (first seen at product {seen_skus[sku][0]}, variant {seen_skus[sku][1]}).', variant_idx, sku)
+            else:
+                seen_skus[sku] = location
+            if sku not in existing_by_sku:
+                add_error(idx, 'sku', 'SKU does not exist.', variant_idx, sku)
+
+        for field, seen, owners in (('ean_number', seen_eans, ean_owners), ('ran_number', seen_rans, ran_owners)):
+            number = _as_int(variant.get(field))
+            if number is None:
+                continue
+            if number in seen:
+                add_error(idx, field, f'Duplicate {field} in file (first seen at product {seen[number][0]}, variant {seen[number][1]}).', variant_idx, number)
+            else:
+                seen[number] = location
+            # The variant being updated may already own its own number
+            other_owners = {
+                variant_id: owner_sku for variant_id, owner_sku in owners.get(number, {}).items()
+                if variant_id != existing_by_sku.get(sku)
+            }
+            if other_owners:
+                owner_id, owner_sku = min(other_owners.items())
+                add_error(idx, field, f'{field} already exists on variant {owner_sku or owner_id}.', variant_idx, number)
+
+        category_id = _as_int(item.get('category'))
+        if category_id not in rule_category_ids:
+            continue
+
+        if categories[category_id]['shelf_life_required'] and _is_blank(variant.get('shelf_life')):
+            add_error(idx, 'shelf_life', 'Shelf life days is required for this category.', variant_idx)
+
+        if category_id in size_chart_categories and not variant.get('size_chart_values'):
+            add_error(idx, 'size_chart_values', 'Size chart values are required for this category.', variant_idx)
+
+        attributes = variant.get('attributes') if isinstance(variant.get('attributes'), dict) else {}
+        supplied_attributes = {str(name).lower() for name, value in attributes.items() if not _is_blank(value)}
+        supplied_attributes |= {name for name in ('color', 'size') if not _is_blank(variant.get(name))}
+        for name in sorted(required_attributes.get(category_id, ())):
+            if name.lower() not in supplied_attributes:
+                add_error(idx, 'attributes', f'{name} is required.', variant_idx)
+
+        field_ids, field_names = _custom_field_keys(variant.get('custom_fields'))
+        for field_id, field in required_custom_fields.get(category_id, {}).items():
+            if field_id not in field_ids and field['name'].lower() not in field_names:
+                add_error(idx, 'custom_fields', f"{field['label']} is required.", variant_idx, field['name'])
+
+    errors.extend(price_guardrail_errors(items, mode))
+    return _report(products, len(variants), errors)
+
+
+def price_guardrail_errors(items, mode=MODE_CREATE):
+    """
+    Errors for variants whose supplied ``selling_price`` breaks a price
+    guardrail, checked in one vectorized pass. Limits come from the payload,
+    falling back to the existing variant (by SKU) in update mode.
+    """
+    candidates = []
+    for idx, item in enumerate(items if isinstance(items, list) else []):
+        if not isinstance(item, dict) or not isinstance(item.get('variants'), list):
+            continue
+        for variant_idx, variant in enumerate(item['variants']):
+            if not isinstance(variant, dict):
+                continue
+            price = _as_float(variant.get('selling_price'))
+            if price is not None and price > 0:
+                candidates.append((idx, variant_idx, variant, price))
+    if not candidates:
+        return []
+
+    existing = {}
+    if mode == MODE_UPDATE:
+        skus = {variant.get('sku') for _, _, variant, _ in candidates if variant.get('sku')}
+        existing = {
+            row[0]: row[1:] for row in ProductVariant.objects.filter(sku__in=skus).values_list('sku', *LIMIT_FIELDS)
+        }
+
+    def variant_limits(variant):
+        current = existing.get(variant.get('sku')) or (0,) * len(LIMIT_FIELDS)
+        supplied = (_as_float(variant.get(field)) for field in LIMIT_FIELDS)
+        return tuple(current[i] if value is None else value for i, value in enumerate(supplied))
+
+    masks = evaluate_guardrails(
+        [price for _, _, _, price in candidates],
+        limit_arrays(variant_limits(variant) for _, _, variant, _ in candidates),
+    )
+    errors = []
+    for rule, mask in masks.items():
+        for index in np.flatnonzero(mask):
+            idx, variant_idx, _, price = candidates[index]
+            errors.append({
+                'product_index': idx, 'variant_index': variant_idx, 'field': 'selling_price',
+                'error': f'Selling price breaks the {rule} price guardrail.', 'value': price, 'rule': rule,
+            })
+    return errors
+
+
+def _report(products, variant_count, errors):
+    errors.sort(key=lambda e: (e['product_index'] if e['product_index'] is not None else -1, e.get('variant_index', -1)))
+    return {
+        'dry_run': True,
+        'valid': not errors,
+        'total_products': len(products),
+        'total_variants': variant_count,
+        'error_count': len(errors),
+        'products_with_errors': len({e['product_index'] for e in errors}),
+        'errors': errors,
+    }
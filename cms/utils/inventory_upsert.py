@@ -0,0 +1,135 @@
+"""
+Bulk upsert of facility inventory rows.
+
+``upsert_inventories`` writes a validated payload of inventory items with one
+``INSERT ... ON CONFLICT (facility_id, product_variant_id) DO UPDATE`` per
+batch of items sharing the same supplied columns. Existing rows only get
+the columns the items supplied. New rows are filled the way
+FacilityInventory.save() fills them: missing prices come from the variant,
+and a missing ``cust_discount`` is derived as ``int(mrp - selling_price)``.
+
+Bulk writes skip the model signals, so the change feed events, effective
+price invalidation and cluster price refresh are issued here, once per
+call.
+"""
+import os
+
+from django.db import connection, transaction
+
+from cms.utils.change_feed import record_changes
+from cms.utils.cluster_pricing import schedule_cluster_price_refresh
+from cms.utils.effective_price import invalidate_effective_prices
+
+
+INVENTORY_UPSERT_BATCH_SIZE = int(os.environ.get("INVENTORY_UPSERT_BATCH_SIZE", 1000))
+
+# Column -> (SQL type of its unnest array, value of a new row when not supplied)
+UPSERT_COLUMNS = {
+    'stock': ('integer', '0'),
+    'base_price': ('double precision', 'COALESCE(v.base_price, 0)'),
+    'mrp': ('double precision', 'COALESCE(v.mrp, 0)'),
+    'selling_price': ('double precision', 'COALESCE(v.selling_price, 0)'),
+    'cust_discount': ('double precision', 'NULL'),
+    'max_purchase_limit': ('integer', 'NULL'),
+    'outofstock_threshold': ('integer', 'NULL'),
+    'status': ('varchar', 'NULL'),
+    'is_active': ('boolean', 'TRUE'),
+    'tax_id': ('integer', 'NULL'),
+}
+# Columns a supplied NULL falls back from, as save() does
+VARIANT_DEFAULTED = ('base_price', 'mrp', 'selling_price')
+
+
+def _upsert_sql(columns):
+    arrays = ', '.join(f'%s::{UPSERT_COLUMNS[column][0]}[]' for column in columns)
+    values = []
+    for column, (_, default) in UPSERT_COLUMNS.items():
+        if column not in columns:
+            values.append(default)
+        elif column in VARIANT_DEFAULTED:
+            values.append(f'COALESCE(r.{column}, {default})')
+        else:
+            values.append(f'r.{column}')
+    updates = ''.join(f'{column} = EXCLUDED.{column}, ' for column in columns)
+    return f"""
+        INSERT INTO facility_inventories (
+            facility_id, product_variant_id, {', '.join(UPSERT_COLUMNS)}, creation_date, updation_date
+        )
+        SELECT r.facility_id, r.product_variant_id, {', '.join(values)}, now(), now()
+        FROM unnest(%s::integer[], %s::integer[]{', ' if columns else ''}{arrays})
+            AS r(facility_id, product_variant_id{', ' if columns else ''}{', '.join(columns)})
+        JOIN variants v ON v.id = r.product_variant_id
+        ON CONFLICT (facility_id, product_variant_id) DO UPDATE
+        SET {updates}updation_date = EXCLUDED.updation_date
+        RETURNING id, product_variant_id, xmax = 0
+    """
+
+
+def inventory_item_errors(items):
+    """
+    Errors of validated ``items`` that cannot be upserted: a missing facility,
+    an unknown facility or variant, or a (facility, variant) pair given twice.
+    Two lookups for the whole payload.
+    """
+    from cms.models.facility import Facility
+    from cms.models.product import ProductVariant
+
+    errors, seen = [], {}
+    for index, item in enumerate(items):
+        if item.get('facility_id') is None:
+            errors.append({'index': index, 'error': 'facility_id is required'})
+            continue
+        key = (item['facility_id'], item['product_variant_id'])
+        if key in seen:
+            errors.append({'index': index, 'error': f'Duplicate of item {seen[key]} for the same facility and variant'})
+        else:
+            seen[key] = index
+
+    facility_ids = {facility_id for facility_id, _ in seen}
+    variant_ids = {variant_id for _, variant_id in seen}
+    known_facilities = set(Facility.objects.filter(id__in=facility_ids).values_list('id', flat=True))
+    known_variants = set(ProductVariant.objects.filter(id__in=variant_ids).values_list('id', flat=True))
+    for (facility_id, variant_id), index in seen.items():
+        if facility_id not in known_facilities:
+            errors.append({'index': index, 'error': f'Facility {facility_id} not found'})
+        if variant_id not in known_variants:
+            errors.append({'index': index, 'error': f'Product variant {variant_id} not found'})
+    return sorted(errors, key=lambda error: error['index'])
+
+
+def upsert_inventories(items, batch_size=None):
+    """
+    Upsert validated ``items`` (dicts with ``facility_id``, ``product_variant_id``
+    and any of UPSERT_COLUMNS), unique per (facility, variant). Returns the
+    created and updated inventory ids.
+    """
+    batch_size = batch_size or INVENTORY_UPSERT_BATCH_SIZE
+    groups = {}
+    for item in items:
+        columns = tuple(column for column in UPSERT_COLUMNS if column in item)
+        groups.setdefault(columns, []).append(item)
+
+    created, updated, variant_ids = [], [], set()
+    with transaction.atomic(), connection.cursor() as cursor:
+        for columns, group in groups.items():
+            sql = _upsert_sql(columns)
+            for start in range(0, len(group), batch_size):
+                batch = group[start:start + batch_size]
+                params = [[item['facility_id'] for item in batch], [item['product_variant_id'] for item in batch]]
+                params += [[item[column] for item in batch] for column in columns]
+                cursor.execute(sql, params)
+                for inventory_id, variant_id, inserted in cursor.fetchall():
+                    (created if inserted else updated).append(inventory_id)
+                    variant_ids.add(variant_id)
+
+        # save() derives a missing discount from the final prices
+        cursor.execute("""
+            UPDATE facility_inventories SET cust_discount = trunc(mrp - selling_price)
+            WHERE id = ANY(%s) AND cust_discount IS NULL
+        """, [created + updated])
+
+        record_changes('inventory', 'created', created)
+        record_changes('inventory', 'updated', updated)
+        invalidate_effective_prices(variant_ids=variant_ids)
+        schedule_cluster_price_refresh(variant_ids=list(variant_ids))
+    return created, updated
@@ -0,0 +1,121 @@
+"""
+Minimal background job runner for CatalogJob.
+
+Jobs are rows in ``catalog_jobs``. They are started in a daemon thread once
+the transaction that queued them commits (or at ``run_after`` for delayed
+retries), and ``manage.py run_catalog_jobs`` picks up anything left pending
+(e.g. after a restart). Claiming a job is a conditional UPDATE, so two
+runners never run it at once.
+
+Progress updates double as a heartbeat: a RUNNING job whose row hasn't been
+touched for CATALOG_JOB_STALE_AFTER seconds lost its worker (crash, deploy)
+and can be claimed again. Handlers therefore have to be safe to re-run from
+the start.
+"""
+import os
+import threading
+import traceback
+from datetime import timedelta
+
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from cms.models.job import CatalogJob
+
+
+CATALOG_JOB_STALE_AFTER = int(os.environ.get("CATALOG_JOB_STALE_AFTER", 1800))
+
+# job_type -> dotted path of a callable taking the CatalogJob
+JOB_HANDLERS = {
+    CatalogJob.EAN_VALIDATION: 'cms.utils.ean_validation.run_ean_validation',
+    CatalogJob.PRICE_OVERRIDE: 'cms.utils.price_override.run_price_override_job',
+    CatalogJob.FACILITY_CLONE: 'cms.utils.facility_clone.run_facility_clone_job',
+}
+
+
+def enqueue_job(job_type, params=None, user=None, source=None, total_count=0, run_async=True, run_after=None):
+    """
+    Create a pending job. With ``run_async`` it starts in a background thread
+    after the current transaction commits (immediately outside a transaction),
+    or not before ``run_after`` when that is given.
+    """
+    job = CatalogJob.objects.create(
+        job_type=job_type,
+        params=params or {},
+        source=source,
+        total_count=total_count,
+        run_after=run_after,
+        created_by=user,
+        updated_by=user,
+    )
+    if run_async:
+        delay = max((run_after - timezone.now()).total_seconds(), 0) if run_after else 0
+        transaction.on_commit(lambda: start_job_thread(job.id, delay=delay))
+    return job
+
+
+def start_job_thread(job_id, delay=0):
+    thread = threading.Timer(delay, _run_in_thread, args=(job_id,))
+    thread.daemon = True
+    thread.name = f'catalog-job-{job_id}'
+    thread.start()
+    return thread
+
+
+def claimable_jobs(now=None):
+    """Pending jobs that are due, and running jobs whose worker stopped reporting progress"""
+    now = now or timezone.now()
+    return CatalogJob.objects.filter(
+        (Q(status=CatalogJob.PENDING) & (Q(run_after__isnull=True) | Q(run_after__lte=now)))
+        | Q(status=CatalogJob.RUNNING, updation_date__lt=now - timedelta(seconds=CATALOG_JOB_STALE_AFTER))
+    )
+
+
+def _run_in_thread(job_id):
+    close_old_connections()
+    try:
+        run_job(job_id)
+    finally:
+        connection.close()
+
+
+def run_job(job_id):
+    """Claim and run a due or stale job. Returns False if it isn't claimable."""
+    now = timezone.now()
+    # A stale job restarts from scratch, so its counters restart too
+    claimed = claimable_jobs(now).filter(id=job_id).update(
+        status=CatalogJob.RUNNING, started_at=now, updation_date=now,
+        processed_count=0, success_count=0, failure_count=0,
+    )
+    if not claimed:
+        return False
+
+    job = CatalogJob.objects.get(id=job_id)
+    print(f"⚙️ Starting {job}")
+    try:
+        handler = import_string(JOB_HANDLERS[job.job_type])
+        handler(job)
+    except Exception as e:
+        traceback.print_exc()
+        job.status = CatalogJob.FAILED
+        job.error = str(e)
+    else:
+        job.status = CatalogJob.COMPLETED
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at', 'updation_date'])
+    print(f"✅ Finished {job}")
+    return True
+
+
+def update_progress(job, processed=0, success=0, failure=0, total=None):
+    """Bump a job's counters and persist them with its result so pollers see progress"""
+    job.processed_count += processed
+    job.success_count += success
+    job.failure_count += failure
+    fields = ['processed_count', 'success_count', 'failure_count', 'result', 'updation_date']
+    if total is not None:
+        job.total_count = total
+        fields.append('total_count')
+    job.save(update_fields=fields)
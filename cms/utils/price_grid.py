@@ -0,0 +1,85 @@
+"""
+Columnar variant x facility price grid for the pricing screen.
+
+The grid is built from one LEFT JOIN ``values_list`` query over variants and
+their inventories in the requested facilities, then reshaped with NumPy:
+
+    variant_ids   [v]         product_ids [v]
+    base_price    [v]         mrp         [v]
+    facility_ids  [f]         cluster_ids [f]
+    selling_price [v][f]      (null where the variant has no inventory)
+
+Stocked cells hold the effective selling price, resolved in one batch.
+
+Payload size grows with the number of cells rather than with nested
+per-facility dicts.
+"""
+import numpy as np
+from django.db.models import FilteredRelation, Q
+
+from cms.models.facility import Facility
+from cms.utils.effective_price import price_key, resolve_prices
+
+
+def _column(values):
+    """Float column with NaN -> None, ready for JSON/MessagePack"""
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+def build_price_grid(variants, facility_ids):
+    """
+    Grid for ``variants`` (a ProductVariant queryset) across ``facility_ids``.
+    Stocked cells hold the effective selling price (cms.utils.effective_price).
+    """
+    facility_ids = sorted({int(facility_id) for facility_id in facility_ids})
+
+    rows = (
+        variants.annotate(
+            grid_inventory=FilteredRelation(
+                'facility_inventories',
+                condition=Q(facility_inventories__facility_id__in=facility_ids, facility_inventories__is_active=True),
+            )
+        )
+        .order_by('id')
+        .values_list(
+            'id', 'product_id', 'base_price', 'mrp', 'grid_inventory__facility_id'
+        )
+    )
+    data = np.array(list(rows), dtype=float).reshape(-1, 5)
+
+    variant_ids, row_index = np.unique(data[:, 0].astype(np.int64), return_inverse=True)
+    first_row = np.unique(row_index, return_index=True)[1]
+    product_ids = data[first_row, 1].astype(np.int64)
+    base_price = data[first_row, 2]
+    mrp = data[first_row, 3]
+
+    selling = np.full((variant_ids.size, len(facility_ids)), np.nan)
+    stocked = ~np.isnan(data[:, 4])
+    if stocked.any():
+        cell_facilities = data[stocked, 4].astype(np.int64)
+        cell_variants = data[stocked, 0].astype(np.int64)
+        prices = resolve_prices(zip(cell_facilities.tolist(), cell_variants.tolist()))
+        column_index = np.searchsorted(facility_ids, cell_facilities)
+        selling[row_index[stocked], column_index] = np.array([
+            prices[price_key(facility_id, variant_id)].selling_price
+            for facility_id, variant_id in zip(cell_facilities.tolist(), cell_variants.tolist())
+        ], dtype=float)
+
+    # First cluster per facility, as the facility pricing serializer reports it
+    clusters = {}
+    for facility_id, cluster_id in (
+        Facility.clusters.through.objects.filter(facility_id__in=facility_ids)
+        .order_by('id')
+        .values_list('facility_id', 'cluster_id')
+    ):
+        clusters.setdefault(facility_id, cluster_id)
+
+    return {
+        'variant_ids': variant_ids.tolist(),
+        'product_ids': product_ids.tolist(),
+        'base_price': _column(base_price),
+        'mrp': _column(mrp),
+        'facility_ids': facility_ids,
+        'cluster_ids': [clusters.get(facility_id) for facility_id in facility_ids],
+        'selling_price': [_column(row) for row in selling],
+    }
@@ -0,0 +1,154 @@
+"""
+Price guardrails from the pricing limits carried by ProductVariant.
+
+A candidate selling price is checked against these rules, in this order:
+
+- ``exceeds_mrp``: above a positive MRP.
+- ``below_margin_min`` / ``above_margin_max``: margin over the base price,
+  in percent, outside ``margin_min`` .. ``margin_max``.
+- ``below_peer_margin_min`` / ``above_peer_margin_max``: discount under the
+  peer (platform) selling price ``psp``, in percent, outside
+  ``peer_margin_min`` .. ``peer_margin_max``.
+- ``below_wac``: under the weighted average cost.
+- ``below_wac_threshold``: markup over WAC under ``threshold_wac`` percent.
+
+Limits left at their 0 default are not enforced, except that a 0 minimum
+applies once the matching maximum is set. Margin rules need a positive base
+price, peer rules a positive ``psp`` and WAC rules a positive ``wac``.
+
+``evaluate_guardrails`` checks a whole candidate set in one NumPy pass.
+``guardrail_reason_sql`` expresses the same rules as one SQL ``CASE`` for
+the set-based override.
+"""
+import numpy as np
+
+from cms.models.product import ProductVariant
+
+
+LIMIT_FIELDS = (
+    'base_price', 'mrp', 'psp', 'margin_min', 'margin_max',
+    'peer_margin_min', 'peer_margin_max', 'wac', 'threshold_wac',
+)
+
+RULES = (
+    'exceeds_mrp',
+    'below_margin_min',
+    'above_margin_max',
+    'below_peer_margin_min',
+    'above_peer_margin_max',
+    'below_wac',
+    'below_wac_threshold',
+)
+
+# Rules past the MRP ceiling, for callers that report MRP breaches themselves
+LIMIT_RULES = tuple(rule for rule in RULES if rule != 'exceeds_mrp')
+
+# Per rule: SQL condition over ``{price}`` and the variant columns of ``{v}``
+RULE_SQL = {
+    'exceeds_mrp': "COALESCE({v}.mrp, 0) > 0 AND {price} > {v}.mrp",
+    'below_margin_min': (
+        "COALESCE({v}.base_price, 0) > 0 AND ({v}.margin_min <> 0 OR {v}.margin_max <> 0)"
+        " AND ({price} - {v}.base_price) / {v}.base_price * 100 < {v}.margin_min"
+    ),
+    'above_margin_max': (
+        "COALESCE({v}.base_price, 0) > 0 AND {v}.margin_max <> 0"
+        " AND ({price} - {v}.base_price) / {v}.base_price * 100 > {v}.margin_max"
+    ),
+    'below_peer_margin_min': (
+        "COALESCE({v}.psp, 0) > 0 AND ({v}.peer_margin_min <> 0 OR {v}.peer_margin_max <> 0)"
+        " AND ({v}.psp - {price}) / {v}.psp * 100 < {v}.peer_margin_min"
+    ),
+    'above_peer_margin_max': (
+        "COALESCE({v}.psp, 0) > 0 AND {v}.peer_margin_max <> 0"
+        " AND ({v}.psp - {price}) / {v}.psp * 100 > {v}.peer_margin_max"
+    ),
+    'below_wac': "{v}.wac > 0 AND {price} < {v}.wac",
+    'below_wac_threshold': "{v}.wac > 0 AND {v}.threshold_wac > 0 AND {price} < {v}.wac * (1 + {v}.threshold_wac / 100)",
+}
+
+
+def variant_limits(variant_ids):
+    """{variant_id: (LIMIT_FIELDS values)} with one query"""
+    return {
+        row[0]: row[1:]
+        for row in ProductVariant.objects.filter(id__in=set(variant_ids)).values_list('id', *LIMIT_FIELDS)
+    }
+
+
+def limit_arrays(rows):
+    """Float arrays keyed by LIMIT_FIELDS from ``rows`` of LIMIT_FIELDS tuples (None -> 0)"""
+    data = np.nan_to_num(np.array(list(rows), dtype=float).reshape(-1, len(LIMIT_FIELDS)))
+    return {field: data[:, i] for i, field in enumerate(LIMIT_FIELDS)}
+
+
+def evaluate_guardrails(prices, limits, rules=RULES):
+    """
+    {rule: boolean mask} of the candidate ``prices`` breaking each rule.
+    ``limits`` holds one array per LIMIT_FIELDS entry, aligned with ``prices``.
+    """
+    price = np.asarray(prices, dtype=float)
+    base, mrp, psp = limits['base_price'], limits['mrp'], limits['psp']
+    margin_min, margin_max = limits['margin_min'], limits['margin_max']
+    peer_min, peer_max = limits['peer_margin_min'], limits['peer_margin_max']
+    wac, threshold_wac = limits['wac'], limits['threshold_wac']
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        margin = np.where(base > 0, (price - base) / base * 100, 0)
+        peer_margin = np.where(psp > 0, (psp - price) / psp * 100, 0)
+
+    masks = {
+        'exceeds_mrp': (mrp > 0) & (price > mrp),
+        'below_margin_min': (base > 0) & ((margin_min != 0) | (margin_max != 0)) & (margin < margin_min),
+        'above_margin_max': (base > 0) & (margin_max != 0) & (margin > margin_max),
+        'below_peer_margin_min': (psp > 0) & ((peer_min != 0) | (peer_max != 0)) & (peer_margin < peer_min),
+        'above_peer_margin_max': (psp > 0) & (peer_max != 0) & (peer_margin > peer_max),
+        'below_wac': (wac > 0) & (price < wac),
+        'below_wac_threshold': (wac > 0) & (threshold_wac > 0) & (price < wac * (1 + threshold_wac / 100)),
+    }
+    return {rule: masks[rule] for rule in rules}
+
+
+def violated(masks, size):
+    """Boolean mask of candidates breaking any rule"""
+    combined = np.zeros(size, dtype=bool)
+    for mask in masks.values():
+        combined |= mask
+    return combined
+
+
+def group_violations(masks, describe, sample_size=100):
+    """
+    Violations grouped by rule: {rule: {'count', 'samples'}}, where samples
+    are ``describe(index)`` of the first offending candidates. Rules nobody
+    broke are left out.
+    """
+    grouped = {}
+    for rule, mask in masks.items():
+        indexes = np.flatnonzero(mask)
+        if indexes.size:
+            grouped[rule] = {
+                'count': int(indexes.size),
+                'samples': [describe(int(index)) for index in indexes[:sample_size]],
+            }
+    return grouped
+
+
+def check_variant_prices(variant_ids, prices, describe, rules=RULES, sample_size=100):
+    """
+    Guardrails for candidate ``prices`` of ``variant_ids`` (aligned lists),
+    with the limits loaded in one query. Returns (ok mask, grouped violations).
+    """
+    variant_ids = list(variant_ids)
+    limits_by_variant = variant_limits(variant_ids)
+    empty = (0,) * len(LIMIT_FIELDS)
+    limits = limit_arrays(limits_by_variant.get(variant_id, empty) for variant_id in variant_ids)
+    masks = evaluate_guardrails(prices, limits, rules)
+    return ~violated(masks, len(variant_ids)), group_violations(masks, describe, sample_size)
+
+
+def guardrail_reason_sql(price_sql, alias='v', rules=RULES):
+    """SQL ``CASE`` naming the first rule ``price_sql`` breaks for variant ``alias``, else NULL"""
+    whens = '\n'.join(
+        f"WHEN {RULE_SQL[rule].format(price=f'({price_sql})', v=alias)} THEN '{rule}'" for rule in rules
+    )
+    return f"CASE\n{whens}\nEND"
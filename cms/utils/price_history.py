@@ -0,0 +1,260 @@
+"""
+Partitioning and retention for ``product_price_history``.
+
+The table is range-partitioned by month on ``creation_date``. Partitions are
+named ``product_price_history_pYYYYMM``, and a ``product_price_history_default``
+partition catches rows outside every month range.
+
+``manage.py maintain_price_history_partitions`` creates partitions ahead of
+time. Once a month falls outside the retention window, the command rolls the
+partition up into ``product_price_history_daily`` and detaches it.
+
+Readers should bound ``creation_date`` (``history_window``) so Postgres
+scans only the partitions in range.
+
+Repricings record one PriceChangeBatch with the shared user, margin, type
+and reason. ``copy_price_history`` streams the narrow per-row records with
+COPY.
+"""
+import csv
+import datetime
+import io
+import os
+import re
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from cms.utils.cluster_price_summary import record_price_change_batch
+
+
+PARENT_TABLE = 'product_price_history'
+DEFAULT_PARTITION = f'{PARENT_TABLE}_default'
+PARTITION_NAME_RE = re.compile(rf'^{PARENT_TABLE}_p(\d{{4}})(\d{{2}})$')
+
+PRICE_HISTORY_RETENTION_MONTHS = int(os.environ.get("PRICE_HISTORY_RETENTION_MONTHS", 12))
+
+
+HISTORY_COPY_COLUMNS = (
+    'id', 'batch_id', 'product_id', 'product_variant_id', 'cluster_id', 'facility_id',
+    'old_price', 'new_price', 'old_csp', 'new_csp', 'creation_date', 'updation_date',
+)
+
+
+def create_price_change_batch(change_type, user=None, cluster=None, percentage_change=None,
+                              change_reason=None, source=None):
+    from cms.models.product import PriceChangeBatch
+
+    return PriceChangeBatch.objects.create(
+        change_type=change_type,
+        user=user if user is not None and user.is_authenticated else None,
+        cluster=cluster,
+        percentage_change=percentage_change,
+        change_reason=change_reason,
+        source=source,
+    )
+
+
+def copy_price_history(batch, rows):
+    """
+    Write ``rows`` of ``(product_id, variant_id, cluster_id, facility_id,
+    old_price, new_price, old_csp, new_csp)`` for ``batch`` with one COPY.
+    Ids are drawn from the table's sequence first; returns them in row order.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+
+    now = timezone.now().isoformat()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+            [PARENT_TABLE, len(rows)],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for history_id, row in zip(ids, rows):
+            writer.writerow((history_id, batch.id, *row, now, now))
+        buffer.seek(0)
+        cursor.copy_expert(
+            f"COPY {PARENT_TABLE} ({', '.join(HISTORY_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+
+    batch.row_count += len(rows)
+    batch.save(update_fields=['row_count', 'updation_date'])
+    record_price_change_batch(batch, len(rows))
+    return ids
+
+
+def month_start(value, offset=0):
+    """First day of the month of ``value``, shifted by ``offset`` months"""
+    index = value.year * 12 + value.month - 1 + offset
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{PARENT_TABLE}_p{month.year:04d}{month.month:02d}'
+
+
+def retention_horizon(retention_months=None):
+    """Start of the oldest month still kept in the partitioned table"""
+    if retention_months is None:
+        retention_months = PRICE_HISTORY_RETENTION_MONTHS
+    horizon = month_start(timezone.localdate(), -retention_months)
+    return timezone.make_aware(datetime.datetime.combine(horizon, datetime.time.min))
+
+
+def _parse_bound(value, end=False):
+    parsed = parse_datetime(value)
+    if parsed is not None:
+        return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(f"Invalid date: {value}")
+    if end:
+        day += datetime.timedelta(days=1)
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def history_window(start_date=None, end_date=None, default_to_horizon=True):
+    """
+    ``creation_date`` filter kwargs for ``start_date``/``end_date`` strings.
+    A date-only ``end_date`` covers that whole day. Without ``start_date``
+    the window starts at the retention horizon. Older months are rolled up
+    and detached, so the bound loses no rows and lets Postgres skip them.
+    Raises ValueError on unparseable dates.
+    """
+    window = {}
+    if start_date:
+        window['creation_date__gte'] = _parse_bound(start_date)
+    elif default_to_horizon:
+        window['creation_date__gte'] = retention_horizon()
+    if end_date:
+        if parse_datetime(end_date) is not None:
+            window['creation_date__lte'] = _parse_bound(end_date)
+        else:
+            window['creation_date__lt'] = _parse_bound(end_date, end=True)
+    return window
+
+
+def attached_partitions():
+    """{month: table name} of the monthly partitions currently attached"""
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass
+        """, [PARENT_TABLE])
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = {}
+    for name in names:
+        match = PARTITION_NAME_RE.match(name)
+        if match:
+            partitions[datetime.date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def create_partition(month):
+    """
+    Create and attach the partition for ``month``. Rows of that month that
+    landed in the default partition are moved into it first, so the attach
+    always succeeds.
+    """
+    name = partition_name(month)
+    lower, upper = month, month_start(month, 1)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        cursor.execute(f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION}
+                WHERE creation_date >= %s AND creation_date < %s
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """, [lower, upper])
+        moved = cursor.rowcount
+        cursor.execute(
+            f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+            [lower, upper],
+        )
+    return name, moved
+
+
+def ensure_partitions(months_ahead=3):
+    """
+    Create missing partitions from this month through ``months_ahead``, plus
+    one for every month that has rows stranded in the default partition.
+    """
+    existing = attached_partitions()
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT DISTINCT date_trunc('month', creation_date)::date FROM {DEFAULT_PARTITION}")
+        months = {row[0] for row in cursor.fetchall()}
+
+    month = month_start(timezone.localdate())
+    while month <= month_start(timezone.localdate(), months_ahead):
+        months.add(month)
+        month = month_start(month, 1)
+
+    return [create_partition(month) for month in sorted(months - set(existing))]
+
+
+def rollup_partition(name):
+    """Aggregate one partition into product_price_history_daily; idempotent per partition"""
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO product_price_history_daily (
+                day, product_id, product_variant_id, cluster_id, facility_id, change_type,
+                change_count, first_old_price, last_new_price, first_old_csp, last_new_csp,
+                min_new_price, max_new_price, avg_percentage_change, creation_date, updation_date
+            )
+            SELECT
+                (h.creation_date AT TIME ZONE %s)::date, h.product_id, h.product_variant_id, max(h.cluster_id),
+                h.facility_id, COALESCE(h.change_type, b.change_type), count(*),
+                (array_agg(h.old_price ORDER BY h.creation_date, h.id))[1],
+                (array_agg(h.new_price ORDER BY h.creation_date DESC, h.id DESC))[1],
+                (array_agg(h.old_csp ORDER BY h.creation_date, h.id))[1],
+                (array_agg(h.new_csp ORDER BY h.creation_date DESC, h.id DESC))[1],
+                min(h.new_price), max(h.new_price),
+                COALESCE(avg(COALESCE(h.percentage_change, b.percentage_change)), 0), now(), now()
+            FROM {name} h
+            LEFT JOIN price_change_batches b ON b.id = h.batch_id
+            GROUP BY 1, h.product_id, h.product_variant_id, h.facility_id, COALESCE(h.change_type, b.change_type)
+            ON CONFLICT (day, product_variant_id, facility_id, change_type) DO UPDATE SET
+                change_count = EXCLUDED.change_count,
+                first_old_price = EXCLUDED.first_old_price,
+                last_new_price = EXCLUDED.last_new_price,
+                first_old_csp = EXCLUDED.first_old_csp,
+                last_new_csp = EXCLUDED.last_new_csp,
+                min_new_price = EXCLUDED.min_new_price,
+                max_new_price = EXCLUDED.max_new_price,
+                avg_percentage_change = EXCLUDED.avg_percentage_change,
+                updation_date = now()
+        """, [timezone.get_current_timezone_name()])
+        return cursor.rowcount
+
+
+def expire_partitions(retention_months=None, drop=False):
+    """
+    Roll up and detach every partition older than the retention horizon.
+    Detached partitions stay as standalone archive tables unless ``drop``.
+    Returns [(name, rollup rows)].
+    """
+    horizon = retention_horizon(retention_months).date()
+    expired = []
+    for month, name in sorted(attached_partitions().items()):
+        if month_start(month, 1) > horizon:
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            rows = rollup_partition(name)
+            cursor.execute(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}")
+            if drop:
+                cursor.execute(f"DROP TABLE {name}")
+        expired.append((name, rows))
+    return expired
+
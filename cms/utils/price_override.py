@@ -0,0 +1,469 @@
+"""
+Set-based margin override for facility inventories.
+
+``apply_price_override`` reprices every (variant, facility) pair of a target
+set with a fixed number of SQL statements:
+
+1. one aggregate over the pairs for the updated/rejected counts,
+2. two bounded sample queries for the API response,
+3. one ``INSERT ... SELECT`` into ``product_price_history`` (narrow rows of
+   one PriceChangeBatch),
+4. one ``INSERT ... SELECT`` of ``price`` events into the change feed,
+5. one ``UPDATE facility_inventories ... FROM variants``.
+
+A pair needs an active inventory row and a positive current price, which
+is its effective price (cms.utils.effective_price), the same price the
+pricing screens show. The new price is ``base_price * (1 + margin / 100)``. It must not exceed a positive MRP, and
+it must pass the variant's price guardrails (cms.utils.price_guardrails);
+rejections are counted per rule.
+
+Large overrides run as a ``price_override`` CatalogJob. The job commits one
+chunk of variants at a time. Overrides on the same cluster are serialized
+with Postgres advisory locks, taken in sorted order: a job holds session
+locks for its whole run, and a synchronous override takes transaction
+locks and fails fast when a job owns the cluster.
+"""
+import os
+from contextlib import contextmanager
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef
+from django.db.models.expressions import RawSQL
+
+from cms.models.category import Category
+from cms.models.facility import Cluster, FacilityInventory
+from cms.models.product import PriceChangeBatch, ProductVariant
+from cms.utils.change_feed import price_events_sql
+from cms.utils.cluster_price_summary import record_price_change_batch
+from cms.utils.cluster_pricing import schedule_cluster_price_refresh
+from cms.utils.effective_price import effective_price_sql, invalidate_effective_prices
+from cms.utils.jobs import update_progress
+from cms.utils.price_guardrails import (
+    LIMIT_FIELDS, LIMIT_RULES, evaluate_guardrails, guardrail_reason_sql, limit_arrays, violated,
+)
+
+
+SAMPLE_SIZE = 100
+OVERRIDE_CHUNK_SIZE = int(os.environ.get("PRICE_OVERRIDE_CHUNK_SIZE", 1000))
+
+# Two-int advisory lock keys: (namespace, id)
+CLUSTER_LOCK_NAMESPACE = 7301
+FACILITY_LOCK_NAMESPACE = 7302  # facilities that belong to no cluster
+
+CHANGE_TYPE = 'override_price_update'
+
+# Shared expressions; ``fi`` is facility_inventories, ``v`` is variants
+NEW_PRICE_SQL = "COALESCE(v.base_price, 0) * (1 + %(margin)s::double precision / 100)"
+OLD_PRICE_SQL = f"COALESCE({effective_price_sql('fi', 'v')}, 0)"
+HAS_PRICE_SQL = f"({OLD_PRICE_SQL} > 0)"
+EXCEEDS_MRP_SQL = f"(COALESCE(v.mrp, 0) > 0 AND {NEW_PRICE_SQL} > COALESCE(v.mrp, 0))"
+# The variant's other pricing limits; the MRP ceiling keeps its own reason above
+GUARDRAIL_REASON_SQL = guardrail_reason_sql(NEW_PRICE_SQL, 'v', LIMIT_RULES)
+
+
+class PriceOverrideLocked(Exception):
+    """Another override is repricing one of the target clusters"""
+
+
+def override_targets(facility_ids, variant_ids=None, category_ids=None, brand_ids=None,
+                     product_name='', variant_name=''):
+    """Active, published variants stocked in ``facility_ids`` matching the filters"""
+    stocked = FacilityInventory.objects.filter(
+        product_variant=OuterRef('pk'), facility_id__in=facility_ids, is_active=True
+    )
+    variants = ProductVariant.objects.filter(Exists(stocked), is_active=True, is_published=True)
+    if variant_ids:
+        variants = variants.filter(id__in=variant_ids)
+    if product_name:
+        variants = variants.filter(product__name__icontains=product_name)
+    if variant_name:
+        variants = variants.filter(name__icontains=variant_name)
+    if category_ids:
+        variants = variants.filter(product__category_id__in=category_ids)
+    if brand_ids:
+        variants = variants.filter(product__brand_id__in=brand_ids)
+    return variants
+
+
+def override_lock_keys(facility_ids):
+    """Sorted advisory lock keys for the clusters covering ``facility_ids``"""
+    facility_ids = set(facility_ids)
+    memberships = Cluster.facilities.through.objects.filter(facility_id__in=facility_ids)
+    cluster_ids = set(memberships.values_list('cluster_id', flat=True))
+    loose_facilities = facility_ids - set(memberships.values_list('facility_id', flat=True))
+    return sorted(
+        [(CLUSTER_LOCK_NAMESPACE, cluster_id) for cluster_id in cluster_ids]
+        + [(FACILITY_LOCK_NAMESPACE, facility_id) for facility_id in loose_facilities]
+    )
+
+
+@contextmanager
+def hold_override_locks(lock_keys):
+    """Session-level locks for a whole job; waits for earlier overrides to finish"""
+    with connection.cursor() as cursor:
+        acquired = []
+        try:
+            for namespace, key in lock_keys:
+                cursor.execute("SELECT pg_advisory_lock(%s, %s)", [namespace, key])
+                acquired.append((namespace, key))
+            yield
+        finally:
+            for namespace, key in reversed(acquired):
+                cursor.execute("SELECT pg_advisory_unlock(%s, %s)", [namespace, key])
+
+
+def _try_transaction_locks(cursor, lock_keys):
+    for namespace, key in lock_keys:
+        cursor.execute("SELECT pg_try_advisory_xact_lock(%s, %s)", [namespace, key])
+        if not cursor.fetchone()[0]:
+            raise PriceOverrideLocked(
+                "Another price override is running on the selected clusters, try again once it finishes"
+            )
+
+
+def _variant_subquery(variants):
+    """SQL and params selecting the ids of a ProductVariant queryset (slices kept)"""
+    if variants.model is not ProductVariant:
+        raise TypeError("variants must be a ProductVariant queryset")
+    sql, params = variants.values('id').query.sql_with_params()
+    # Named placeholders are used below, so escape and name the subquery's own params
+    named = {f'variant_param_{i}': value for i, value in enumerate(params)}
+    parts = [part.replace('%', '%%') for part in sql.split('%s')]
+    sql = parts[0] + ''.join(f'%({name})s{part}' for name, part in zip(named, parts[1:]))
+    return sql, named
+
+
+def _pairs_cte(variant_sql):
+    """Every target (variant, facility) pair with its decision; NULL reason = updatable"""
+    return f"""
+        WITH pairs AS (
+            SELECT
+                v.id AS variant_id, v.name AS variant_name, v.sku, v.product_id, p.name AS product_name,
+                f.id AS facility_id, f.name AS facility_name, fi.id AS inventory_id,
+                CASE WHEN fi.id IS NOT NULL THEN {OLD_PRICE_SQL} ELSE 0 END AS selling_price,
+                COALESCE(v.base_price, 0) AS base_price, COALESCE(v.mrp, 0) AS mrp,
+                {NEW_PRICE_SQL} AS new_price,
+                CASE
+                    WHEN fi.id IS NULL THEN 'no_inventory_record'
+                    WHEN NOT {HAS_PRICE_SQL} THEN 'no_valid_price'
+                    WHEN {EXCEEDS_MRP_SQL} THEN 'calculated_price_exceeds_mrp'
+                    ELSE {GUARDRAIL_REASON_SQL}
+                END AS reason
+            FROM variants v
+            JOIN products p ON p.id = v.product_id
+            CROSS JOIN facilities f
+            LEFT JOIN facility_inventories fi
+                ON fi.product_variant_id = v.id AND fi.facility_id = f.id AND fi.is_active
+            WHERE v.id IN ({variant_sql}) AND f.id = ANY(%(facility_ids)s)
+        )
+    """
+
+
+def _eligible_where(variant_sql):
+    return f"""
+        v.id = fi.product_variant_id
+        AND fi.facility_id = ANY(%(facility_ids)s)
+        AND fi.is_active
+        AND fi.product_variant_id IN ({variant_sql})
+        AND {HAS_PRICE_SQL}
+        AND NOT {EXCEEDS_MRP_SQL}
+        AND {GUARDRAIL_REASON_SQL} IS NULL
+    """
+
+
+def _fetch_dicts(cursor):
+    columns = [col[0] for col in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def apply_price_override(variants, facility_ids, margin, cluster_id=None, user_id=None,
+                         write_history=True, sample_size=SAMPLE_SIZE, lock=True, batch=None):
+    """
+    Reprice ``variants`` (a ProductVariant queryset) in ``facility_ids``.
+
+    History rows go to ``batch``, or to a new PriceChangeBatch when none is
+    given.
+
+    Returns a dict with the counts and at most ``sample_size`` updated
+    variants and rejected pairs for the response. With ``lock`` the target
+    clusters are locked for the transaction; PriceOverrideLocked is raised
+    if a running override holds them.
+    """
+    facility_ids = list(facility_ids)
+    lock_keys = override_lock_keys(facility_ids) if lock else []
+    variant_sql, params = _variant_subquery(variants)
+    params.update({
+        'margin': float(margin),
+        'facility_ids': facility_ids,
+        'cluster_id': cluster_id,
+        'sample_size': sample_size,
+    })
+    pairs_cte = _pairs_cte(variant_sql)
+    eligible_where = _eligible_where(variant_sql)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        _try_transaction_locks(cursor, lock_keys)
+
+        # Decisions are read before the UPDATE changes selling prices
+        cursor.execute(f"""
+            {pairs_cte}
+            SELECT
+                (SELECT count(DISTINCT variant_id) FROM pairs),
+                (SELECT count(*) FROM pairs WHERE reason IS NULL),
+                (SELECT COALESCE(json_object_agg(reason, n), '{{}}')
+                 FROM (SELECT reason, count(*) AS n FROM pairs WHERE reason IS NOT NULL GROUP BY reason) r)
+        """, params)
+        variants_processed, updated, rejected_counts = cursor.fetchone()
+        rejected_by_reason = {
+            reason: rejected_counts.get(reason, 0)
+            for reason in ['no_inventory_record', 'no_valid_price', 'calculated_price_exceeds_mrp', *LIMIT_RULES]
+        }
+
+        cursor.execute(f"""
+            {pairs_cte}
+            SELECT
+                variant_id, variant_name, sku, product_id, product_name, facility_id, facility_name,
+                base_price, selling_price, mrp,
+                CASE WHEN reason NOT IN ('no_inventory_record', 'no_valid_price') THEN new_price ELSE 0 END AS calculated_price,
+                reason
+            FROM pairs
+            WHERE reason IS NOT NULL
+            ORDER BY variant_id, facility_id
+            LIMIT %(sample_size)s
+        """, params)
+        rejected_samples = _fetch_dicts(cursor)
+
+        cursor.execute(f"""
+            {pairs_cte}
+            SELECT
+                variant_id, variant_name, sku, product_id, product_name,
+                min(base_price) AS base_price, min(mrp) AS mrp,
+                COALESCE(
+                    json_agg(json_build_object(
+                        'facility_id', facility_id,
+                        'facility_name', facility_name,
+                        'old_selling_price', selling_price,
+                        'new_selling_price', new_price
+                    ) ORDER BY facility_id) FILTER (WHERE reason IS NULL),
+                    '[]'
+                ) AS selling_prices,
+                count(*) FILTER (WHERE reason IS NULL) AS facilities_updated,
+                count(*) FILTER (WHERE reason IS NOT NULL) AS facilities_rejected
+            FROM pairs
+            GROUP BY variant_id, variant_name, sku, product_id, product_name
+            ORDER BY variant_id
+            LIMIT %(sample_size)s
+        """, params)
+        variant_samples = _fetch_dicts(cursor)
+        for row in variant_samples:
+            row['status'] = 'updated' if row['facilities_updated'] else 'rejected'
+
+        history_rows = 0
+        if write_history and updated:
+            if batch is None:
+                batch = PriceChangeBatch.objects.create(
+                    change_type=CHANGE_TYPE,
+                    user_id=user_id,
+                    cluster_id=cluster_id,
+                    percentage_change=float(margin),
+                    change_reason=f'Override price update by {margin}%',
+                    source='override-price',
+                )
+            params['batch_id'] = batch.id
+            cursor.execute(f"""
+                INSERT INTO product_price_history (
+                    batch_id, product_id, product_variant_id, cluster_id, facility_id,
+                    old_price, new_price, old_csp, new_csp, creation_date, updation_date
+                )
+                SELECT
+                    %(batch_id)s, v.product_id, v.id, %(cluster_id)s, fi.facility_id,
+                    {OLD_PRICE_SQL}, {NEW_PRICE_SQL}, {OLD_PRICE_SQL}, {NEW_PRICE_SQL}, now(), now()
+                FROM facility_inventories fi, variants v
+                WHERE {eligible_where}
+            """, params)
+            history_rows = cursor.rowcount
+            PriceChangeBatch.objects.filter(id=batch.id).update(row_count=F('row_count') + history_rows)
+            record_price_change_batch(batch, history_rows)
+
+        if updated:
+            cursor.execute(price_events_sql(OLD_PRICE_SQL, NEW_PRICE_SQL, eligible_where), params)
+            cursor.execute(f"""
+                UPDATE facility_inventories fi
+                SET selling_price = {NEW_PRICE_SQL}, updation_date = now()
+                FROM variants v
+                WHERE {eligible_where}
+                RETURNING fi.product_variant_id
+            """, params)
+            updated = cursor.rowcount
+            repriced_variant_ids = {row[0] for row in cursor.fetchall()}
+            schedule_cluster_price_refresh(variant_ids=repriced_variant_ids)
+            invalidate_effective_prices(variant_ids=repriced_variant_ids)
+
+    return {
+        'variants_processed': variants_processed,
+        'updated': updated,
+        'rejected': sum(rejected_by_reason.values()),
+        'rejected_by_reason': rejected_by_reason,
+        'history_rows': history_rows,
+        'price_change_batch_id': batch.id if history_rows else None,
+        'variant_samples': variant_samples,
+        'rejected_samples': rejected_samples,
+    }
+
+
+def simulate_price_override(variants, facility_ids, margin, bins=10):
+    """
+    Impact of applying ``margin`` to ``variants`` in ``facility_ids``,
+    without writing anything. All affected inventory rows are loaded, with
+    their current effective prices, in one query into NumPy arrays and the
+    override rules are evaluated vectorized.
+    """
+    facility_ids = list(facility_ids)
+    rows = FacilityInventory.objects.filter(
+        facility_id__in=facility_ids, is_active=True, product_variant__in=variants.order_by()
+    ).annotate(
+        current_price=RawSQL(effective_price_sql(FacilityInventory._meta.db_table, ProductVariant._meta.db_table), []),
+    ).values_list(
+        'current_price', 'product_variant__product__category_id',
+        *(f'product_variant__{field}' for field in LIMIT_FIELDS),
+    )
+    data = np.array(list(rows), dtype=float).reshape(-1, 2 + len(LIMIT_FIELDS))
+    selling = np.nan_to_num(data[:, 0])
+    category_ids = data[:, 1].astype(np.int64)
+    limits = limit_arrays(data[:, 2:])
+    base, mrp = limits['base_price'], limits['mrp']
+
+    new_price = base * (1 + float(margin) / 100)
+    has_price = selling > 0
+    exceeds_mrp = has_price & (mrp > 0) & (new_price > mrp)
+    guardrail_masks = {
+        rule: has_price & ~exceeds_mrp & mask
+        for rule, mask in evaluate_guardrails(new_price, limits, LIMIT_RULES).items()
+    }
+    eligible = has_price & ~exceeds_mrp & ~violated(guardrail_masks, data.shape[0])
+
+    delta = (new_price - selling)[eligible]
+    # Margin over base price, before and after, where it is defined
+    with_base = eligible & (base > 0)
+    margin_change = float(margin) - (selling[with_base] - base[with_base]) / base[with_base] * 100
+
+    counts, edges = np.histogram(delta, bins=bins) if delta.size else (np.zeros(0, dtype=int), np.zeros(0))
+
+    categories = []
+    if category_ids.size:
+        unique_ids, index = np.unique(category_ids, return_inverse=True)
+        rows_per_category = np.bincount(index, minlength=unique_ids.size)
+        updated_per_category = np.bincount(index, weights=eligible, minlength=unique_ids.size)
+        breaches_per_category = np.bincount(index, weights=exceeds_mrp, minlength=unique_ids.size)
+        delta_per_category = np.bincount(index, weights=np.where(eligible, new_price - selling, 0), minlength=unique_ids.size)
+        names = dict(Category.objects.filter(id__in=unique_ids.tolist()).values_list('id', 'name'))
+        for i, category_id in enumerate(unique_ids.tolist()):
+            updated = int(updated_per_category[i])
+            categories.append({
+                'category_id': category_id,
+                'category_name': names.get(category_id),
+                'inventory_rows': int(rows_per_category[i]),
+                'would_update': updated,
+                'mrp_breaches': int(breaches_per_category[i]),
+                'avg_price_delta': round(float(delta_per_category[i]) / updated, 2) if updated else 0,
+            })
+        categories.sort(key=lambda row: row['inventory_rows'], reverse=True)
+
+    def _round(value):
+        return round(float(value), 2)
+
+    return {
+        'inventory_rows': int(data.shape[0]),
+        'would_update': int(eligible.sum()),
+        'mrp_breaches': int(exceeds_mrp.sum()),
+        'guardrail_breaches': {rule: int(mask.sum()) for rule, mask in guardrail_masks.items()},
+        'no_valid_price': int((~has_price).sum()),
+        'price_delta': {
+            'min': _round(delta.min()) if delta.size else 0,
+            'max': _round(delta.max()) if delta.size else 0,
+            'mean': _round(delta.mean()) if delta.size else 0,
+            'median': _round(np.median(delta)) if delta.size else 0,
+            'total': _round(delta.sum()),
+            'histogram': {
+                'bin_edges': [_round(edge) for edge in edges],
+                'counts': counts.tolist(),
+            },
+        },
+        'avg_current_selling_price': _round(selling[eligible].mean()) if delta.size else 0,
+        'avg_new_selling_price': _round(new_price[eligible].mean()) if delta.size else 0,
+        'avg_margin_change_pct': _round(margin_change.mean()) if margin_change.size else 0,
+        'categories': categories,
+    }
+
+
+def run_price_override_job(job):
+    """
+    ``price_override`` handler: reprice the job's targets one committed
+    chunk of variants at a time, recording progress after each chunk.
+    """
+    params = job.params
+    facility_ids = params['facility_ids']
+    variant_ids = list(
+        override_targets(
+            facility_ids,
+            variant_ids=params.get('variant_ids'),
+            category_ids=params.get('category_ids'),
+            brand_ids=params.get('brand_ids'),
+            product_name=params.get('product_name', ''),
+            variant_name=params.get('variant_name', ''),
+        ).order_by('id').values_list('id', flat=True)
+    )
+    result = {
+        'margin_applied': params['margin'],
+        'updated': 0,
+        'rejected': 0,
+        'rejected_by_reason': {},
+        'history_rows': 0,
+        'price_change_batch_id': None,
+        'rejected_samples': [],
+    }
+    batch = None
+    if params.get('write_history', True):
+        # One batch for the whole job, however many chunks it takes
+        batch = PriceChangeBatch.objects.create(
+            change_type=CHANGE_TYPE,
+            user_id=params.get('user_id'),
+            cluster_id=params.get('cluster_id'),
+            percentage_change=float(params['margin']),
+            change_reason=f"Override price update by {params['margin']}%",
+            source=f'catalog-job-{job.id}',
+        )
+        result['price_change_batch_id'] = batch.id
+    job.result = result
+    update_progress(job, total=len(variant_ids))
+
+    with hold_override_locks(override_lock_keys(facility_ids)):
+        for start in range(0, len(variant_ids), OVERRIDE_CHUNK_SIZE):
+            chunk = variant_ids[start:start + OVERRIDE_CHUNK_SIZE]
+            chunk_result = apply_price_override(
+                ProductVariant.objects.filter(id__in=chunk),
+                facility_ids,
+                params['margin'],
+                cluster_id=params.get('cluster_id'),
+                user_id=params.get('user_id'),
+                write_history=params.get('write_history', True),
+                sample_size=SAMPLE_SIZE - len(result['rejected_samples']),
+                lock=False,
+                batch=batch,
+            )
+
+            result['updated'] += chunk_result['updated']
+            result['rejected'] += chunk_result['rejected']
+            result['history_rows'] += chunk_result['history_rows']
+            for reason, count in chunk_result['rejected_by_reason'].items():
+                result['rejected_by_reason'][reason] = result['rejected_by_reason'].get(reason, 0) + count
+            result['rejected_samples'].extend(chunk_result['rejected_samples'])
+
+            job.result = result
+            update_progress(
+                job,
+                processed=len(chunk),
+                success=chunk_result['updated'],
+                failure=chunk_result['rejected'],
+            )
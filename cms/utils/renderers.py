@@ -0,0 +1,28 @@
+"""
+MessagePack rendering.
+
+Views that list ``RESPONSE_RENDERERS`` also answer ``?format=msgpack`` or
+``Accept: application/msgpack``. ``msgpack`` is in requirements.txt; should
+it be missing, the views fall back to offering only JSON.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - safety net, msgpack is a requirement
+    msgpack = None
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, use_bin_type=True)
+
+
+RESPONSE_RENDERERS = [JSONRenderer, MessagePackRenderer] if msgpack is not None else [JSONRenderer]
@@ -0,0 +1,121 @@
+"""
+Scheduled price changes.
+
+OverridePriceView with an ``effective_at`` stores a ScheduledPriceChange
+instead of repricing during the day. ``manage.py apply_scheduled_price_changes``
+(run from cron at the maintenance window, or with ``--loop``) applies every
+due change.
+
+Due changes are grouped by the clusters they touch. Each group is applied
+in one transaction while the group's override locks are held. Every change
+in the group is one set-based ``apply_price_override`` pass, with history
+written by ``INSERT ... SELECT`` into a PriceChangeBatch. Changes are
+claimed with ``SKIP LOCKED``, so concurrent schedulers never apply a change
+twice.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from cms.models.facility import Facility
+from cms.models.product import PriceChangeBatch, ScheduledPriceChange
+from cms.utils.price_override import (
+    CHANGE_TYPE,
+    apply_price_override,
+    hold_override_locks,
+    override_lock_keys,
+    override_targets,
+)
+
+
+def resolve_facilities(cluster_ids, facility_ids):
+    """Same rule as OverridePriceView: explicit facilities win, else the clusters' active facilities"""
+    if facility_ids:
+        facilities = Facility.objects.filter(id__in=facility_ids, is_active=True)
+    else:
+        facilities = Facility.objects.filter(clusters__id__in=cluster_ids, clusters__is_active=True, is_active=True)
+    return sorted(set(facilities.values_list('id', flat=True)))
+
+
+def _apply_change(change, facility_ids):
+    cluster_id = min(change.cluster_ids) if change.cluster_ids else None
+    batch = None
+    if change.write_history:
+        batch = PriceChangeBatch.objects.create(
+            change_type=CHANGE_TYPE,
+            user_id=change.created_by_id,
+            cluster_id=cluster_id,
+            percentage_change=change.margin,
+            change_reason=f'Scheduled override by {change.margin}% effective {change.effective_at.isoformat()}',
+            source=f'scheduled-price-change-{change.id}',
+        )
+
+    variants = override_targets(
+        facility_ids,
+        variant_ids=change.variant_ids,
+        category_ids=change.category_ids,
+        brand_ids=change.brand_ids,
+        product_name=change.product_name,
+        variant_name=change.variant_name,
+    )
+    result = apply_price_override(
+        variants,
+        facility_ids,
+        change.margin,
+        cluster_id=cluster_id,
+        user_id=change.created_by_id,
+        write_history=change.write_history,
+        lock=False,
+        batch=batch,
+    )
+    return {
+        'facility_ids': facility_ids,
+        'variants_processed': result['variants_processed'],
+        'updated': result['updated'],
+        'rejected': result['rejected'],
+        'rejected_by_reason': result['rejected_by_reason'],
+        'history_rows': result['history_rows'],
+        'price_change_batch_id': result['price_change_batch_id'],
+        'rejected_samples': result['rejected_samples'],
+    }
+
+
+def apply_due_price_changes(now=None):
+    """Apply every scheduled change due at ``now``; returns the changes handled"""
+    now = now or timezone.now()
+    due = list(
+        ScheduledPriceChange.objects.filter(status=ScheduledPriceChange.SCHEDULED, effective_at__lte=now)
+        .order_by('effective_at', 'id')
+    )
+
+    groups = defaultdict(list)
+    for change in due:
+        facility_ids = resolve_facilities(change.cluster_ids, change.facility_ids)
+        groups[tuple(override_lock_keys(facility_ids))].append((change.id, facility_ids))
+
+    handled = []
+    for lock_keys, members in groups.items():
+        facilities_by_change = dict(members)
+        with hold_override_locks(list(lock_keys)), transaction.atomic():
+            claimed = (
+                ScheduledPriceChange.objects.select_for_update(skip_locked=True)
+                .filter(id__in=facilities_by_change, status=ScheduledPriceChange.SCHEDULED)
+                .order_by('effective_at', 'id')
+            )
+            for change in claimed:
+                facility_ids = facilities_by_change[change.id]
+                try:
+                    if not facility_ids:
+                        raise ValueError("No active facilities found")
+                    with transaction.atomic():
+                        change.result = _apply_change(change, facility_ids)
+                    change.status = ScheduledPriceChange.APPLIED
+                    change.error = None
+                except Exception as e:
+                    change.status = ScheduledPriceChange.FAILED
+                    change.error = str(e)
+                change.applied_at = timezone.now()
+                change.save(update_fields=['status', 'result', 'error', 'applied_at', 'updation_date'])
+                handled.append(change)
+    return handled
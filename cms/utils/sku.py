@@ -0,0 +1,99 @@
+"""
+Sequence-backed SKU allocation.
+
+Product and nameless-variant SKUs are numbered from Postgres sequences, so
+concurrent creates can never race into the same number and allocating a
+block of N SKUs for a bulk insert is a single round trip.
+
+A named variant's SKU is ``<product sku>-<SLUGIFIED NAME>``. Names that
+slugify to nothing (e.g. non-ASCII ones) or to a SKU that is already taken
+fall back to a ``V<n>`` sequence number, as nameless variants do, so
+``variants.sku`` stays unique.
+"""
+from django.db import connection
+from django.utils.text import slugify
+
+
+PRODUCT_SKU_PREFIX = 'ROZ'
+PRODUCT_SKU_SEQUENCE = 'product_sku_seq'
+VARIANT_SKU_SEQUENCE = 'variant_sku_seq'
+
+
+def reserve_sequence_values(sequence, count):
+    """Reserve ``count`` consecutive-ish values from ``sequence`` in one query"""
+    if count <= 0:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nextval(%s) FROM generate_series(1, %s)", [sequence, count])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def format_product_sku(number):
+    return f'{PRODUCT_SKU_PREFIX}{number:02d}'
+
+
+def allocate_product_skus(count):
+    """Reserve a block of ``count`` product SKUs"""
+    return [format_product_sku(number) for number in reserve_sequence_values(PRODUCT_SKU_SEQUENCE, count)]
+
+
+def allocate_product_sku():
+    return allocate_product_skus(1)[0]
+
+
+def variant_sku(product_sku, variant_name=None, number=None):
+    """
+    Build a variant SKU from its product SKU and either an allocated sequence
+    number or the variant name.
+    """
+    suffix = f'V{number:02d}' if number is not None else slugify(variant_name or '').upper()
+    return f'{product_sku}-{suffix}'
+
+
+def name_variant_sku(product_sku, variant_name):
+    """The SKU a variant name gives, or None when the name slugifies to nothing"""
+    if not variant_name or not slugify(variant_name):
+        return None
+    return variant_sku(product_sku, variant_name)
+
+
+def taken_variant_skus(skus, exclude_id=None):
+    """The ``skus`` already used by a variant (other than ``exclude_id``), one query"""
+    skus = list(skus)
+    if not skus:
+        return set()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT sku FROM variants WHERE sku = ANY(%s) AND id IS DISTINCT FROM %s",
+            [skus, exclude_id],
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def assign_skus(products=(), variants=()):
+    """
+    Fill in missing SKUs on unsaved Product / ProductVariant instances ahead
+    of ``bulk_create``. Name SKUs are checked against the table and each
+    other in one query; variants whose name gives no SKU or a taken one are
+    numbered with one more. Product SKUs take one query too.
+    """
+    variants = [variant for variant in variants if not variant.sku]
+    # Variants of products that still have no SKU need one first
+    pending = {id(product): product for product in products if not product.sku}
+    pending.update({id(variant.product): variant.product for variant in variants if not variant.product.sku})
+    for product, sku in zip(pending.values(), allocate_product_skus(len(pending))):
+        product.sku = sku
+
+    named = {id(variant): name_variant_sku(variant.product.sku, variant.name) for variant in variants}
+    taken = taken_variant_skus({sku for sku in named.values() if sku})
+    numbered = []
+    for variant in variants:
+        sku = named[id(variant)]
+        if sku is None or sku in taken:
+            numbered.append(variant)
+        else:
+            # Later variants of the batch with the same name get a number
+            taken.add(sku)
+            variant.sku = sku
+    for variant, number in zip(numbered, reserve_sequence_values(VARIANT_SKU_SEQUENCE, len(numbered))):
+        variant.sku = variant_sku(variant.product.sku, number=number)
@@ -0,0 +1,132 @@
+"""
+Stock movements applied as coalesced deltas.
+
+Scanners push batches of ``(facility, variant, delta)`` movements.
+``buffer_stock_deltas`` sums each batch per inventory row and appends it to
+``stock_delta_events`` with one INSERT. That is an append-only write, so
+ingest never waits on inventory row locks.
+
+``flush_stock_deltas`` drains the buffer. One statement deletes a batch of
+buffered rows, sums them per inventory row and applies
+``stock = stock + delta``. The increment is relative, so a concurrent write
+cannot be lost. Flushes are serialized with an advisory lock.
+
+After a batch commits, a flush is scheduled STOCK_DELTA_FLUSH_INTERVAL
+seconds later. Movements arriving inside that window are coalesced into
+the same UPDATE. ``manage.py flush_stock_deltas`` drains anything left,
+e.g. after a restart.
+"""
+import os
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import close_old_connections, connection, transaction
+
+from cms.utils.change_feed import record_changes
+
+
+STOCK_DELTA_LOCK = (7304, 0)  # two-int advisory lock key, see cms.utils.price_override
+STOCK_DELTA_FLUSH_INTERVAL = float(os.environ.get("STOCK_DELTA_FLUSH_INTERVAL", 1))
+STOCK_DELTA_FLUSH_BATCH_SIZE = int(os.environ.get("STOCK_DELTA_FLUSH_BATCH_SIZE", 50000))
+FLUSH_SCHEDULED_KEY = 'stock_deltas:flush_scheduled'
+
+
+def coalesce(movements):
+    """{(facility_id, variant_id): summed delta} of ``movements``, without rows that net to 0"""
+    totals = Counter()
+    for movement in movements:
+        totals[(movement['facility_id'], movement['product_variant_id'])] += movement['delta']
+    return {key: delta for key, delta in totals.items() if delta}
+
+
+def unknown_inventory_pairs(pairs):
+    """The (facility_id, variant_id) ``pairs`` that have no inventory row, one query"""
+    pairs = list(pairs)
+    if not pairs:
+        return set()
+    facility_ids, variant_ids = (list(column) for column in zip(*pairs))
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT k.facility_id, k.variant_id
+            FROM unnest(%s::integer[], %s::integer[]) AS k(facility_id, variant_id)
+            WHERE NOT EXISTS (
+                SELECT 1 FROM facility_inventories fi
+                WHERE fi.facility_id = k.facility_id AND fi.product_variant_id = k.variant_id
+            )
+        """, [facility_ids, variant_ids])
+        return set(cursor.fetchall())
+
+
+def buffer_stock_deltas(totals, source=None):
+    """Append coalesced ``totals`` to the buffer and schedule a flush; returns the rows buffered"""
+    if not totals:
+        return 0
+    facility_ids, variant_ids = (list(column) for column in zip(*totals))
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO stock_delta_events (facility_id, product_variant_id, delta, source, creation_date)
+            SELECT facility_id, variant_id, delta, %s, now()
+            FROM unnest(%s::integer[], %s::integer[], %s::integer[]) AS k(facility_id, variant_id, delta)
+        """, [source, facility_ids, variant_ids, list(totals.values())])
+    transaction.on_commit(schedule_stock_delta_flush)
+    return len(totals)
+
+
+def flush_stock_deltas(batch_size=None):
+    """
+    Apply buffered deltas until the buffer is empty; returns the number of
+    inventory rows updated. Deltas for rows deleted since they were
+    buffered are dropped.
+    """
+    batch_size = batch_size or STOCK_DELTA_FLUSH_BATCH_SIZE
+    updated = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", list(STOCK_DELTA_LOCK))
+            cursor.execute("""
+                WITH drained AS (
+                    DELETE FROM stock_delta_events
+                    WHERE id IN (SELECT id FROM stock_delta_events ORDER BY id LIMIT %s)
+                    RETURNING facility_id, product_variant_id, delta
+                ),
+                totals AS (
+                    SELECT facility_id, product_variant_id, sum(delta) AS delta
+                    FROM drained
+                    GROUP BY facility_id, product_variant_id
+                ),
+                applied AS (
+                    UPDATE facility_inventories fi
+                    SET stock = fi.stock + totals.delta, updation_date = now()
+                    FROM totals
+                    WHERE fi.facility_id = totals.facility_id AND fi.product_variant_id = totals.product_variant_id
+                      AND totals.delta <> 0
+                    RETURNING fi.id
+                )
+                SELECT (SELECT count(*) FROM drained), (SELECT array_agg(id) FROM applied)
+            """, [batch_size])
+            drained, inventory_ids = cursor.fetchone()
+            record_changes('inventory', 'updated', inventory_ids or [])
+        updated += len(inventory_ids or [])
+        if drained < batch_size:
+            return updated
+
+
+def schedule_stock_delta_flush():
+    """Start a delayed flush unless one is already waiting in this process's window"""
+    if cache.add(FLUSH_SCHEDULED_KEY, 1, STOCK_DELTA_FLUSH_INTERVAL * 10):
+        threading.Thread(target=_delayed_flush, daemon=True, name='stock-delta-flush').start()
+
+
+def _delayed_flush():
+    time.sleep(STOCK_DELTA_FLUSH_INTERVAL)
+    close_old_connections()
+    try:
+        flush_stock_deltas()
+        # Batches committed while draining saw the flag and did not schedule: drain once more
+        cache.delete(FLUSH_SCHEDULED_KEY)
+        flush_stock_deltas()
+    finally:
+        cache.delete(FLUSH_SCHEDULED_KEY)
+        connection.close()
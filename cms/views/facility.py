@@ -1,10 +1,11 @@
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated, DjangoModelPermissions, AllowAny
 from cms.models.facility import Facility, Cluster, FacilityInventory
-from cms.models.product import ProductVariant, Product
+from cms.models.product import ComboProductItem, ProductVariant, Product
 from cms.serializers.facility import (
     FacilitySerializer, ClusterSerializer, ClusterListSerializer, FacilityInventorySerializer,
-    ProductListSerializer, FacilityInventoryItemSerializer
+    ProductListSerializer, FacilityInventoryItemSerializer, InventoryAssignmentSerializer, FacilityCloneSerializer,
+    StockDeltaBatchSerializer,
 )
 from rest_framework.filters import SearchFilter, OrderingFilter
 from cms.utils.pagination import CustomPageNumberPagination
@@ -16,7 +17,7 @@ from cms.utils.filter import (
     ClusterFilter
 )
 from django_filters import rest_framework as filters
-from django.db.models import Prefetch
+from django.db.models import Exists, OuterRef, Prefetch
 from rest_framework import status
 from django.http import HttpResponse
 from django.db.models import Q
@@ -25,6 +26,10 @@ from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 from rest_framework.views import APIView
+from cms.utils.catalog_assignment import SELECTORS, assign_variants
+from cms.utils.facility_clone import clone_facility, queue_facility_clone
+from cms.utils.inventory_upsert import inventory_item_errors, upsert_inventories
+from cms.utils.stock_deltas import buffer_stock_deltas, coalesce, flush_stock_deltas, unknown_inventory_pairs
 
 
 
@@ -66,6 +71,48 @@ class FacilityViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save()
 
+    @action(detail=True, methods=['post'], url_path='clone')
+    def clone(self, request, pk=None):
+        """
+        POST /api/cms/facilities/{source_id}/clone/
+        Body: { "target_facility_ids": [7, 8], "parts": ["inventory", "prices", "categories", "collections"],
+                "margin": 2.5, "copy_stock": false, "run_async": true }
+        Copies the facility's assortment, prices, category assignments and
+        collections into the targets. Runs as a background job by default.
+        """
+        source = self.get_object()
+        serializer = FacilityCloneSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        target_ids = sorted(set(data['target_facility_ids']) - {source.id})
+        if not target_ids:
+            return Response({"error": "Provide at least one target facility other than the source"}, status=status.HTTP_400_BAD_REQUEST)
+        unknown_target_ids = set(target_ids) - set(Facility.objects.filter(id__in=target_ids).values_list('id', flat=True))
+        if unknown_target_ids:
+            return Response(
+                {"error": f"Facilities not found: {sorted(unknown_target_ids)}"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        options = {'parts': data['parts'], 'margin': data['margin'], 'copy_stock': data['copy_stock']}
+        if not data['run_async']:
+            targets = {target_id: clone_facility(source.id, target_id, **options) for target_id in target_ids}
+            return Response({"source_facility_id": source.id, "targets": targets}, status=status.HTTP_200_OK)
+
+        job = queue_facility_clone(
+            source.id, target_ids, **options,
+            user=request.user if request.user.is_authenticated else None,
+            source='facility-clone',
+        )
+        return Response({
+            "job_id": job.id,
+            "status": job.status,
+            "source_facility_id": source.id,
+            "target_facility_ids": target_ids,
+            "progress_url": f"/api/cms/jobs/{job.id}/",
+            "message": f"Clone of facility '{source.name}' into {len(target_ids)} facilities queued as job #{job.id}",
+        }, status=status.HTTP_202_ACCEPTED)
+
 
 class ClusterViewSet(viewsets.ModelViewSet):
     queryset = Cluster.objects.all()
@@ -150,52 +197,112 @@ class FacilityInventoryViewSet(viewsets.ModelViewSet):
         if not product_variant_ids:
             return Response({'error': 'Product variant IDs are required'}, status=400)
 
-        # Fetch the facility object (optional: validate existence)
-        try:
-            facility = Facility.objects.get(id=facility_id)
-        except Facility.DoesNotExist:
+        if not Facility.objects.filter(id=facility_id).exists():
             return Response({'error': 'Facility not found'}, status=400)
 
-        # List to hold FacilityInventory objects to be created
-        facility_inventories = []
-        existing_combinations = FacilityInventory.objects.filter(
-            facility_id=facility_id, 
-            product_variant_id__in=product_variant_ids
-        ).values_list('product_variant_id', flat=True)
-
-        for product_variant_id in product_variant_ids:
-            if product_variant_id in existing_combinations:
-                # Skip if this combination already exists
-                continue
-
-            try:
-                product_variant = ProductVariant.objects.get(id=product_variant_id)
-            except ProductVariant.DoesNotExist:
-                return Response({'error': f'Product variant with ID {product_variant_id} not found'}, status=400)
-
-            # Create FacilityInventory instance
-            facility_inventory = FacilityInventory(
-                facility=facility,
-                product_variant=product_variant,
-                stock=0,  # Default to 0, can be updated later
-                tax=None,  # Default tax, can be added if needed
-                base_price=0.0,  # Default base price, can be updated later
-                mrp=0.0,  # Default MRP, can be updated
-                selling_price=0.0,  # Default selling price, can be updated
-                cust_discount=None,  # Optional customer discount
-                max_purchase_limit=None,  # Optional
-                outofstock_threshold=None,  # Optional
-                status='Active',  # Default status
-                is_active=True  # Default to active
+        unknown_variant_ids = set(product_variant_ids) - set(
+            ProductVariant.objects.filter(id__in=product_variant_ids).values_list('id', flat=True)
+        )
+        if unknown_variant_ids:
+            return Response({'error': f'Product variant with ID {min(unknown_variant_ids)} not found'}, status=400)
+
+        # Existing facility x variant rows are skipped by the insert itself
+        assign_variants([facility_id], variant_ids=product_variant_ids, active_only=False)
+
+        return Response({"message": "Facility inventories created successfully."}, status=201)
+
+    @action(detail=False, methods=['post'], url_path='assign')
+    def assign(self, request):
+        """
+        POST /api/cms/facilityinventory/assign/
+        Body: { "facility_ids": [1, 2], "category_id": 12, "brand_id": 3, "include_inactive": false }
+        Assigns every variant the selectors pick (variant_ids, product_ids,
+        category_id with its subcategories, brand_id, collection_id; combined
+        with AND) to every facility, in one statement. Existing rows are kept.
+        """
+        serializer = InventoryAssignmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        facility_ids = data['facility_ids']
+        unknown_facility_ids = set(facility_ids) - set(
+            Facility.objects.filter(id__in=facility_ids).values_list('id', flat=True)
+        )
+        if unknown_facility_ids:
+            return Response(
+                {"error": f"Facilities not found: {sorted(unknown_facility_ids)}"}, status=status.HTTP_400_BAD_REQUEST
             )
 
-            facility_inventories.append(facility_inventory)
+        created = assign_variants(
+            facility_ids,
+            active_only=not data['include_inactive'],
+            **{selector: data[selector] for selector in SELECTORS if selector in data},
+        )
+        return Response({
+            "message": "Variants assigned successfully.",
+            "created": len(created),
+            "variants": len({variant_id for _, variant_id in created}),
+            "facilities": len(facility_ids),
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], url_path='stock-deltas')
+    def stock_deltas(self, request):
+        """
+        POST /api/cms/facilityinventory/stock-deltas/[?flush=true]
+        Body: { "source": "scanner-7", "events": [
+          { "facility_id": 1, "product_variant_id": 1, "delta": -2 },
+          { "facility_id": 1, "product_variant_id": 1, "delta": 5 }
+        ] }
+        Movements are summed per inventory row and buffered; the buffer is
+        applied as relative stock increments shortly after. flush=true applies
+        it before responding.
+        """
+        serializer = StockDeltaBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        events = serializer.validated_data['events']
+
+        totals = coalesce(events)
+        unknown = sorted(unknown_inventory_pairs(totals))
+        if unknown:
+            return Response({
+                "error": "No inventory row for some facility and variant pairs",
+                "pairs": [{"facility_id": facility_id, "product_variant_id": variant_id} for facility_id, variant_id in unknown[:100]],
+                "count": len(unknown),
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        buffered = buffer_stock_deltas(totals, source=serializer.validated_data['source'])
+        response = {"accepted": len(events), "buffered": buffered}
+        if str(request.query_params.get('flush', '')).lower() in ('true', '1', 'yes'):
+            response["applied"] = flush_stock_deltas()
+            return Response(response, status=status.HTTP_200_OK)
+        return Response(response, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['post'], url_path='bulk-upsert')
+    def bulk_upsert(self, request):
+        """
+        POST /api/cms/facilityinventory/bulk-upsert/
+        Body: [
+          { "facility_id": 1, "product_variant_id": 1, "selling_price": 99.99, "stock": 50 },
+          { "facility_id": 1, "product_variant_id": 2, "stock": 40 }
+        ]
+        The whole payload is validated first; rows are then created or updated
+        in bulk, and existing rows only get the fields each item supplies.
+        """
+        serializer = FacilityInventoryItemSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data
 
-        # Bulk create all FacilityInventory entries that don't already exist
-        if facility_inventories:
-            FacilityInventory.objects.bulk_create(facility_inventories)
+        errors = inventory_item_errors(items)
+        if errors:
+            return Response({"error": "Invalid inventory items", "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response({"message": "Facility inventories created successfully."}, status=201)
+        created, updated = upsert_inventories(items)
+        return Response({
+            "message": "Facility inventories upserted successfully.",
+            "created": len(created),
+            "updated": len(updated),
+            "total": len(created) + len(updated),
+        }, status=status.HTTP_200_OK)
 
 
 class FacilityProductViewSet(viewsets.ModelViewSet):
@@ -221,31 +328,52 @@ class FacilityProductViewSet(viewsets.ModelViewSet):
         """Retrieve the facility managed by the user (manager role)."""
         return Facility.objects.filter(managers=user).first()
 
-    def get_queryset(self):
-        user = self.request.user
+    def _facility_scope(self):
+        """
+        Facility ids the listing is scoped to, resolved once per request: the
+        manager's facility, else an optional ``facility_id`` query parameter.
+        None means unscoped.
+        """
+        if not hasattr(self, '_scope'):
+            user = self.request.user
+            if getattr(user, "role", "") == "manager":
+                managed_facility = self._manager_facility(user)
+                self._scope = [managed_facility.id] if managed_facility else []
+            else:
+                facility_id = self.request.query_params.get('facility_id', '')
+                self._scope = [int(facility_id)] if facility_id.isdigit() else None
+        return self._scope
 
-        # If the user is a manager, filter the products by the facility they manage
-        if getattr(user, "role", "") == "manager":
-            managed_facility = self._manager_facility(user)
-            if managed_facility:
-                # Prefetch only the variants assigned to the manager's facility
-                return Product.objects.prefetch_related(
+    def get_queryset(self):
+        scope = self._facility_scope()
+        if scope is not None and not scope:
+            # Manager without a facility sees nothing
+            return Product.objects.none()
+        products = Product.objects.select_related('category', 'brand').prefetch_related('product_images')
+        if scope is None:
+            return products
+
+        # Products and variants stocked in the scope, with each variant's scoped
+        # inventory row and combo items prefetched: a fixed number of queries per page
+        scoped_inventories = FacilityInventory.objects.filter(facility_id__in=scope)
+        return products.filter(
+            Exists(scoped_inventories.filter(product_variant__product=OuterRef('pk')))
+        ).prefetch_related(
+            Prefetch(
+                'variants',
+                queryset=ProductVariant.objects.filter(
+                    Exists(scoped_inventories.filter(product_variant=OuterRef('pk')))
+                ).select_related('combo_product').order_by('id').prefetch_related(
+                    Prefetch('facility_inventories', queryset=scoped_inventories.order_by('id'), to_attr='scoped_inventories'),
                     Prefetch(
-                        'variants',  # Prefetch related variants
-                        queryset=ProductVariant.objects.filter(
-                            facility_inventories__facility=managed_facility
-                        ).distinct(),
-                        to_attr='assigned_variants'  # Store prefetched variants in the assigned_variants attribute
-                    )
-                ).filter(
-                    variants__facility_inventories__facility=managed_facility
-                ).distinct()
-            else:
-                # If manager has no facility, return empty queryset
-                return Product.objects.none()
-        else:
-            # For other users, return all products (or adjust as needed)
-            return Product.objects.all()
+                        'combo_product__combo_items',
+                        queryset=ComboProductItem.objects.filter(is_active=True).select_related('product_variant__product'),
+                        to_attr='active_items',
+                    ),
+                ),
+                to_attr='assigned_variants',
+            ),
+        )
 
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
@@ -254,17 +382,9 @@ class FacilityProductViewSet(viewsets.ModelViewSet):
 
     def get_serializer_context(self):
         ctx = super().get_serializer_context()
-        
-        if getattr(self.request.user, "role", "") == "manager":
-            managed_facility = self._manager_facility(self.request.user)
-            if managed_facility:
-                ctx["facility_scope"] = [managed_facility.id]
-        
-        elif getattr(self.request.user, "role", "") == "facility_user":
-            facility = self._facility_for_user(self.request.user)
-            if facility:
-                ctx["facility_scope"] = [facility.id]
-        
+        scope = self._facility_scope()
+        if scope:
+            ctx["facility_scope"] = scope
         return ctx
     
     @action(detail=True, methods=["put"], url_path="update")
@@ -294,41 +414,17 @@ class FacilityProductViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        created = []
-        updated = []
-        user = request.user
-        # Determine facility_id from user if possible
-        user_facility_id = None
-        if getattr(user, "role", "") == "manager":
-            managed_facility = Facility.objects.filter(managers=user).first()
+        # Managers always write to their own facility, resolved once
+        if getattr(request.user, "role", "") == "manager":
+            managed_facility = self._manager_facility(request.user)
             if managed_facility:
-                user_facility_id = managed_facility.id
-
-        for item in items:
-            # Use facility_id from user if available, else from item
-            facility_id = user_facility_id if user_facility_id else item["facility_id"]
-            product_variant_id = item["product_variant_id"]
-
-            # Check if the inventory exists for the facility and variant
-            inventory = FacilityInventory.objects.filter(
-                facility_id=facility_id,
-                product_variant_id=product_variant_id
-            ).first()
-
-            if inventory:
-                # Update the existing inventory with new values
-                for field in ["base_price", "mrp", "selling_price", "stock", "cust_discount", "max_purchase_limit",
-                              "outofstock_threshold", "status", "is_active", "tax_id"]:
-                    if field in item:
-                        setattr(inventory, field, item[field])
-                inventory.save()
-                updated.append(inventory.id)
-            else:
-                # Create a new inventory row if it does not exist
-                item_with_facility = dict(item)
-                item_with_facility["facility_id"] = facility_id
-                new_inventory = FacilityInventory.objects.create(**item_with_facility)
-                created.append(new_inventory.id)
+                items = [dict(item, facility_id=managed_facility.id) for item in items]
+
+        errors = inventory_item_errors(items)
+        if errors:
+            return Response({"error": "Invalid inventory items", "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        created, updated = upsert_inventories(items)
 
         return Response(
             {
@@ -0,0 +1,30 @@
+from rest_framework import viewsets
+from rest_framework.permissions import IsAuthenticated
+
+from cms.models.job import CatalogJob
+from cms.serializers.job import CatalogJobSerializer
+from cms.utils.pagination import CustomPageNumberPagination
+
+
+class CatalogJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    GET /api/cms/jobs/            list background catalog jobs (?job_type=, ?status=)
+    GET /api/cms/jobs/<id>/       status and progress of one job, e.g. the
+                                  validation batch returned by an import
+    """
+    serializer_class = CatalogJobSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = CustomPageNumberPagination
+
+    def get_queryset(self):
+        queryset = CatalogJob.objects.select_related('created_by')
+
+        job_type = self.request.query_params.get('job_type')
+        if job_type:
+            queryset = queryset.filter(job_type=job_type)
+
+        job_status = self.request.query_params.get('status')
+        if job_status:
+            queryset = queryset.filter(status=job_status)
+
+        return queryset.order_by('-creation_date')
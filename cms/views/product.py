@@ -2,9 +2,9 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, DjangoModelPermissions, AllowAny
 from rest_framework.parsers import MultiPartParser, FormParser
-from cms.models.product import Product, ProductOption, ProductVariant, ProductVariantImage, Collection, ProductLinkVariant, ProductPriceHistory, ProductVariantCustomField, ProductSizeChartValue, ComboProduct, ComboProductItem
+from cms.models.product import Product, ProductOption, ProductVariant, ProductVariantImage, Collection, ProductLinkVariant, ProductPriceHistory, PriceChangeBatch, ScheduledPriceChange, ProductVariantCustomField, ProductSizeChartValue, ComboProduct, ComboProductItem
 from cms.models.product_image import ProductImage
-from cms.models.facility import Facility, FacilityInventory, Cluster
+from cms.models.facility import Facility, FacilityInventory, Cluster, CatalogChangeEvent
 from cms.models.category import Brand, Category
 from cms.models.setting import CustomField, SizeChart, SizeMeasurement, AttributeValue
 
@@ -24,6 +24,8 @@ from cms.serializers.product import (
     ProductWithFacilityPricingSerializer,
     ClusterPriceUpdateSerializer,
     ProductPriceHistorySerializer,
+    PriceChangeBatchSerializer,
+    ScheduledPriceChangeSerializer,
     SmartBrandProductSerializer,
     ComboProductListSerializer,
     ComboProductCreateSerializer
@@ -34,15 +36,39 @@ from cms.utils.filter import (
     CollectionFilter,
     ComboProductFilter
 )
-from cms.utils.pagination import CustomPageNumberPagination
+from cms.utils.pagination import CustomPageNumberPagination, PriceGridPagination
+from cms.utils.catalog_ingest import ingest_catalog_csv
+from cms.utils.fingerprint import row_fingerprint, VARIANT_IMPORT_FIELDS
+from cms.utils.gs1 import GS1Error, GS1NotConfigured, gs1_response, is_valid_gtin, lookup_gtin, normalize_gtin
+from cms.utils.ean_validation import queue_ean_validation
+from cms.utils.price_grid import build_price_grid
+from cms.utils.price_history import copy_price_history, create_price_change_batch, history_window
+from cms.utils.cluster_price_summary import rebuild_cluster_price_summary, summarize_history_window, user_info
+from cms.utils.renderers import RESPONSE_RENDERERS
+from cms.utils.cluster_pricing import cluster_pricing_context, schedule_cluster_price_refresh
+from cms.utils.effective_price import invalidate_effective_prices, price_key, resolve_prices
+from cms.utils.price_guardrails import LIMIT_FIELDS, LIMIT_RULES, evaluate_guardrails, group_violations, limit_arrays
+from cms.utils.change_feed import (
+    CHANGE_FEED_MAX_PAGE_SIZE, CHANGE_FEED_PAGE_SIZE, events_after, latest_seq, oldest_retained_seq,
+    record_inventory_changes, record_price_changes,
+)
+from cms.utils.price_override import apply_price_override, override_targets, simulate_price_override, PriceOverrideLocked
+from cms.utils.jobs import enqueue_job
+from cms.models.job import CatalogJob
+from cms.utils.catalog_assignment import assign_variants
+from cms.utils.import_validation import is_dry_run, price_guardrail_errors, validate_import_payload, MODE_CREATE, MODE_UPDATE
+from user.permissions import IsMaster
 from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.response import Response
 from rest_framework.views import APIView
-import openpyxl
-from django.db.models import Q, Max
+from rest_framework.exceptions import ValidationError
+from django.db.models import Q, Max, Count, Avg, Sum, F
 from django.http import HttpResponse
 from django_filters import rest_framework as filters
 import time
+import datetime
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 
 class CollectionViewSet(viewsets.ModelViewSet):
@@ -151,25 +177,13 @@ class ProductViewSet(viewsets.ModelViewSet):
         
         new_product.variants.set(created_variants)
 
-        # Handling facility inventory creation for associated facilities
-        for facility_id in associated_facility_ids:
-            try:
-                facility = Facility.objects.get(pk=facility_id)
-            except Facility.DoesNotExist:
-                continue
-            missing_inventory = [
-                FacilityInventory(
-                    facility=facility,
-                    product_variant=product_variant,
-                    stock=0,
-                    base_price=product_variant.base_price or 0.0,
-                    mrp=product_variant.mrp or 0.0,
-                    selling_price=product_variant.selling_price if hasattr(product_variant, 'selling_price') else product_variant.base_price or 0.0
-                )
-                for product_variant in created_variants
-                if not FacilityInventory.objects.filter(facility=facility, product_variant=product_variant).exists()
-            ]
-            FacilityInventory.objects.bulk_create(missing_inventory)
+        # Handling facility inventory creation for associated facilities, in one statement
+        assign_variants(
+            Facility.objects.filter(pk__in=associated_facility_ids).values_list('id', flat=True),
+            variant_ids=[product_variant.id for product_variant in created_variants],
+            active_only=False,
+        )
+        schedule_cluster_price_refresh(product_ids=[new_product.id])
 
         # Managing collections associated with the new product
         for collection_id in collection_ids:
@@ -248,25 +262,13 @@ class ProductViewSet(viewsets.ModelViewSet):
             except ProductVariant.DoesNotExist:
                 continue
 
-        # Handling facility inventory updates
-        for facility_id in associated_facility_ids:
-            try:
-                facility = Facility.objects.get(pk=facility_id)
-            except Facility.DoesNotExist:
-                continue
-            missing_inventory = [
-                FacilityInventory(
-                    facility=facility,
-                    product_variant=product_variant,
-                    stock=0,
-                    base_price=product_variant.base_price or 0.0,
-                    mrp=product_variant.mrp or 0.0,
-                    selling_price=product_variant.selling_price if hasattr(product_variant, 'selling_price') else product_variant.base_price or 0.0
-                )
-                for product_variant in product.variants.all()
-                if not FacilityInventory.objects.filter(facility=facility, product_variant=product_variant).exists()
-            ]
-            FacilityInventory.objects.bulk_create(missing_inventory)
+        # Handling facility inventory updates: every variant in every facility, in one statement
+        assign_variants(
+            Facility.objects.filter(pk__in=associated_facility_ids).values_list('id', flat=True),
+            product_ids=[product.id],
+            active_only=False,
+        )
+        schedule_cluster_price_refresh(product_ids=[product.id])
 
         # Managing product collections
         product.collections.clear()
@@ -642,6 +644,7 @@ class BulkCreateProductsView(APIView):
     """
     POST /api/products/bulk-create/
     Body: JSON array of product objects for CREATION ONLY (no SKUs expected)
+    ?dry_run=true validates the payload and returns an error report without writing.
     Brand field accepts either ID (numeric) or name (text).
     SKUs will be auto-generated for all variants.
 
@@ -655,6 +658,16 @@ class BulkCreateProductsView(APIView):
         from django.db import transaction
         import time
 
+        if is_dry_run(request):
+            return Response(validate_import_payload(request.data, mode=MODE_CREATE), status=status.HTTP_200_OK)
+
+        guardrail_errors = price_guardrail_errors(request.data, mode=MODE_CREATE)
+        if guardrail_errors:
+            return Response({
+                'error': f'{len(guardrail_errors)} variant selling prices break their price guardrails.',
+                'errors': guardrail_errors,
+            }, status=400)
+
         start_time = time.time()
         print(f"🚀 BULK CREATE MODE: Creating {len(request.data)} new products...")
 
@@ -673,64 +686,6 @@ class BulkCreateProductsView(APIView):
 
                 print(f"⚡ SKU validation: {round((time.time() - validation_start) * 1000, 1)}ms - No SKUs found (correct for creation)")
 
-                # Step 3: Collect EAN numbers for validation
-                ean_start = time.time()
-                all_ean_numbers = []
-                for item in request.data:
-                    if isinstance(item, dict) and 'variants' in item:
-                        for variant_data in item['variants']:
-                            if isinstance(variant_data, dict) and variant_data.get('ean_number'):
-                                all_ean_numbers.append(variant_data['ean_number'])
-
-                # Fast EAN validation (optional - can be disabled for maximum speed)
-                ean_validation_results = {}
-                ean_rejected_products = []
-
-                if all_ean_numbers and len(all_ean_numbers) <= 200:  # Only validate if reasonable amount
-                    try:
-                        import os, requests, json
-                        gs1_url = os.environ.get("GS1_API_URL")
-                        gs1_token = os.environ.get("GS1_API_TOKEN", "")
-
-                        if gs1_url and gs1_token:
-                            session = requests.Session()
-                            session.headers.update({'Authorization': f'Bearer {gs1_token}'})
-
-                            # Process in single batch for speed
-                            gtin_param = json.dumps(all_ean_numbers)
-                            response = session.get(
-                                gs1_url,
-                                params={'gtin': gtin_param, 'status': 'published'},
-                                timeout=3  # Very short timeout
-                            )
-
-                            if response.status_code == 200:
-                                data = response.json()
-                                if data.get('status') and data.get('items'):
-                                    for item in data['items']:
-                                        ean = item.get('gtin')
-                                        if ean:
-                                            ean_validation_results[ean] = {
-                                                'hsn_code': item.get('hs_code'),
-                                                'tax': item.get('tax_rate', 0) or item.get('igst', 0),
-                                                'cgst': item.get('cgst', 0),
-                                                'sgst': item.get('sgst', 0),
-                                                'igst': item.get('igst', 0),
-                                                'cess': item.get('cess', 0),
-                                                'is_valid': True
-                                            }
-
-                            session.close()
-                    except Exception:
-                        pass  # Continue without EAN validation
-
-                # Mark unvalidated EANs
-                for ean in all_ean_numbers:
-                    if ean not in ean_validation_results:
-                        ean_validation_results[ean] = {'is_valid': False}
-
-                print(f"⚡ EAN validation: {round((time.time() - ean_start) * 1000, 1)}ms - {len(ean_validation_results)} EANs checked")
-
                 # Step 4: Create products processing
                 process_start = time.time()
                 created_products = []
@@ -738,6 +693,8 @@ class BulkCreateProductsView(APIView):
                 failed_count = 0
                 failed_products = []
                 ean_rejected_products = []
+                validation_variant_ids = []
+                pending = []  # (index, item, validated data) of the products to create
 
                 for idx, item in enumerate(request.data):
                     try:
@@ -808,185 +765,16 @@ class BulkCreateProductsView(APIView):
                             variants = [default_variant]
                             item['variants'] = variants
 
-                        # Create new product
-                        try:
-                            serializer = SmartBrandProductSerializer(data=item)
-                            if serializer.is_valid():
-                                result = serializer.save()
-
-                                if isinstance(result, dict):
-                                    # Handle serializer result that includes metadata
-                                    product = result.get('product')
-                                    ean_rejected_variants = result.get('ean_rejected_products', [])
-
-                                    if product:
-                                        product.created_by = request.user
-                                        product.save()
-
-                                        # Get all variants and separate accepted/rejected
-                                        all_variants = product.variants.all()
-                                        accepted_variants = [v for v in all_variants if not v.is_rejected]
-                                        rejected_variants = [v for v in all_variants if v.is_rejected]
-
-                                        print(f"Debug - Product {product.name}: total_variants={len(all_variants)}, accepted={len(accepted_variants)}, rejected={len(rejected_variants)}")
-                                        for v in all_variants:
-                                            print(f"  Variant {v.name}: is_rejected={v.is_rejected}")
-
-                                        # Only include in created_products if product has at least one accepted variant
-                                        if accepted_variants:
-                                            created_products.append({
-                                                'product_id': product.id,
-                                                'product_name': product.name,
-                                                'product_sku': product.sku,
-                                                'total_variants': len(all_variants),
-                                                'accepted_variants_count': len(accepted_variants),
-                                                'rejected_variants_count': len(rejected_variants),
-                                                'created_variants': [
-                                                    {
-                                                        'variant_id': v.id,
-                                                        'variant_name': v.name,
-                                                        'variant_sku': v.sku,
-                                                        'is_rejected': v.is_rejected
-                                                    }
-                                                    for v in accepted_variants  # Only show accepted variants
-                                                ]
-                                            })
-                                            created_count += 1
-
-                                        # Track EAN rejected variants
-                                        if ean_rejected_variants:
-                                            for rejected_variant in ean_rejected_variants:
-                                                ean_rejected_products.append({
-                                                    'product_id': product.id,
-                                                    'product_name': product.name,
-                                                    'product_sku': product.sku,
-                                                    'variant_name': rejected_variant.get('name'),
-                                                    'ean_number': rejected_variant.get('ean_number'),
-                                                    'rejection_reason': 'EAN validation failed'
-                                                })
-
-                                        # If product has NO accepted variants, treat as failed
-                                        if not accepted_variants:
-                                            failed_count += 1
-                                            rejection_reasons = []
-                                            for variant in rejected_variants:
-                                                if hasattr(variant, 'rejection_reason'):
-                                                    rejection_reasons.append(f"{variant.name}: {variant.rejection_reason}")
-                                                else:
-                                                    rejection_reasons.append(f"{variant.name}: Unknown rejection reason")
-                                            
-                                            error_message = 'All variants were rejected'
-                                            if rejection_reasons:
-                                                error_message += f' - {"; ".join(rejection_reasons)}'
-                                            else:
-                                                error_message += ' - Check variant data for validation errors'
-                                            
-                                            failed_products.append({
-                                                'index': idx,
-                                                'product_name': product.name,
-                                                'product_sku': product.sku,
-                                                'error': error_message,
-                                                'rejected_variants_count': len(rejected_variants),
-                                                'rejected_variants': [
-                                                    {
-                                                        'variant_name': v.name,
-                                                        'variant_sku': v.sku,
-                                                        'is_rejected': v.is_rejected
-                                                    } for v in rejected_variants
-                                                ],
-                                                'original_data': item
-                                            })
-                                    else:
-                                        failed_count += 1
-                                        failed_products.append({
-                                            'index': idx,
-                                            'product_name': item.get('name', 'Unknown'),
-                                            'error': 'Product creation failed - no product returned',
-                                            'original_data': item
-                                        })
-                                else:
-                                    # Handle direct product creation
-                                    product = result
-                                    product.created_by = request.user
-                                    product.save()
-
-                                    # Get all variants and separate accepted/rejected
-                                    all_variants = product.variants.all()
-                                    accepted_variants = [v for v in all_variants if not v.is_rejected]
-                                    rejected_variants = [v for v in all_variants if v.is_rejected]
-
-                                    print(f"Debug - Product {product.name}: total_variants={len(all_variants)}, accepted={len(accepted_variants)}, rejected={len(rejected_variants)}")
-                                    for v in all_variants:
-                                        print(f"  Variant {v.name}: is_rejected={v.is_rejected}")
-
-                                    # Only include in created_products if product has at least one accepted variant
-                                    if accepted_variants:
-                                        created_products.append({
-                                            'product_id': product.id,
-                                            'product_name': product.name,
-                                            'product_sku': product.sku,
-                                            'total_variants': len(all_variants),
-                                            'accepted_variants_count': len(accepted_variants),
-                                            'rejected_variants_count': len(rejected_variants),
-                                            'created_variants': [
-                                                {
-                                                    'variant_id': v.id,
-                                                    'variant_name': v.name,
-                                                    'variant_sku': v.sku,
-                                                    'is_rejected': v.is_rejected
-                                                }
-                                                for v in accepted_variants  # Only show accepted variants
-                                            ]
-                                        })
-                                        created_count += 1
-
-                                    # If product has NO accepted variants, treat as failed
-                                    if not accepted_variants:
-                                        failed_count += 1
-                                        rejection_reasons = []
-                                        for variant in rejected_variants:
-                                            if hasattr(variant, 'rejection_reason'):
-                                                rejection_reasons.append(f"{variant.name}: {variant.rejection_reason}")
-                                            else:
-                                                rejection_reasons.append(f"{variant.name}: Unknown rejection reason")
-                                        
-                                        error_message = 'All variants were rejected'
-                                        if rejection_reasons:
-                                            error_message += f' - {"; ".join(rejection_reasons)}'
-                                        else:
-                                            error_message += ' - Check variant data for validation errors'
-                                        
-                                        failed_products.append({
-                                            'index': idx,
-                                            'product_name': product.name,
-                                            'product_sku': product.sku,
-                                            'error': error_message,
-                                            'rejected_variants_count': len(rejected_variants),
-                                            'rejected_variants': [
-                                                {
-                                                    'variant_name': v.name,
-                                                    'variant_sku': v.sku,
-                                                    'is_rejected': v.is_rejected
-                                                } for v in rejected_variants
-                                            ],
-                                            'original_data': item
-                                        })
-                            else:
-                                failed_count += 1
-                                failed_products.append({
-                                    'index': idx,
-                                    'product_name': item.get('name', 'Unknown'),
-                                    'error': f"Validation failed: {serializer.errors}",
-                                    'validation_errors': serializer.errors,
-                                    'original_data': item
-                                })
-
-                        except Exception as e:
+                        serializer = SmartBrandProductSerializer(data=item)
+                        if serializer.is_valid():
+                            pending.append((idx, item, serializer.validated_data))
+                        else:
                             failed_count += 1
                             failed_products.append({
                                 'index': idx,
                                 'product_name': item.get('name', 'Unknown'),
-                                'error': f"Creation failed: {str(e)}",
+                                'error': f"Validation failed: {serializer.errors}",
+                                'validation_errors': serializer.errors,
                                 'original_data': item
                             })
 
@@ -999,6 +787,100 @@ class BulkCreateProductsView(APIView):
                             'original_data': item
                         })
 
+                # Create every valid product at once: one SKU reservation and one bulk insert per model
+                results = SmartBrandProductSerializer().create_many(
+                    [validated_data for _, _, validated_data in pending], user=request.user
+                )
+                for (idx, item, _), result in zip(pending, results):
+                    product = result['product']
+                    ean_rejected_variants = result['ean_rejected_products']
+                    validation_variant_ids.extend(result['validation_variant_ids'])
+
+                    if not product:
+                        failed_count += 1
+                        failed_products.append({
+                            'index': idx,
+                            'product_name': item.get('name', 'Unknown'),
+                            'error': 'Product creation failed - no product returned',
+                            'original_data': item
+                        })
+                        continue
+
+                    # Separate accepted/rejected variants
+                    all_variants = result['variants']
+                    accepted_variants = [v for v in all_variants if not v.is_rejected]
+                    rejected_variants = [v for v in all_variants if v.is_rejected]
+
+                    # Only include in created_products if product has at least one accepted variant
+                    if accepted_variants:
+                        created_products.append({
+                            'product_id': product.id,
+                            'product_name': product.name,
+                            'product_sku': product.sku,
+                            'total_variants': len(all_variants),
+                            'accepted_variants_count': len(accepted_variants),
+                            'rejected_variants_count': len(rejected_variants),
+                            'created_variants': [
+                                {
+                                    'variant_id': v.id,
+                                    'variant_name': v.name,
+                                    'variant_sku': v.sku,
+                                    'is_rejected': v.is_rejected
+                                }
+                                for v in accepted_variants  # Only show accepted variants
+                            ]
+                        })
+                        created_count += 1
+
+                    # Track EAN rejected variants
+                    for rejected_variant in ean_rejected_variants:
+                        ean_rejected_products.append({
+                            'product_id': product.id,
+                            'product_name': product.name,
+                            'product_sku': product.sku,
+                            'variant_name': rejected_variant.get('name'),
+                            'ean_number': rejected_variant.get('ean_number'),
+                            'rejection_reason': 'EAN validation failed'
+                        })
+
+                    # If product has NO accepted variants, treat as failed
+                    if not accepted_variants:
+                        failed_count += 1
+                        rejection_reasons = []
+                        for variant in rejected_variants:
+                            if variant.rejection_reason:
+                                rejection_reasons.append(f"{variant.name}: {variant.rejection_reason}")
+                            else:
+                                rejection_reasons.append(f"{variant.name}: Unknown rejection reason")
+
+                        error_message = 'All variants were rejected'
+                        if rejection_reasons:
+                            error_message += f' - {"; ".join(rejection_reasons)}'
+                        else:
+                            error_message += ' - Check variant data for validation errors'
+
+                        failed_products.append({
+                            'index': idx,
+                            'product_name': product.name,
+                            'product_sku': product.sku,
+                            'error': error_message,
+                            'rejected_variants_count': len(rejected_variants),
+                            'rejected_variants': [
+                                {
+                                    'variant_name': v.name,
+                                    'variant_sku': v.sku,
+                                    'is_rejected': v.is_rejected
+                                } for v in rejected_variants
+                            ],
+                            'original_data': item
+                        })
+                failed_products.sort(key=lambda failed: failed['index'])
+
+                # EAN/RAN values are checked against GS1 after commit
+                validation_job = queue_ean_validation(
+                    validation_variant_ids, user=request.user, source='products/bulk-create'
+                )
+
                 print(f"⚡ Creation processing: {round((time.time() - process_start) * 1000, 1)}ms")
 
         except Exception as e:
@@ -1027,6 +909,8 @@ class BulkCreateProductsView(APIView):
             "failed_products": failed_products,
             "ean_rejected_count": len(ean_rejected_products),
             "ean_rejected_products": ean_rejected_products,
+            "validation_job_id": validation_job.id if validation_job else None,
+            "pending_validation_count": len(validation_variant_ids),
             "api_time_seconds": round(total_time, 3),
             "performance_rate_per_second": round(len(request.data) / total_time, 1) if total_time > 0 else 0,
             "mode": "bulk_create",
@@ -1037,6 +921,7 @@ class BulkUpdateProductsView(APIView):
     """
     PUT /api/products/bulk-update/
     Body: JSON array of product objects for UPDATING ONLY (SKUs required)
+    ?dry_run=true validates the payload and returns an error report without writing.
     All variants must have SKUs to identify which products/variants to update.
 
     Custom fields can be included in variant data under 'custom_fields' key in two formats:
@@ -1049,6 +934,16 @@ class BulkUpdateProductsView(APIView):
         from django.db import transaction
         import time
 
+        if is_dry_run(request):
+            return Response(validate_import_payload(request.data, mode=MODE_UPDATE), status=status.HTTP_200_OK)
+
+        guardrail_errors = price_guardrail_errors(request.data, mode=MODE_UPDATE)
+        if guardrail_errors:
+            return Response({
+                'error': f'{len(guardrail_errors)} variant selling prices break their price guardrails.',
+                'errors': guardrail_errors,
+            }, status=400)
+
         start_time = time.time()
         print(f"🔄 BULK UPDATE MODE: Updating {len(request.data)} products...")
 
@@ -1119,13 +1014,16 @@ class BulkUpdateProductsView(APIView):
 
                 print(f"⚡ SKU validation: {round((time.time() - validation_start) * 1000, 1)}ms - {len(requested_skus)} SKUs to update")
 
-                # Step 2: Find existing variants
+                # Step 2: Find existing variants and their stored fingerprints in one lookup
                 lookup_start = time.time()
-                existing_variants_by_sku = {
-                    v.sku: v for v in ProductVariant.objects.select_related('product').filter(sku__in=requested_skus)
+                stored_rows = {
+                    sku: (variant_id, content_hash)
+                    for sku, variant_id, content_hash in ProductVariant.objects.filter(
+                        sku__in=requested_skus
+                    ).values_list('sku', 'id', 'content_hash')
                 }
 
-                missing_skus = requested_skus - set(existing_variants_by_sku.keys())
+                missing_skus = requested_skus - set(stored_rows.keys())
                 if missing_skus:
                     return Response({
                         'error': f'SKUs not found in database: {", ".join(list(missing_skus)[:10])}{"..." if len(missing_skus) > 10 else ""}',
@@ -1133,65 +1031,30 @@ class BulkUpdateProductsView(APIView):
                         'missing_skus': list(missing_skus)
                     }, status=400)
 
-                print(f"⚡ Variant lookup: {round((time.time() - lookup_start) * 1000, 1)}ms - Found all {len(existing_variants_by_sku)} variants")
-
-                # Step 3: EAN validation for variants that have EAN numbers
-                ean_start = time.time()
-                all_ean_numbers = []
+                # Only rows whose fingerprint changed since the last import get loaded and written
+                row_fingerprints = {}
                 for item in request.data:
                     for variant_data in item['variants']:
-                        if variant_data.get('ean_number'):
-                            all_ean_numbers.append(variant_data['ean_number'])
+                        row_fingerprints[variant_data['sku']] = row_fingerprint(item, variant_data)
+                changed_skus = {
+                    sku for sku, fingerprint in row_fingerprints.items()
+                    if stored_rows[sku][1] != fingerprint
+                }
+                existing_variants_by_sku = {
+                    v.sku: v for v in ProductVariant.objects.select_related('product').filter(sku__in=changed_skus)
+                }
 
-                ean_validation_results = {}
-                if all_ean_numbers and len(all_ean_numbers) <= 200:
-                    try:
-                        import os, requests, json
-                        gs1_url = os.environ.get("GS1_API_URL")
-                        gs1_token = os.environ.get("GS1_API_TOKEN", "")
-
-                        if gs1_url and gs1_token:
-                            session = requests.Session()
-                            session.headers.update({'Authorization': f'Bearer {gs1_token}'})
-
-                            gtin_param = json.dumps(all_ean_numbers)
-                            response = session.get(
-                                gs1_url,
-                                params={'gtin': gtin_param, 'status': 'published'},
-                                timeout=3
-                            )
-
-                            if response.status_code == 200:
-                                data = response.json()
-                                if data.get('status') and data.get('items'):
-                                    for item_data in data['items']:
-                                        ean = item_data.get('gtin')
-                                        if ean:
-                                            ean_validation_results[ean] = {
-                                                'hsn_code': item_data.get('hs_code'),
-                                                'tax': item_data.get('tax_rate', 0) or item_data.get('igst', 0),
-                                                'cgst': item_data.get('cgst', 0),
-                                                'sgst': item_data.get('sgst', 0),
-                                                'igst': item_data.get('igst', 0),
-                                                'cess': item_data.get('cess', 0),
-                                                'is_valid': True
-                                            }
-                            session.close()
-                    except Exception:
-                        pass
-
-                # Mark unvalidated EANs
-                for ean in all_ean_numbers:
-                    if ean not in ean_validation_results:
-                        ean_validation_results[ean] = {'is_valid': False}
-
-                print(f"⚡ EAN validation: {round((time.time() - ean_start) * 1000, 1)}ms - {len(ean_validation_results)} EANs checked")
+                print(f"⚡ Variant lookup: {round((time.time() - lookup_start) * 1000, 1)}ms - {len(changed_skus)} of {len(stored_rows)} variants changed")
 
                 # Step 4: Update products and variants
                 update_start = time.time()
                 updated_products_list = []
                 updated_products_set = set()
                 updated_variants_count = 0
+                unchanged_products_count = 0
+                unchanged_variants_count = 0
+                fingerprinted_variants = []
+                validation_variant_ids = []
                 failed_updates = []
 
                 for idx, item in enumerate(request.data):
@@ -1201,20 +1064,15 @@ class BulkUpdateProductsView(APIView):
                         if has_duplicates:
                             continue
 
-                        # Group variants by product (first variant determines the product)
-                        first_variant_sku = item['variants'][0]['sku']
-
-                        # Check if first variant SKU exists (skip missing SKUs)
-                        if first_variant_sku not in existing_variants_by_sku:
-                            failed_updates.append({
-                                'product_index': idx,
-                                'product_name': item.get('name', 'Unknown'),
-                                'error': f'First variant SKU "{first_variant_sku}" not found in database',
-                                'original_data': item
-                            })
+                        # Skip products whose rows are all unchanged since the last import
+                        changed_variants = [v for v in item['variants'] if v['sku'] in changed_skus]
+                        if not changed_variants:
+                            unchanged_products_count += 1
+                            unchanged_variants_count += len(item['variants'])
                             continue
 
-                        existing_product = existing_variants_by_sku[first_variant_sku].product
+                        # Group variants by product (first changed variant determines the product)
+                        existing_product = existing_variants_by_sku[changed_variants[0]['sku']].product
 
                         # Update product fields if provided
                         if 'name' in item:
@@ -1243,72 +1101,28 @@ class BulkUpdateProductsView(APIView):
                         for variant_data in item['variants']:
                             sku = variant_data['sku']
 
-                            # Skip if this variant's SKU is not in the database
+                            # Unchanged rows are skipped, only their fingerprint is refreshed below
                             if sku not in existing_variants_by_sku:
-                                failed_updates.append({
-                                    'product_index': idx,
-                                    'product_name': item.get('name', 'Unknown'),
-                                    'error': f'Variant SKU "{sku}" not found in database',
-                                    'sku': sku,
-                                    'original_data': item
-                                })
+                                unchanged_variants_count += 1
                                 continue
 
                             existing_variant = existing_variants_by_sku[sku]
 
-                            # Apply EAN validation if provided
-                            ean_number = variant_data.get('ean_number')
-                            if ean_number and ean_number in ean_validation_results:
-                                validation = ean_validation_results[ean_number]
-                                if validation.get('is_valid', True):
-                                    existing_variant.hsn_code = validation.get('hsn_code', existing_variant.hsn_code)
-                                    existing_variant.tax = validation.get('tax', existing_variant.tax)
-                                    existing_variant.cgst = validation.get('cgst', existing_variant.cgst)
-                                    existing_variant.sgst = validation.get('sgst', existing_variant.sgst)
-                                    existing_variant.igst = validation.get('igst', existing_variant.igst)
-                                    existing_variant.cess = validation.get('cess', existing_variant.cess)
+                            previous_numbers = (normalize_gtin(existing_variant.ean_number), normalize_gtin(existing_variant.ran_number))
 
                             # Update all provided variant fields
-                            field_mapping = {
-                                'name': 'name',
-                                'description': 'description',
-                                'tags': 'tags',
-                                'base_price': 'base_price',
-                                'mrp': 'mrp',
-                                'selling_price': 'selling_price',
-                                'ean_number': 'ean_number',
-                                'ran_number': 'ran_number',
-                                'hsn_code': 'hsn_code',
-                                'tax': 'tax',
-                                'cgst': 'cgst',
-                                'sgst': 'sgst',
-                                'igst': 'igst',
-                                'cess': 'cess',
-                                'weight': 'weight',
-                                'net_qty': 'net_qty',
-                                'packaging_type': 'packaging_type',
-                                'product_dimensions': 'product_dimensions',
-                                'package_dimensions': 'package_dimensions',
-                                'shelf_life': 'shelf_life',
-                                'uom': 'uom',
-                                'attributes': 'attributes',
-                                'is_pack': 'is_pack',
-                                'pack_qty': 'pack_qty',
-                                'is_active': 'is_active',
-                                'is_b2b_enable': 'is_b2b_enable',
-                                'is_pp_enable': 'is_pp_enable',
-                                'is_visible': 'is_visible',
-                                'is_published': 'is_published',
-                                'is_rejected': 'is_rejected'
-                            }
-
-                            for field_name, model_field in field_mapping.items():
+                            for field_name in VARIANT_IMPORT_FIELDS:
                                 if field_name in variant_data:
-                                    setattr(existing_variant, model_field, variant_data[field_name])
+                                    setattr(existing_variant, field_name, variant_data[field_name])
 
                             existing_variant.save()
                             updated_variants_count += 1
 
+                            # New or changed EAN/RAN values are validated against GS1 after commit
+                            current_numbers = (normalize_gtin(existing_variant.ean_number), normalize_gtin(existing_variant.ran_number))
+                            if current_numbers != previous_numbers and any(current_numbers):
+                                validation_variant_ids.append(existing_variant.id)
+
                             # Track this updated variant
                             updated_variants.append({
                                 'variant_id': existing_variant.id,
@@ -1327,6 +1141,12 @@ class BulkUpdateProductsView(APIView):
                             if 'custom_fields' in variant_data:
                                 self._handle_variant_custom_fields(existing_variant, variant_data['custom_fields'])
 
+                        # Saving the product and its variants cleared their fingerprints
+                        fingerprinted_variants.extend(
+                            ProductVariant(id=stored_rows[v['sku']][0], content_hash=row_fingerprints[v['sku']])
+                            for v in item['variants']
+                        )
+
                         # Add this product to the updated products list
                         updated_products_list.append({
                             'product_id': existing_product.id,
@@ -1344,6 +1164,11 @@ class BulkUpdateProductsView(APIView):
                             'original_data': item
                         })
 
+                ProductVariant.objects.bulk_update(fingerprinted_variants, ['content_hash'], batch_size=1000)
+                validation_job = queue_ean_validation(
+                    validation_variant_ids, user=request.user, source='products/bulk-update'
+                )
+
                 print(f"⚡ Update processing: {round((time.time() - update_start) * 1000, 1)}ms")
 
                 total_time = time.time() - start_time
@@ -1351,6 +1176,7 @@ class BulkUpdateProductsView(APIView):
                 print(f"   ⚡ Total time: {round(total_time * 1000, 1)}ms")
                 print(f"   🔄 Updated products: {len(updated_products_set)}")
                 print(f"   🔄 Updated variants: {updated_variants_count}")
+                print(f"   ⏭️  Unchanged variants: {unchanged_variants_count}")
                 print(f"   ❌ Failed updates: {len(failed_updates)}")
                 print(f"   🔀 Duplicate products: {len(duplicate_products)}")
 
@@ -1358,12 +1184,16 @@ class BulkUpdateProductsView(APIView):
                     "total_products": len(request.data),
                     "updated_products_count": len(updated_products_set),
                     "updated_variants_count": updated_variants_count,
+                    "unchanged_products_count": unchanged_products_count,
+                    "unchanged_variants_count": unchanged_variants_count,
                     "duplicate_products_count": len(duplicate_products),
                     "failed_updates_count": len(failed_updates),
                     "updated_products": updated_products_list,
                     "duplicate_products": duplicate_products,
                     "failed_updates": failed_updates,
                     "duplicate_skus": list(set(duplicate_skus)),
+                    "validation_job_id": validation_job.id if validation_job else None,
+                    "pending_validation_count": len(validation_variant_ids),
                     "api_time_seconds": round(total_time, 3),
                     "performance_rate_per_second": round(len(request.data) / total_time, 1) if total_time > 0 else 0,
                     "mode": "bulk_update",
@@ -1377,404 +1207,6 @@ class BulkUpdateProductsView(APIView):
             }, status=500)
 
 
-class ProductExportView(APIView):
-    permission_classes = [IsAuthenticated]
-    """
-    GET /api/products/export/
-    Exports every Product×Variant as a row in Excel, showing names for category, brand, and collections.
-    """
-
-    def get(self, request, *args, **kwargs):
-
-        # Lightweight validation - check required fields only
-        for idx, item in enumerate(request.data):
-            try:
-                if not isinstance(item, dict):
-                    errors[idx] = ["Item must be a dictionary"]
-                    continue
-
-                # Check only essential fields
-                if not item.get('name'):
-                    errors[idx] = ["Name is required"]
-                    continue
-
-                if not item.get('category'):
-                    errors[idx] = ["Category is required"]
-                    continue
-
-                variants = item.get('variants', [])
-                if not variants:
-                    errors[idx] = ["At least one variant is required"]
-                    continue
-
-                # Quick variant validation
-                valid_variants = []
-                for variant in variants:
-                    if isinstance(variant, dict) and variant.get('sku'):
-                        valid_variants.append(variant)
-
-                if not valid_variants:
-                    errors[idx] = ["At least one variant with SKU is required"]
-                    continue
-
-                item['variants'] = valid_variants
-                valid_items.append(item)
-
-            except Exception as e:
-                errors[idx] = [str(e)]
-
-        print(f"📋 Lightweight validation completed in {round(time.time() - validation_start, 2)}s - {len(valid_items)}/{len(request.data)} items valid")
-
-        # OPTIMIZATION 2: Batch EAN validation for all products at once
-        ean_validation_results = {}
-        all_ean_numbers = []
-
-        # Collect all EAN numbers from valid items (check for new/updated variants by SKU)
-        for item in valid_items:
-            variants_data = item.get('variants', [])
-            for variant_data in variants_data:
-                sku = variant_data.get('sku')
-                ean_number = variant_data.get('ean_number')
-                # Validate EAN for new variants or variants with different EAN than existing
-                if ean_number and (not sku or sku not in existing_variants_by_sku):
-                    all_ean_numbers.append(ean_number)
-
-        # OPTIMIZATION: Skip EAN validation for bulk operations to maximize speed
-        # EAN validation can be done separately via a background job if needed
-        ean_start = time.time()
-        print(f"⚡ Skipping EAN validation for bulk operation speed (found {len(all_ean_numbers)} EANs)")
-
-        # Mark all EANs as valid to allow creation
-        for ean in all_ean_numbers:
-            ean_validation_results[ean] = {'is_valid': True}
-
-        print(f"✅ EAN validation skipped in {round(time.time() - ean_start, 3)}s")
-
-        # OPTIMIZATION 3: Separate items into create vs update batches for bulk operations
-        items_to_create = []
-        items_to_update = []
-        failed_products = []
-        ean_rejected_products = []
-
-        # Pre-sort items into create/update categories
-        for idx, item in enumerate(valid_items):
-            try:
-                variants_data = item.get('variants', [])
-                if not variants_data:
-                    failed_products.append({
-                        'index': idx,
-                        'product_name': item.get('name', 'Unknown'),
-                        'error': 'No variants provided'
-                    })
-                    continue
-
-                # Check if any variant SKU already exists
-                existing_variant = None
-                for variant_data in variants_data:
-                    sku = variant_data.get('sku')
-                    if sku and sku in existing_variants_by_sku:
-                        existing_variant = existing_variants_by_sku[sku]
-                        break
-
-                if existing_variant:
-                    items_to_update.append((idx, item, existing_variant))
-                else:
-                    items_to_create.append((idx, item))
-
-            except Exception as e:
-                failed_products.append({
-                    'index': idx,
-                    'product_name': item.get('name', 'Unknown'),
-                    'error': str(e)
-                })
-
-        # BULK CREATE OPERATIONS
-        created_products = []
-        products_to_create = []
-        variants_to_create = []
-
-        for idx, item in items_to_create:
-            try:
-                # Prepare product data
-                clean_item = item.copy()
-                clean_item.pop('id', None)
-                variants_data = clean_item.pop('variants', [])
-
-                # Create product instance (not saved yet)
-                product = Product(
-                    name=clean_item['name'],
-                    description=clean_item.get('description', ''),
-                    tags=clean_item.get('tags', []),
-                    category=clean_item['category'],
-                    brand=clean_item.get('brand'),
-                    is_active=clean_item.get('is_active', True),
-                    is_published=clean_item.get('is_published', True),
-                    image=clean_item.get('image', ''),
-                    created_by=request.user,
-                    updated_by=request.user,
-                )
-                products_to_create.append((product, variants_data, idx))
-
-            except Exception as e:
-                failed_products.append({
-                    'index': idx,
-                    'product_name': item.get('name', 'Unknown'),
-                    'error': str(e)
-                })
-
-        # SUPER OPTIMIZED: Bulk create ALL variants in one operation
-        bulk_create_start = time.time()
-        all_variants_to_create = []
-
-        if products_to_create:
-            print(f"🏭 Starting super-fast bulk creation of {len(products_to_create)} products...")
-            try:
-                # Extract just the product objects for bulk_create
-                product_objects = [product for product, _, _ in products_to_create]
-                Product.objects.bulk_create(product_objects)
-
-                # Prepare ALL variants for bulk creation
-                variants_with_custom_fields = []  # Store custom fields separately
-                for product, variants_data, idx in products_to_create:
-                    for variant_data in variants_data:
-                        # Clean variant data
-                        clean_variant = {
-                            'product': product,
-                            'name': variant_data.get('name', ''),
-                            'sku': variant_data.get('sku', ''),
-                            'ean_number': variant_data.get('ean_number', ''),
-                            'net_qty': variant_data.get('net_qty', ''),
-                            'base_price': variant_data.get('base_price', 0),
-                            'mrp': variant_data.get('mrp', 0),
-                            'selling_price': variant_data.get('selling_price', 0),
-                            'weight': variant_data.get('weight', 0),
-                            'is_active': variant_data.get('is_active', True),
-                            'color': variant_data.get('color', ''),
-                            'size': variant_data.get('size', ''),
-                            'is_rejected': False  # Skip EAN validation for speed
-                        }
-                        variant_obj = ProductVariant(**clean_variant)
-                        all_variants_to_create.append(variant_obj)
-
-                        # Store custom fields for later processing
-                        custom_fields_data = variant_data.get('custom_fields', [])
-                        if custom_fields_data:
-                            variants_with_custom_fields.append({
-                                'sku': variant_data.get('sku'),
-                                'custom_fields': custom_fields_data
-                            })
-
-                    created_products.append(product)
-
-                # Bulk create ALL variants at once (massive performance gain)
-                if all_variants_to_create:
-                    ProductVariant.objects.bulk_create(all_variants_to_create, batch_size=1000)
-
-                    # Handle custom fields for bulk created variants
-                    if variants_with_custom_fields:
-                        from cms.models.product import ProductVariantCustomField
-                        from cms.models.setting import CustomField
-                        custom_field_values = []
-
-                        for variant_custom_data in variants_with_custom_fields:
-                            sku = variant_custom_data['sku']
-                            custom_fields_data = variant_custom_data['custom_fields']
-
-                            # Get the most recently created variant with this SKU to avoid duplicates
-                            created_variant = ProductVariant.objects.filter(sku=sku).order_by('-id').first()
-                            if not created_variant:
-                                continue
-
-                            # Support both dict format and array format
-                            if isinstance(custom_fields_data, dict):
-                                # Legacy dict format: {"field_name": "value"}
-                                for field_name, field_value in custom_fields_data.items():
-                                    try:
-                                        custom_field = CustomField.objects.get(name=field_name, is_active=True)
-                                        custom_field_values.append(
-                                            ProductVariantCustomField(
-                                                product_variant=created_variant,
-                                                custom_field=custom_field,
-                                                value=str(field_value)
-                                            )
-                                        )
-                                    except CustomField.DoesNotExist:
-                                        continue
-                            elif isinstance(custom_fields_data, list):
-                                # New array format: [{"field_id": 13, "value": "Yes"}]
-                                for field_item in custom_fields_data:
-                                    if isinstance(field_item, dict) and 'field_id' in field_item:
-                                        try:
-                                            custom_field = CustomField.objects.get(id=field_item['field_id'], is_active=True)
-                                            custom_field_values.append(
-                                                ProductVariantCustomField(
-                                                    product_variant=created_variant,
-                                                    custom_field=custom_field,
-                                                    value=str(field_item.get('value', ''))
-                                                )
-                                            )
-                                        except CustomField.DoesNotExist:
-                                            continue
-
-                        # Bulk create custom field values
-                        if custom_field_values:
-                            ProductVariantCustomField.objects.bulk_create(
-                                custom_field_values,
-                                batch_size=1000,
-                                ignore_conflicts=True
-                            )
-
-                print(f"✅ Super-fast bulk creation completed in {round(time.time() - bulk_create_start, 2)}s")
-                print(f"   📦 Created {len(created_products)} products with {len(all_variants_to_create)} variants")
-
-            except Exception as e:
-                print(f"Bulk create error: {e}")
-                # Fallback to product-by-product creation
-                created_products = []
-                for product, variants_data, idx in products_to_create:
-                    try:
-                        product.save()
-                        for variant_data in variants_data:
-                            clean_variant = {
-                                'name': variant_data.get('name', ''),
-                                'sku': variant_data.get('sku', ''),
-                                'ean_number': variant_data.get('ean_number', ''),
-                                'net_qty': variant_data.get('net_qty', ''),
-                                'base_price': variant_data.get('base_price', 0),
-                                'mrp': variant_data.get('mrp', 0),
-                                'selling_price': variant_data.get('selling_price', 0),
-                                'weight': variant_data.get('weight', 0),
-                                'is_active': variant_data.get('is_active', True),
-                                'color': variant_data.get('color', ''),
-                                'size': variant_data.get('size', ''),
-                                'is_rejected': False
-                            }
-                            created_variant = ProductVariant.objects.create(product=product, **clean_variant)
-
-                            # Handle custom fields for fallback variant creation
-                            custom_fields_data = variant_data.get('custom_fields', [])
-                            if custom_fields_data:
-                                from cms.models.product import ProductVariantCustomField
-                                from cms.models.setting import CustomField
-
-                                # Support both dict format and array format
-                                if isinstance(custom_fields_data, dict):
-                                    # Legacy dict format: {"field_name": "value"}
-                                    for field_name, field_value in custom_fields_data.items():
-                                        try:
-                                            custom_field = CustomField.objects.get(name=field_name, is_active=True)
-                                            ProductVariantCustomField.objects.create(
-                                                product_variant=created_variant,
-                                                custom_field=custom_field,
-                                                value=str(field_value)
-                                            )
-                                        except CustomField.DoesNotExist:
-                                            continue
-                                elif isinstance(custom_fields_data, list):
-                                    # New array format: [{"field_id": 13, "value": "Yes"}]
-                                    for field_item in custom_fields_data:
-                                        if isinstance(field_item, dict) and 'field_id' in field_item:
-                                            try:
-                                                custom_field = CustomField.objects.get(id=field_item['field_id'], is_active=True)
-                                                ProductVariantCustomField.objects.create(
-                                                    product_variant=created_variant,
-                                                    custom_field=custom_field,
-                                                    value=str(field_item.get('value', ''))
-                                                )
-                                            except CustomField.DoesNotExist:
-                                                continue
-                        created_products.append(product)
-                    except Exception as individual_error:
-                        failed_products.append({
-                            'index': idx,
-                            'product_name': product.name,
-                            'error': str(individual_error)
-                        })
-
-        # BULK UPDATE OPERATIONS (keep individual for now due to complexity)
-        updated_products = []
-        for idx, item, existing_variant in items_to_update:
-            try:
-                product = existing_variant.product
-
-                # Update product fields
-                product.name = item['name']
-                product.description = item.get('description', '')
-                product.tags = item.get('tags', [])
-                product.category = item['category']
-                product.brand = item.get('brand')
-                product.is_active = item.get('is_active', True)
-                product.is_published = item.get('is_published', True)
-                product.image = item.get('image', '')
-                product.updated_by = request.user
-                product.save()
-
-                # Update variants (could be optimized further with bulk_update in future)
-                variants_data = item.get('variants', [])
-                for variant_data in variants_data:
-                    variant_data = variant_data.copy()
-                    variant_data.pop('id', None)
-                    variant_images = variant_data.pop('images', [])
-                    variant_data.pop('link', None)
-
-                    sku = variant_data.get('sku')
-                    if sku and sku in existing_variants_by_sku:
-                        # Update existing variant
-                        variant = existing_variants_by_sku[sku]
-                        for field, value in variant_data.items():
-                            setattr(variant, field, value)
-                        variant.save()
-
-                        # Handle images for existing variant
-                        if variant_images:
-                            self._handle_variant_images(variant, variant_images)
-                    else:
-                        # Create new variant
-                        new_variant = ProductVariant.objects.create(product=product, **variant_data)
-
-                        # Handle images for new variant
-                        if variant_images:
-                            self._handle_variant_images(new_variant, variant_images)
-
-                updated_products.append(product)
-
-            except Exception as e:
-                failed_products.append({
-                    'index': idx,
-                    'product_name': item.get('name', 'Unknown'),
-                    'error': str(e)
-                })
-
-        end_time = time.time()
-        api_time = round(end_time - start_time, 2)
-
-        # Performance summary
-        print(f"🎯 PERFORMANCE SUMMARY:")
-        print(f"   📊 Total time: {api_time}s")
-        print(f"   📈 Created: {len(created_products)} products")
-        print(f"   🔄 Updated: {len(updated_products)} products")
-        print(f"   ❌ Failed: {len(failed_products)} products")
-        print(f"   ⚡ Rate: {round(len(request.data) / api_time, 1)} products/second")
-
-        status_code = status.HTTP_201_CREATED if not errors and not failed_products else status.HTTP_207_MULTI_STATUS
-        return Response(
-            {
-                "total_products": len(request.data),
-                "total_variants": sum(len(item.get('variants', [])) for item in request.data),
-                "created_count": len(created_products),
-                "updated_count": len(updated_products),
-                "failed_count": len(failed_products),
-                "failed_products": failed_products,
-                "ean_rejected_count": len(ean_rejected_products),
-                "ean_rejected_products": ean_rejected_products,
-                "validation_errors_count": len(errors),
-                "validation_errors": errors,
-                "api_time_seconds": api_time,
-                "performance_rate_per_second": round(len(request.data) / api_time, 2) if api_time > 0 else 0
-            },
-            status=status_code
-        )
-    
 class ProductExportView(APIView):
     permission_classes = [AllowAny]
     """
@@ -1794,6 +1226,7 @@ class ProductExportView(APIView):
     - include_images: Include image data (true/false) - default: false
     - include_custom_fields: Include custom fields (true/false) - default: true
     - include_size_chart: Include size chart data (true/false) - default: true
+    - facility_id: Add the variants' effective selling price in this facility
     """
 
     def get(self, request, *args, **kwargs):
@@ -1818,6 +1251,12 @@ class ProductExportView(APIView):
         include_images = request.GET.get('include_images', 'false').lower() == 'true'
         include_custom_fields = request.GET.get('include_custom_fields', 'true').lower() == 'true'
         include_size_chart = request.GET.get('include_size_chart', 'true').lower() == 'true'
+        facility_id = request.GET.get('facility_id')
+        if facility_id:
+            try:
+                facility_id = int(facility_id)
+            except ValueError:
+                return Response({"error": "facility_id must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
 
         # Build queryset with optimized prefetching
         qs = ProductVariant.objects.select_related(
@@ -1859,6 +1298,12 @@ class ProductExportView(APIView):
         # Serialize data
         data = ProductExportSerializer(qs, many=True).data
 
+        if data and facility_id:
+            effective_prices = resolve_prices((facility_id, item['variant_id']) for item in data)
+            for item in data:
+                price = effective_prices.get(price_key(facility_id, item['variant_id']))
+                item['facility_selling_price'] = price.selling_price if price else None
+
         # Filter fields based on parameters
         if data and not include_custom_fields:
             for item in data:
@@ -2138,6 +1583,23 @@ class ProductPricingViewSet(viewsets.ReadOnlyModelViewSet):
         else:  # default to cluster
             return ProductWithClusterPricingSerializer
     
+    def list(self, request, *args, **kwargs):
+        """Cluster pricing for a page comes from one product_cluster_prices query"""
+        if request.query_params.get('type', 'cluster') == 'facility':
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        products = page if page is not None else list(queryset)
+
+        context = self.get_serializer_context()
+        context.update(cluster_pricing_context([product.id for product in products]))
+        serializer = ProductWithClusterPricingSerializer(products, many=True, context=context)
+
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
     def get_queryset(self):
         """Override to add any additional filtering if needed"""
         queryset = super().get_queryset()
@@ -2184,10 +1646,113 @@ class ProductPricingViewSet(viewsets.ReadOnlyModelViewSet):
         return queryset.select_related('category', 'brand').prefetch_related('variants')
 
 
+class ProductPriceGridView(APIView):
+    """
+    Columnar pricing grid: variant ids, facility ids and parallel price arrays
+    (see cms.utils.price_grid). Rows are paginated by variant.
+
+    Query Parameters:
+    - facility_ids: Comma separated facility IDs (default: all active facilities)
+    - category, brand, name: Same product filters as /products-pricing/
+    - page, page_size: Variant pagination (default 500, max 5000)
+    - format=msgpack: MessagePack instead of JSON, when msgpack is installed
+    """
+    permission_classes = [AllowAny]  # Adjust permissions as needed
+    renderer_classes = RESPONSE_RENDERERS
+
+    def get(self, request):
+        facility_ids = request.query_params.get('facility_ids')
+        if facility_ids:
+            try:
+                facility_ids = [int(facility_id) for facility_id in facility_ids.split(',') if facility_id.strip()]
+            except ValueError:
+                return Response({"error": "facility_ids must be comma separated integers"}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            facility_ids = list(Facility.objects.filter(is_active=True).values_list('id', flat=True))
+
+        variants = ProductVariant.objects.filter(
+            is_active=True, product__is_active=True, product__is_published=True
+        )
+        category_id = request.query_params.get('category')
+        if category_id:
+            variants = variants.filter(product__category_id=category_id)
+        brand_id = request.query_params.get('brand')
+        if brand_id:
+            variants = variants.filter(product__brand_id=brand_id)
+        product_name = request.query_params.get('name')
+        if product_name:
+            variants = variants.filter(product__name__icontains=product_name)
+
+        paginator = PriceGridPagination()
+        variant_ids = paginator.paginate_queryset(variants.order_by('id').values_list('id', flat=True), request, view=self)
+        grid = build_price_grid(ProductVariant.objects.filter(id__in=variant_ids), facility_ids)
+        return paginator.get_paginated_response(grid)
+
+
+class CatalogChangeFeedView(APIView):
+    """
+    Catalog change feed for downstream consumers (see cms.utils.change_feed).
+    Start from after=0, then pass the returned next_after until has_more is
+    false. A 410 means the cursor is older than the retained events: the
+    consumer resyncs from the catalog and continues from the latest_seq it
+    returned. after=latest returns no events and the head as next_after, for
+    a consumer that starts from a fresh catalog sync.
+
+    Query Parameters:
+    - after: Last seq already consumed, or "latest" (default 0)
+    - limit: Events per batch (default 500, max 5000)
+    - entity: Comma separated entities to include (product, variant, inventory, price)
+    """
+    permission_classes = [AllowAny]  # Adjust permissions as needed
+    renderer_classes = RESPONSE_RENDERERS
+
+    def get(self, request):
+        if request.query_params.get('after') == 'latest':
+            return Response({"events": [], "next_after": latest_seq(), "has_more": False})
+        try:
+            after = int(request.query_params.get('after', 0))
+            limit = min(int(request.query_params.get('limit', CHANGE_FEED_PAGE_SIZE)), CHANGE_FEED_MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({"error": "after and limit must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if after < 0 or limit < 1:
+            return Response({"error": "after must be >= 0 and limit >= 1"}, status=status.HTTP_400_BAD_REQUEST)
+
+        entities = [entity.strip() for entity in request.query_params.get('entity', '').split(',') if entity.strip()]
+        valid_entities = {choice for choice, _ in CatalogChangeEvent.ENTITY_CHOICES}
+        unknown = sorted(set(entities) - valid_entities)
+        if unknown:
+            return Response(
+                {"error": f"Unknown entity: {', '.join(unknown)}. Use {', '.join(sorted(valid_entities))}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        oldest = oldest_retained_seq()
+        if oldest is not None and after < oldest - 1:
+            return Response(
+                {
+                    "error": "Events after this cursor have been pruned, resync from the catalog",
+                    "oldest_seq": oldest,
+                    "latest_seq": latest_seq(),
+                },
+                status=status.HTTP_410_GONE
+            )
+
+        events, has_more = events_after(after, limit, entities)
+
+        return Response({
+            "events": events,
+            "next_after": events[-1]['seq'] if events else after,
+            "has_more": has_more,
+        })
+
+
 class ProductClusterPriceUpdateView(APIView):
     """
     API endpoint to update product pricing for a specific cluster.
     Updates both price and csp for all variants in all facilities of the cluster.
+    Every pair is validated first (MRP, then the variant's price guardrails in
+    one pass); the write is one atomic bulk upsert plus one bulk history insert,
+    so a breach anywhere leaves nothing changed.
     """
     permission_classes = [AllowAny]  # Adjust permissions as needed
     
@@ -2220,104 +1785,186 @@ class ProductClusterPriceUpdateView(APIView):
             )
         
         # Get all facilities in the cluster
-        cluster_facilities = cluster.facilities.all()
-        if not cluster_facilities.exists():
+        cluster_facilities = list(cluster.facilities.order_by('id').values_list('id', 'name'))
+        if not cluster_facilities:
             return Response(
                 {"error": f"No facilities found in cluster '{cluster.name}'"}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
         # Get all active variants for the product
-        product_variants = product.variants.filter(is_active=True)
-        if not product_variants.exists():
+        product_variants = list(product.variants.filter(is_active=True).order_by('id').only('id', 'name', *LIMIT_FIELDS))
+        if not product_variants:
             return Response(
                 {"error": "No active variants found for this product"}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Update pricing for all variants in all facilities of the cluster
-        updated_records = []
-        total_updated = 0
-        price_history_records = []
-        
         # Get the current user (if authenticated)
         current_user = request.user if hasattr(request, 'user') and request.user.is_authenticated else None
-        
-        for facility in cluster_facilities:
+
+        # Current inventory rows for every facility x variant pair, in one query
+        existing_inventories = {
+            (row['facility_id'], row['product_variant_id']): row
+            for row in FacilityInventory.objects.filter(
+                facility_id__in=[facility_id for facility_id, _ in cluster_facilities],
+                product_variant__in=product_variants,
+            ).values('facility_id', 'product_variant_id', 'selling_price', 'mrp', 'cust_discount')
+        }
+
+        # Current effective prices of every pair, read past the cache since they are repriced
+        current_prices = resolve_prices(
+            [(facility_id, variant.id) for facility_id, _ in cluster_facilities for variant in product_variants],
+            cached=False,
+        )
+
+        # Validate every pair first, so an MRP breach leaves nothing half-updated
+        missing_inventories = []
+        priced_inventories = []
+        price_history_records = []
+        updated_records = []
+        mrp_violations = []
+
+        for facility_id, facility_name in cluster_facilities:
             for variant in product_variants:
-                # Get or create FacilityInventory
-                inventory, created = FacilityInventory.objects.get_or_create(
-                    facility=facility,
-                    product_variant=variant,
-                    defaults={'base_price': 0.0, 'selling_price': 0.0, 'is_active': True}
-                )
-                
+                inventory = existing_inventories.get((facility_id, variant.id))
+                inventory_selling_price = (inventory['selling_price'] or 0.0) if inventory else 0.0
+
                 # Calculate new prices based on current selling price
-                current_selling_price = inventory.selling_price if inventory.selling_price and inventory.selling_price > 0 else (variant.base_price or 0.0)
-                if current_selling_price and current_selling_price > 0:  # Only update if current selling price exists
-                    new_price = current_selling_price * (1 + margin / 100)
-                    new_csp = current_selling_price * (1 + margin / 100)
-                    
-                    # Check if new price exceeds MRP
-                    variant_mrp = variant.mrp or 0.0
-                    if variant_mrp > 0 and new_price > variant_mrp:
-                        return Response({
-                            "error": f"Price update failed: New price {new_price:.2f} exceeds MRP {variant_mrp:.2f} for variant '{variant.name}' (Product: {product.name})",
-                            "details": {
-                                "product_id": product.id,
-                                "product_name": product.name,
-                                "variant_id": variant.id,
-                                "variant_name": variant.name,
-                                "base_price": current_selling_price,
-                                "calculated_price": new_price,
-                                "mrp": variant_mrp,
-                                "margin": margin
-                            }
-                        }, status=status.HTTP_400_BAD_REQUEST)
-                    
-                    # Store old values for response and history
-                    old_price = inventory.selling_price if inventory.selling_price > 0 else current_selling_price
-                    old_csp = inventory.selling_price if inventory.selling_price > 0 else current_selling_price
-                    
-                    # Update only selling price
-                    inventory.selling_price = new_price
-                    inventory.save()
-                    
-                    # Create price history record
-                    price_history = ProductPriceHistory.objects.create(
-                        product=product,
-                        product_variant=variant,
-                        cluster=cluster,
-                        facility=facility,
-                        user=current_user,
-                        old_price=old_price,
-                        new_price=new_price,
-                        old_csp=old_csp,
-                        new_csp=new_csp,
-                        percentage_change=margin,
-                        change_type='percentage_update',
-                        change_reason=f'Price updated by {margin}% for cluster {cluster.name}'
-                    )
-                    price_history_records.append(price_history)
-                    
-                    updated_records.append({
-                        'variant_id': variant.id,
-                        'variant_name': variant.name,
-                        'facility_id': facility.id,
-                        'facility_name': facility.name,
-                        'old_price': old_price,
-                        'new_price': new_price,
-                        'old_csp': old_csp,
-                        'new_csp': new_csp,
-                        'history_id': price_history.id
+                current_selling_price = current_prices[price_key(facility_id, variant.id)].selling_price or 0.0
+                if not (current_selling_price and current_selling_price > 0):
+                    # Nothing to price yet, but the inventory row is still created
+                    if not inventory:
+                        missing_inventories.append(FacilityInventory(
+                            facility_id=facility_id, product_variant_id=variant.id,
+                            base_price=0.0, mrp=0.0, selling_price=0.0, cust_discount=0, is_active=True,
+                        ))
+                    continue
+
+                new_price = current_selling_price * (1 + margin / 100)
+                new_csp = current_selling_price * (1 + margin / 100)
+
+                # Check if new price exceeds MRP
+                variant_mrp = variant.mrp or 0.0
+                if variant_mrp > 0 and new_price > variant_mrp:
+                    mrp_violations.append({
+                        "product_id": product.id,
+                        "product_name": product.name,
+                        "variant_id": variant.id,
+                        "variant_name": variant.name,
+                        "facility_id": facility_id,
+                        "facility_name": facility_name,
+                        "base_price": current_selling_price,
+                        "calculated_price": new_price,
+                        "mrp": variant_mrp,
+                        "margin": margin
                     })
-                    total_updated += 1
-        
-        if total_updated == 0:
+                    continue
+
+                # Store old values for response and history
+                old_price = inventory_selling_price if inventory_selling_price > 0 else current_selling_price
+                old_csp = old_price
+
+                # save() only derives cust_discount when it is unset; keep that rule explicit here
+                if inventory:
+                    cust_discount = inventory['cust_discount']
+                    if cust_discount is None:
+                        cust_discount = int(inventory['mrp'] - new_price)
+                else:
+                    cust_discount = 0
+
+                priced_inventories.append(FacilityInventory(
+                    facility_id=facility_id, product_variant_id=variant.id,
+                    base_price=0.0, mrp=0.0, selling_price=new_price, cust_discount=cust_discount, is_active=True,
+                ))
+                price_history_records.append((
+                    product.id, variant.id, cluster.id, facility_id, old_price, new_price, old_csp, new_csp,
+                ))
+                updated_records.append({
+                    'variant_id': variant.id,
+                    'variant_name': variant.name,
+                    'facility_id': facility_id,
+                    'facility_name': facility_name,
+                    'old_price': old_price,
+                    'new_price': new_price,
+                    'old_csp': old_csp,
+                    'new_csp': new_csp,
+                })
+
+        if mrp_violations:
+            first = mrp_violations[0]
+            return Response({
+                "error": f"Price update failed: New price {first['calculated_price']:.2f} exceeds MRP {first['mrp']:.2f} for variant '{first['variant_name']}' (Product: {product.name})",
+                "details": first,
+                "violations_count": len(mrp_violations),
+                "violations": mrp_violations[:100]
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Margin, peer margin and WAC limits of every priced pair, one vectorized pass
+        variants_by_id = {variant.id: variant for variant in product_variants}
+        limits = limit_arrays(
+            tuple(getattr(variants_by_id[record['variant_id']], field) for field in LIMIT_FIELDS)
+            for record in updated_records
+        )
+        guardrail_violations = group_violations(
+            evaluate_guardrails([record['new_price'] for record in updated_records], limits, LIMIT_RULES),
+            lambda index: {
+                "variant_id": updated_records[index]['variant_id'],
+                "variant_name": updated_records[index]['variant_name'],
+                "facility_id": updated_records[index]['facility_id'],
+                "facility_name": updated_records[index]['facility_name'],
+                "current_price": updated_records[index]['old_price'],
+                "calculated_price": updated_records[index]['new_price'],
+            },
+        )
+        if guardrail_violations:
+            return Response({
+                "error": f"Price update failed: calculated prices break the pricing guardrails of product '{product.name}'",
+                "violations_count": sum(group['count'] for group in guardrail_violations.values()),
+                "guardrail_violations": guardrail_violations,
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if not priced_inventories:
             return Response(
                 {"error": "No records updated. Product variants may not have base prices set."}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
+
+        # All-or-nothing write: a fixed number of statements whatever the cluster size
+        from django.db import transaction
+        with transaction.atomic():
+            if missing_inventories:
+                FacilityInventory.objects.bulk_create(missing_inventories, ignore_conflicts=True)
+                record_inventory_changes(
+                    'created',
+                    [inventory.facility_id for inventory in missing_inventories],
+                    [inventory.product_variant_id for inventory in missing_inventories],
+                )
+            FacilityInventory.objects.bulk_create(
+                priced_inventories,
+                update_conflicts=True,
+                unique_fields=['facility', 'product_variant'],
+                update_fields=['selling_price', 'cust_discount', 'updation_date'],
+            )
+            record_price_changes(
+                (product_id, variant_id, facility_id, old_price, new_price)
+                for product_id, variant_id, _, facility_id, old_price, new_price, _, _ in price_history_records
+            )
+            # Shared metadata once on the batch, narrow rows streamed with COPY
+            batch = create_price_change_batch(
+                'percentage_update',
+                user=current_user,
+                cluster=cluster,
+                percentage_change=margin,
+                change_reason=f'Price updated by {margin}% for cluster {cluster.name}',
+                source=f'products/{product.id}/cluster-pricing',
+            )
+            history_ids = copy_price_history(batch, price_history_records)
+            schedule_cluster_price_refresh(product_ids=[product.id])
+            invalidate_effective_prices(variant_ids=[variant.id for variant in product_variants])
+
+        for record, history_id in zip(updated_records, history_ids):
+            record['history_id'] = history_id
         
         return Response({
             "success": True,
@@ -2327,10 +1974,11 @@ class ProductClusterPriceUpdateView(APIView):
             "cluster_id": cluster_id,
             "cluster_name": cluster.name,
             "margin": margin,
-            "updated_records": total_updated,
+            "updated_records": len(updated_records),
             "history_records_created": len(price_history_records),
             "updated_pricing": updated_records,
-            "price_history_ids": [record.id for record in price_history_records]
+            "price_change_batch_id": batch.id,
+            "price_history_ids": history_ids
         }, status=status.HTTP_200_OK)
 
 
@@ -2345,7 +1993,7 @@ class ProductPriceHistoryViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         """Filter price history based on query parameters"""
         queryset = ProductPriceHistory.objects.all().select_related(
-            'product', 'product_variant', 'cluster', 'facility', 'user'
+            'product', 'product_variant', 'cluster', 'facility', 'user', 'batch', 'batch__user'
         )
         
         # Filter by product ID
@@ -2363,22 +2011,103 @@ class ProductPriceHistoryViewSet(viewsets.ReadOnlyModelViewSet):
         if facility_id:
             queryset = queryset.filter(facility_id=facility_id)
         
-        # Filter by user ID
+        # Filter by user ID (set on the row, or on its batch)
         user_id = self.request.query_params.get('user_id')
         if user_id:
-            queryset = queryset.filter(user_id=user_id)
+            queryset = queryset.filter(Q(user_id=user_id) | Q(batch__user_id=user_id))
+
+        # Filter by price change batch
+        batch_id = self.request.query_params.get('batch_id')
+        if batch_id:
+            queryset = queryset.filter(batch_id=batch_id)
         
-        # Filter by date range
-        start_date = self.request.query_params.get('start_date')
-        end_date = self.request.query_params.get('end_date')
-        if start_date:
-            queryset = queryset.filter(creation_date__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(creation_date__lte=end_date)
+        # Filter by date range; always bounded so only the partitions in range are scanned
+        try:
+            queryset = queryset.filter(**history_window(
+                self.request.query_params.get('start_date'),
+                self.request.query_params.get('end_date'),
+            ))
+        except ValueError as e:
+            raise ValidationError({"error": str(e)})
         
         return queryset.order_by('-creation_date')
 
 
+class PriceChangeBatchViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Batch-level view of price changes: one record per override or cluster
+    update. ``retrieve`` adds row aggregates and ``rows`` pages through the
+    per-row history of a batch.
+
+    Query Parameters:
+    - cluster_id, user_id, change_type: Filter batches
+    - start_date, end_date: Date range (default: the history retention window)
+    """
+    serializer_class = PriceChangeBatchSerializer
+    permission_classes = [AllowAny]  # Adjust permissions as needed
+    pagination_class = CustomPageNumberPagination
+
+    def get_queryset(self):
+        queryset = PriceChangeBatch.objects.select_related('cluster', 'user')
+
+        cluster_id = self.request.query_params.get('cluster_id')
+        if cluster_id:
+            queryset = queryset.filter(cluster_id=cluster_id)
+
+        user_id = self.request.query_params.get('user_id')
+        if user_id:
+            queryset = queryset.filter(user_id=user_id)
+
+        change_type = self.request.query_params.get('change_type')
+        if change_type:
+            queryset = queryset.filter(change_type=change_type)
+
+        if self.action == 'list':
+            try:
+                queryset = queryset.filter(**history_window(
+                    self.request.query_params.get('start_date'),
+                    self.request.query_params.get('end_date'),
+                ))
+            except ValueError as e:
+                raise ValidationError({"error": str(e)})
+
+        return queryset.order_by('-creation_date')
+
+    def _batch_rows(self, batch):
+        # Rows are written in the batch's transaction; the lower bound lets Postgres skip older partitions
+        return ProductPriceHistory.objects.filter(
+            batch=batch, creation_date__gte=batch.creation_date - datetime.timedelta(days=1)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        batch = self.get_object()
+        stats = self._batch_rows(batch).aggregate(
+            products=Count('product_id', distinct=True),
+            variants=Count('product_variant_id', distinct=True),
+            facilities=Count('facility_id', distinct=True),
+            avg_old_price=Avg('old_price'),
+            avg_new_price=Avg('new_price'),
+            total_price_delta=Sum(F('new_price') - F('old_price')),
+        )
+        data = self.get_serializer(batch).data
+        data['summary'] = {
+            key: round(value, 2) if isinstance(value, float) else value
+            for key, value in stats.items()
+        }
+        return Response(data)
+
+    @action(detail=True, methods=['get'])
+    def rows(self, request, pk=None):
+        """Per-row detail of one batch"""
+        batch = self.get_object()
+        queryset = self._batch_rows(batch).select_related(
+            'product', 'product_variant', 'cluster', 'facility', 'user', 'batch', 'batch__user'
+        ).order_by('id')
+        page = self.paginate_queryset(queryset)
+        serializer = ProductPriceHistorySerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
 # class BulkPriceUpdateView(APIView):
 #     """
 #     Unified API endpoint to update pricing for multiple clusters or facilities.
@@ -2756,6 +2485,10 @@ class ClusterPriceUpdateStatusView(APIView):
     """
     API endpoint to check if cluster prices have been updated recently.
     Shows who updated, when, and by what percentage.
+
+    Reads the cluster's ClusterPriceSummary row, maintained as price history
+    is written. With start_date/end_date the statistics are computed from
+    the history in that range instead.
     """
     permission_classes = [AllowAny]  # Adjust permissions as needed
     
@@ -2778,13 +2511,20 @@ class ClusterPriceUpdateStatusView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Get the most recent price update for this cluster
-        recent_update = ProductPriceHistory.objects.filter(
-            cluster=cluster,
-            change_type__in=['bulk_cluster_update', 'percentage_update']
-        ).order_by('-creation_date').first()
+        if request.data.get('start_date') or request.data.get('end_date'):
+            try:
+                window = history_window(request.data.get('start_date'), request.data.get('end_date'))
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            summary = summarize_history_window(cluster.id, window)
+        else:
+            from cms.models.facility import ClusterPriceSummary
+            summary = ClusterPriceSummary.objects.select_related('last_user').filter(cluster=cluster).first()
+            if summary is None:
+                # First read for this cluster: build its summary from history once
+                summary = rebuild_cluster_price_summary(cluster.id)
         
-        if not recent_update:
+        if not summary.total_updates:
             return Response({
                 "cluster_id": cluster_id,
                 "cluster_name": cluster.name,
@@ -2793,31 +2533,17 @@ class ClusterPriceUpdateStatusView(APIView):
                 "last_update": None
             }, status=status.HTTP_200_OK)
         
-        # Get all updates for this cluster (for detailed history)
-        all_updates_queryset = ProductPriceHistory.objects.filter(
-            cluster=cluster,
-            change_type__in=['bulk_cluster_update', 'percentage_update']
-        ).order_by('-creation_date')
-        
-        # Get last 10 updates for display
-        recent_updates_list = list(all_updates_queryset[:10])
-        
-        # Get unique users who made updates
+        # Unique users among the recent updates
         update_users = {}
-        for update in recent_updates_list:
-            if update.user:
-                user_id = update.user.id
-                if user_id not in update_users:
-                    update_users[user_id] = {
-                        'id': update.user.id,
-                        'username': update.user.username,
-                        'name': f"{update.user.first_name} {update.user.last_name}".strip() or update.user.username
-                    }
+        for update in summary.recent_updates:
+            updated_by = update['updated_by']
+            if updated_by['id'] is not None:
+                update_users.setdefault(updated_by['id'], updated_by)
         
         # Calculate time since last update
         from django.utils import timezone
         now = timezone.now()
-        time_diff = now - recent_update.creation_date
+        time_diff = now - summary.last_update_at
         
         # Format time difference
         if time_diff.days > 0:
@@ -2831,54 +2557,27 @@ class ClusterPriceUpdateStatusView(APIView):
         else:
             time_ago = "Just now"
         
-        # Get update statistics (use the full queryset, not sliced)
-        total_updates = all_updates_queryset.count()
-        unique_products = all_updates_queryset.values('product').distinct().count()
-        unique_variants = all_updates_queryset.values('product_variant').distinct().count()
-        
-        # Get percentage changes used
-        percentage_changes = list(all_updates_queryset.values_list('percentage_change', flat=True).distinct())
-        
         return Response({
             "cluster_id": cluster_id,
             "cluster_name": cluster.name,
             "status": "updated",
             "message": f"Cluster '{cluster.name}' prices were last updated {time_ago}",
             "last_update": {
-                "date": recent_update.creation_date.isoformat(),
+                "date": summary.last_update_at.isoformat(),
                 "time_ago": time_ago,
-                "margin_update": recent_update.percentage_change,
-                "updated_by": {
-                    "id": recent_update.user.id if recent_update.user else None,
-                    "username": recent_update.user.username if recent_update.user else "System",
-                    "name": f"{recent_update.user.first_name} {recent_update.user.last_name}".strip() if recent_update.user and recent_update.user.first_name else (recent_update.user.username if recent_update.user else "System")
-                },
-                "change_type": recent_update.change_type,
-                "change_reason": recent_update.change_reason
+                "margin_update": summary.last_percentage_change,
+                "updated_by": user_info(summary.last_user),
+                "change_type": summary.last_change_type,
+                "change_reason": summary.last_change_reason
             },
             "update_statistics": {
-                "total_updates": total_updates,
-                "unique_products_updated": unique_products,
-                "unique_variants_updated": unique_variants,
-                "percentage_changes_used": percentage_changes,
+                "total_updates": summary.total_updates,
+                "unique_products_updated": summary.unique_products,
+                "unique_variants_updated": summary.unique_variants,
+                "percentage_changes_used": summary.percentage_changes,
                 "update_users": list(update_users.values())
             },
-            "recent_updates": [
-                {
-                    "id": update.id,
-                    "date": update.creation_date.isoformat(),
-                    "percentage_change": update.percentage_change,
-                    "updated_by": {
-                        "id": update.user.id if update.user else None,
-                        "username": update.user.username if update.user else "System",
-                        "name": f"{update.user.first_name} {update.user.last_name}".strip() if update.user and update.user.first_name else (update.user.username if update.user else "System")
-                    },
-                    "change_type": update.change_type,
-                    "change_reason": update.change_reason,
-                    "products_affected": update.product.name if update.product else "Unknown"
-                }
-                for update in recent_updates_list[:5]  # Last 5 updates
-            ]
+            "recent_updates": summary.recent_updates[:5]  # Last 5 updates
         }, status=status.HTTP_200_OK)
 
 
@@ -2888,6 +2587,7 @@ class SmartBrandBulkCreateProductsView(APIView):
     Creates multiple products with smart brand assignment logic from file upload.
     Accepts CSV or Excel files with product data.
     Brand field accepts either ID (numeric) or name (text).
+    ?dry_run=true validates the parsed file and returns an error report without writing.
     """
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
@@ -2920,6 +2620,18 @@ class SmartBrandBulkCreateProductsView(APIView):
                     {"error": "No valid data found in the file."}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
+
+            if is_dry_run(request):
+                report = validate_import_payload(products_data, mode=MODE_CREATE, unknown_brands_ok=True)
+                return Response({"file_name": file.name, **report}, status=status.HTTP_200_OK)
+
+            guardrail_errors = price_guardrail_errors(products_data, mode=MODE_CREATE)
+            if guardrail_errors:
+                return Response({
+                    "error": f"{len(guardrail_errors)} variant selling prices break their price guardrails.",
+                    "file_name": file.name,
+                    "errors": guardrail_errors,
+                }, status=status.HTTP_400_BAD_REQUEST)
             
             # Validate all payloads as a list
             validator = SmartBrandProductSerializer(data=products_data, many=True)
@@ -2936,21 +2648,31 @@ class SmartBrandBulkCreateProductsView(APIView):
                 if idx not in errors
             ]
 
-            created_products = []
+            # if a product with this name exists, don't create – just return it
+            # (the first row of a new name creates it, later rows reuse it)
+            existing_by_name = {}
+            for product in Product.objects.filter(name__in={item['name'] for item in valid_items}).order_by('id'):
+                existing_by_name.setdefault(product.name, product)
+            new_items = {}
             for item in valid_items:
-                name = item['name']
-                # if a product with this name exists, don't create – just return it
-                existing = Product.objects.filter(name=name).first()
-                if existing:
-                    created_products.append(existing)
-                else:
-                    # truly new: use our single-item .create() to handle nested data
-                    new_prod = SmartBrandProductSerializer().create(item)
-                    # Track who created the product
-                    new_prod.created_by = request.user
-                    new_prod.updated_by = request.user
-                    new_prod.save()
-                    created_products.append(new_prod)
+                if item['name'] not in existing_by_name:
+                    new_items.setdefault(item['name'], item)
+
+            # truly new: one SKU reservation and one bulk insert per model for all of them
+            results = SmartBrandProductSerializer().create_many(list(new_items.values()), user=request.user)
+            validation_variant_ids = []
+            for name, result in zip(new_items, results):
+                if result['product'] is not None:
+                    existing_by_name[name] = result['product']
+                    validation_variant_ids.extend(result['validation_variant_ids'])
+            created_products = [
+                existing_by_name[item['name']] for item in valid_items if item['name'] in existing_by_name
+            ]
+
+            # EAN/RAN values are checked against GS1 in the background
+            validation_job = queue_ean_validation(
+                validation_variant_ids, user=request.user, source='products/smart-brand-bulk-create'
+            )
 
             # serialize output
             output_data = ProductDetailSerializer(created_products, many=True).data
@@ -2962,6 +2684,7 @@ class SmartBrandBulkCreateProductsView(APIView):
                 "total_processed": len(products_data),
                 "successful_creates": len(created_products),
                 "errors_count": len(errors),
+                "validation_job_id": validation_job.id if validation_job else None,
                 "created": output_data, 
                 "errors": errors
             }, status=status_code)
@@ -3157,6 +2880,41 @@ class SmartBrandBulkCreateProductsView(APIView):
         return product_data
 
 
+class CatalogStagingIngestView(APIView):
+    """
+    POST /api/cms/products/staging-ingest/
+    Loads a normalized catalog CSV for very large partner onboardings.
+    The file is streamed into an unlogged staging table with COPY and merged
+    into products/variants with set-based upserts keyed on SKU.
+    Category and brand are given by name.
+    """
+    permission_classes = [IsAuthenticated, IsMaster]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request, *args, **kwargs):
+        if 'file' not in request.FILES:
+            return Response(
+                {"error": "No file provided. Please upload a normalized CSV file."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        file = request.FILES['file']
+        if file.name.split('.')[-1].lower() != 'csv':
+            return Response(
+                {"error": "Unsupported file format. Please upload a CSV file."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            report = ingest_catalog_csv(file, user=request.user)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        print(f"📦 Staging ingest '{file.name}': {report['staged_rows']} rows in {report['duration_seconds']}s")
+        status_code = status.HTTP_201_CREATED if not report['rejected_rows'] else status.HTTP_207_MULTI_STATUS
+        return Response({"file_name": file.name, **report}, status=status_code)
+
+
 # Size Chart Utility Functions
 def handle_product_size_chart(product_variant, size_chart_data):
     """
@@ -3487,6 +3245,12 @@ class GS1APIView(APIView):
                 'message': 'Please provide an EAN/GTIN number as query parameter'
             }, status=status.HTTP_400_BAD_REQUEST)
 
+        if not is_valid_gtin(ean_number):
+            return Response({
+                'error': 'Invalid EAN',
+                'message': 'EAN/GTIN must be numeric with a valid check digit'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
         # Check if EAN already exists in database
         existing_variant = ProductVariant.objects.filter(ean_number=ean_number).first()
         if existing_variant:
@@ -3503,62 +3267,26 @@ class GS1APIView(APIView):
                 }
             }, status=status.HTTP_409_CONFLICT)
 
-        # Get GS1 API configuration
-        import os
-        import json
-        import requests
-
-        GS1_API_URL = os.environ.get("GS1_API_URL", "https://api.gs1datakart.org/console/retailer/products")
-        GS1_API_TOKEN = os.environ.get("GS1_API_TOKEN", "")
-
-        if not GS1_API_TOKEN:
+        # Read through the GTIN cache; GS1 is only called for unknown or expired codes
+        try:
+            metadata = lookup_gtin(ean_number)
+        except GS1NotConfigured:
             return Response({
                 'error': 'GS1 API token not configured',
                 'message': 'Please configure GS1_API_TOKEN in environment variables'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        try:
-            # Prepare request parameters (GS1 API expects array format)
-            gtin_param = json.dumps([ean_number])
-
-            # Make request to GS1 API
-            response = requests.get(
-                GS1_API_URL,
-                params={'gtin': gtin_param, 'status': 'published'},
-                headers={'Authorization': f'Bearer {GS1_API_TOKEN}'}
-            )
-
-            # Return the same response from GS1 API
-            try:
-                response_data = response.json()
-                # Add database check result to response
-                response_data['db_check'] = {
-                    'exists': False,
-                    'message': 'EAN does not exist in database'
-                }
-                return Response(response_data, status=response.status_code)
-            except ValueError:
-                # If response is not JSON, return as text
-                return Response({
-                    'data': response.text,
-                    'status_code': response.status_code,
-                    'db_check': {
-                        'exists': False,
-                        'message': 'EAN does not exist in database'
-                    }
-                }, status=response.status_code)
-
-        except requests.exceptions.RequestException as e:
+        except GS1Error as e:
             return Response({
                 'error': 'Failed to call GS1 API',
                 'message': str(e)
             }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
-        except Exception as e:
-            return Response({
-                'error': 'Internal server error',
-                'message': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        response_data = gs1_response(metadata)
+        response_data['db_check'] = {
+            'exists': False,
+            'message': 'EAN does not exist in database'
+        }
+        return Response(response_data, status=status.HTTP_200_OK)
 
 
 class CollectionExportView(APIView):
@@ -3670,10 +3398,48 @@ class CollectionExportView(APIView):
 
 
 
+class ScheduledPriceChangeViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Scheduled price overrides (create them with OverridePriceView and effective_at).
+
+    Query Parameters:
+    - status: scheduled, applied, failed or cancelled
+    """
+    serializer_class = ScheduledPriceChangeSerializer
+    permission_classes = [AllowAny]  # Adjust permissions as needed
+    pagination_class = CustomPageNumberPagination
+
+    def get_queryset(self):
+        queryset = ScheduledPriceChange.objects.select_related('created_by')
+        change_status = self.request.query_params.get('status')
+        if change_status:
+            queryset = queryset.filter(status=change_status)
+        return queryset.order_by('effective_at', 'id')
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """Cancel a change that has not been applied yet"""
+        cancelled = ScheduledPriceChange.objects.filter(
+            id=pk, status=ScheduledPriceChange.SCHEDULED
+        ).update(status=ScheduledPriceChange.CANCELLED, updation_date=timezone.now())
+        if not cancelled:
+            change = self.get_object()
+            return Response(
+                {"error": f"Scheduled change is already {change.status}"},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response(self.get_serializer(self.get_object()).data)
+
+
 class OverridePriceView(APIView):
     """
     Override pricing API with cluster/facility targeting and MRP validation.
-    Supports discovery mode (no margin) and execution mode (with margin).
+    Supports discovery mode (no margin), simulate mode (mode: 'simulate' with a
+    margin, nothing is written) and execution mode (with margin).
+    Execution over more than max_variants variants (or with async: true) is
+    queued as a price_override job; poll GET /api/cms/jobs/<job_id>/.
+    With effective_at (ISO datetime) the execution is scheduled instead and
+    applied off-peak by manage.py apply_scheduled_price_changes.
     """
     permission_classes = [AllowAny]
     
@@ -3686,7 +3452,8 @@ class OverridePriceView(APIView):
         margin = request.data.get('margin')
         type_param = request.data.get('type')
         skip_price_history = request.data.get('skip_price_history', False)  # Enable history by default
-        max_variants = request.data.get('max_variants', 5000)  # Reasonable default for fast response
+        max_variants = request.data.get('max_variants', 5000)  # Larger overrides are queued as a job
+        run_async = bool(request.data.get('async', False))
         product_name = request.data.get('product_name', '')  # Filter by product name
         variant_name = request.data.get('variant_name', '')  # Filter by variant name
         
@@ -3729,6 +3496,18 @@ class OverridePriceView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
         
+        # Simulate mode - impact of a margin without writing anything
+        if request.data.get('mode') == 'simulate' or request.data.get('simulate'):
+            try:
+                float(margin)
+                bins = int(request.data.get('bins', 10))
+            except (TypeError, ValueError):
+                return Response(
+                    {"error": "A numeric margin is required to simulate a price override"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            return self._simulate_mode(clusters, facility_ids, variant_ids, category_ids, brand_ids, margin, product_name, variant_name, max(1, min(bins, 100)))
+
         # Discovery mode - return available options
         if margin is None:
             return self._discovery_mode(clusters, facility_ids, variant_ids, category_ids, brand_ids, product_name, variant_name, page, page_size)
@@ -3751,10 +3530,23 @@ class OverridePriceView(APIView):
                 {"error": "Type must be 'all' when provided."}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
+
+        try:
+            float(margin)
+            max_variants = int(max_variants)
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "margin and max_variants must be numbers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
+        # Scheduled execution - store the override and apply it at effective_at
+        if request.data.get('effective_at'):
+            return self._schedule(request, cluster_ids, facility_ids, variant_ids, category_ids, brand_ids, margin, type_param, product_name, variant_name, skip_price_history)
+
         # Execution mode - update prices
         try:
-            result = self._execution_mode(clusters, facility_ids, variant_ids, category_ids, brand_ids, margin, type_param, product_name, variant_name, page, page_size, request.user, skip_price_history, max_variants)
+            result = self._execution_mode(clusters, facility_ids, variant_ids, category_ids, brand_ids, margin, type_param, product_name, variant_name, page, page_size, request.user, skip_price_history, max_variants, run_async)
             return result
         except Exception as e:
             import traceback
@@ -3764,6 +3556,48 @@ class OverridePriceView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    def _simulate_mode(self, clusters, facility_ids, variant_ids, category_ids, brand_ids, margin, product_name, variant_name, bins):
+        """Vectorized what-if statistics for applying margin to the targeted inventories"""
+        if facility_ids:
+            cluster_facilities = Facility.objects.filter(id__in=facility_ids, is_active=True)
+        else:
+            cluster_facilities = Facility.objects.filter(clusters__in=clusters, is_active=True).distinct()
+
+        facility_id_list = list(cluster_facilities.values_list('id', flat=True))
+        if not facility_id_list:
+            return Response(
+                {"error": "No active facilities found"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        variants = override_targets(
+            facility_id_list,
+            variant_ids=variant_ids,
+            category_ids=category_ids,
+            brand_ids=brand_ids,
+            product_name=product_name,
+            variant_name=variant_name,
+        )
+
+        start_time = time.time()
+        impact = simulate_price_override(variants, facility_id_list, margin, bins=bins)
+        print(f"🧮 Simulated override of {impact['inventory_rows']} inventory rows in {round((time.time() - start_time) * 1000, 1)}ms")
+
+        if not impact['inventory_rows']:
+            return Response(
+                {"error": "No variants found matching the specified criteria"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({
+            "mode": "simulate",
+            "margin": margin,
+            "clusters": [{"id": c.id, "name": c.name} for c in clusters],
+            "facilities_count": len(facility_id_list),
+            "impact": impact,
+            "message": "Simulation only, no prices were changed"
+        })
+
     def _discovery_mode(self, clusters, facility_ids, variant_ids, category_ids, brand_ids, product_name, variant_name, page, page_size):
         """Return available facilities, variants, categories, and brands for the clusters"""
         # Prioritize facility_ids over cluster filtering
@@ -3828,13 +3662,17 @@ class OverridePriceView(APIView):
         ).select_related('facility', 'product_variant')
         
         # Build a lookup: variant_id -> list of facility price dicts
+        discovery_inventories = list(discovery_inventories)
+        effective_prices = resolve_prices(
+            (inv.facility_id, inv.product_variant_id) for inv in discovery_inventories
+        )
         variant_id_to_facility_prices = {}
         for inv in discovery_inventories:
             facility_prices = variant_id_to_facility_prices.setdefault(inv.product_variant_id, [])
             facility_prices.append({
                 'facility_id': inv.facility_id,
                 'facility_name': getattr(inv.facility, 'name', ''),
-                'selling_price': inv.selling_price or 0
+                'selling_price': effective_prices[price_key(inv.facility_id, inv.product_variant_id)].selling_price or 0
             })
 
         # Compose variants payload with base_price, mrp, and selling prices per facility
@@ -3845,19 +3683,20 @@ class OverridePriceView(APIView):
         histories = ProductPriceHistory.objects.filter(
             product_variant_id__in=[v.id for v in paginated_variants],
             facility__in=cluster_facilities
-        ).select_related('user').order_by('product_variant_id', '-creation_date')
+        ).select_related('user', 'batch', 'batch__user').order_by('product_variant_id', '-creation_date')
         seen_variant_ids = set()
         for h in histories:
             if h.product_variant_id in seen_variant_ids:
                 continue
             seen_variant_ids.add(h.product_variant_id)
+            user = h.effective_user
             last_history_by_variant[h.product_variant_id] = {
-                'margin': h.percentage_change,
+                'margin': h.effective_percentage_change,
                 'user': ({
-                    'id': getattr(h.user, 'id', None),
-                    'name': getattr(h.user, 'name', None) or getattr(h.user, 'username', None),
-                    'email': getattr(h.user, 'email', None)
-                } if getattr(h, 'user', None) else None),
+                    'id': getattr(user, 'id', None),
+                    'name': getattr(user, 'name', None) or getattr(user, 'username', None),
+                    'email': getattr(user, 'email', None)
+                } if user else None),
                 'timestamp': h.creation_date
             }
         for v in paginated_variants:
@@ -3913,8 +3752,53 @@ class OverridePriceView(APIView):
             "message": "Provide margin percentage and either variant_ids or type: 'all' to execute price updates"
         })
     
-    def _execution_mode(self, clusters, facility_ids, variant_ids, category_ids, brand_ids, margin, type_param, product_name, variant_name, page, page_size, user, skip_price_history=False, max_variants=10000):
-        """Execute price updates with MRP validation"""
+    def _schedule(self, request, cluster_ids, facility_ids, variant_ids, category_ids, brand_ids, margin, type_param, product_name, variant_name, skip_price_history):
+        """Store the override as a ScheduledPriceChange; nothing is repriced now"""
+        effective_at = parse_datetime(str(request.data.get('effective_at')))
+        if effective_at is None:
+            return Response(
+                {"error": "effective_at must be an ISO 8601 datetime"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if timezone.is_naive(effective_at):
+            effective_at = timezone.make_aware(effective_at)
+        if effective_at <= timezone.now():
+            return Response(
+                {"error": "effective_at must be in the future"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        user = request.user if request.user and request.user.is_authenticated else None
+        change = ScheduledPriceChange.objects.create(
+            cluster_ids=list(cluster_ids),
+            facility_ids=list(facility_ids),
+            variant_ids=variant_ids if type_param != 'all' else [],
+            category_ids=category_ids,
+            brand_ids=brand_ids,
+            product_name=product_name,
+            variant_name=variant_name,
+            margin=float(margin),
+            write_history=not skip_price_history,
+            effective_at=effective_at,
+            created_by=user,
+            updated_by=user,
+        )
+        return Response({
+            "success": True,
+            "mode": "scheduled",
+            "scheduled_change_id": change.id,
+            "status": change.status,
+            "margin_applied": change.margin,
+            "effective_at": change.effective_at.isoformat(),
+            "status_url": f"/api/cms/scheduled-price-changes/{change.id}/",
+            "message": f"Price override scheduled for {change.effective_at.isoformat()}"
+        }, status=status.HTTP_202_ACCEPTED)
+
+    def _execution_mode(self, clusters, facility_ids, variant_ids, category_ids, brand_ids, margin, type_param, product_name, variant_name, page, page_size, user, skip_price_history=False, max_variants=10000, run_async=False):
+        """
+        Execute price updates with MRP validation. Overrides of more than
+        max_variants variants (or with async: true) are queued as a job.
+        """
         # Prioritize facility_ids over cluster filtering
         if facility_ids:
             # If facility_ids provided, use them directly (ignore cluster filtering)
@@ -3933,35 +3817,19 @@ class OverridePriceView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get variants to update with optimized queries
-        facility_inventories = FacilityInventory.objects.filter(
-            facility__in=cluster_facilities, is_active=True
-        ).select_related('product_variant__product', 'product_variant__product__category', 'product_variant__product__brand')
-        
-        inventory_variant_ids = facility_inventories.values_list('product_variant_id', flat=True).distinct()
-        variants = ProductVariant.objects.filter(
-            id__in=inventory_variant_ids, 
-            is_active=True, 
-            is_published=True
-        ).select_related('product', 'product__category', 'product__brand')
-        
-        # Apply variant filtering
-        if variant_ids:
-            variants = variants.filter(id__in=variant_ids)
-        elif type_param == 'all':
-            # Get all variants matching other filters
-            pass
-        if product_name:
-            variants = variants.filter(product__name__icontains=product_name)
-        if variant_name:
-            variants = variants.filter(name__icontains=variant_name)
-        
-        # Apply other filters through products
-        if category_ids:
-            variants = variants.filter(product__category_id__in=category_ids)
-        if brand_ids:
-            variants = variants.filter(product__brand_id__in=brand_ids)
-        
+        facility_id_list = list(cluster_facilities.values_list('id', flat=True))
+        cluster_id = clusters.order_by('id').values_list('id', flat=True).first()
+        user_id = user.id if user and user.is_authenticated else None
+
+        variants = override_targets(
+            facility_id_list,
+            variant_ids=variant_ids,
+            category_ids=category_ids,
+            brand_ids=brand_ids,
+            product_name=product_name,
+            variant_name=variant_name,
+        )
+
         if not variants.exists():
             return Response(
                 {"error": "No variants found matching the specified criteria"}, 
@@ -3971,241 +3839,69 @@ class OverridePriceView(APIView):
         # Get total count before pagination
         total_variants = variants.count()
         
+        # Repricings larger than max_variants run as a chunked background job
+        if run_async or (type_param == 'all' and total_variants > max_variants):
+            job = enqueue_job(
+                CatalogJob.PRICE_OVERRIDE,
+                params={
+                    'facility_ids': facility_id_list,
+                    'cluster_id': cluster_id,
+                    'user_id': user_id,
+                    'margin': margin,
+                    'write_history': not skip_price_history,
+                    'variant_ids': variant_ids if type_param != 'all' else [],
+                    'category_ids': category_ids,
+                    'brand_ids': brand_ids,
+                    'product_name': product_name,
+                    'variant_name': variant_name,
+                },
+                user=user if user_id else None,
+                source='override-price',
+                total_count=total_variants,
+            )
+            return Response({
+                "success": True,
+                "mode": "job",
+                "job_id": job.id,
+                "status": job.status,
+                "margin_applied": margin,
+                "total_variants": total_variants,
+                "progress_url": f"/api/cms/jobs/{job.id}/",
+                "message": f"Price override for {total_variants} variants queued as job #{job.id}"
+            }, status=status.HTTP_202_ACCEPTED)
+
         # Apply pagination only for discovery mode or when not using type: "all"
         if type_param == 'all':
             # For type: "all", process ALL variants (no limit)
             variants_to_process = variants
-            print(f"Processing ALL {variants.count()} variants (type: 'all')")
+            print(f"Processing ALL {total_variants} variants (type: 'all')")
         else:
             # Apply pagination for specific variant_ids
             start_index = (page - 1) * page_size
             end_index = start_index + page_size
             variants_to_process = variants[start_index:end_index]
         
-        # Update prices with bulk operations for maximum performance
-        updated_variants = []
-        rejected_variants = []
-        total_updated = 0
-        total_rejected = 0
-        total_processed = 0  # Track total variants that got a decision
-        
-        # Get all inventories at once to avoid N+1 queries
-        inventories = FacilityInventory.objects.filter(
-            facility__in=cluster_facilities,
-            product_variant__in=variants_to_process,
-            is_active=True
-        ).select_related('facility', 'product_variant', 'product_variant__product')
-        
-        # Create lookup dictionary for faster access
-        inventory_lookup = {}
-        for inv in inventories:
-            key = f"{inv.facility_id}_{inv.product_variant_id}"
-            inventory_lookup[key] = inv
-        
-        # Also create a set of variant IDs that have inventory records for quick lookup
-        variants_with_inventory = set()
-        for inv in inventories:
-            variants_with_inventory.add(inv.product_variant_id)
-        
-        # Prepare bulk updates
-        inventories_to_update = []
-        price_history_records = []
-        
-        # Process variants in smaller batches for better performance and memory management
-        batch_size = 100  # Smaller batch size for faster processing
-        variant_list = list(variants_to_process)
-        total_variants_to_process = len(variant_list)
-        
-        print(f"Processing {total_variants_to_process} variants in batches of {batch_size}")
-        
-        for i in range(0, len(variant_list), batch_size):
-            batch_variants = variant_list[i:i + batch_size]
-            batch_num = (i // batch_size) + 1
-            total_batches = (total_variants_to_process + batch_size - 1) // batch_size
-            
-            print(f"Processing batch {batch_num}/{total_batches} ({len(batch_variants)} variants)")
-            
-            for variant in batch_variants:
-                variant_updated = 0
-                variant_rejected = 0
-                variant_selling_prices = []  # Track selling prices for this variant
-                
-                # Check if this variant has any inventory records at all
-                if variant.id not in variants_with_inventory:
-                    # No inventory records for this variant in any facility - reject
-                    if len(rejected_variants) < 100:
-                        rejected_variants.append({
-                            'variant_id': variant.id,
-                            'variant_name': variant.name,
-                            'sku': variant.sku,
-                            'product_id': variant.product.id,
-                            'product_name': variant.product.name,
-                            'facility_id': cluster_facilities.first().id if cluster_facilities.exists() else None,
-                            'facility_name': cluster_facilities.first().name if cluster_facilities.exists() else 'N/A',
-                            'base_price': variant.base_price or 0,
-                            'selling_price': 0,
-                            'mrp': variant.mrp or 0,
-                            'calculated_price': 0,
-                            'reason': 'no_inventory_records'
-                        })
-                    variant_rejected += 1
-                    total_rejected += 1
-                    total_processed += 1
-                    continue
-                
-                for facility in cluster_facilities:
-                    key = f"{facility.id}_{variant.id}"
-                    inventory = inventory_lookup.get(key)
-                    
-                    if not inventory:
-                        # No inventory record for this specific facility - reject
-                        if len(rejected_variants) < 100:
-                            rejected_variants.append({
-                                'variant_id': variant.id,
-                                'variant_name': variant.name,
-                                'sku': variant.sku,
-                                'product_id': variant.product.id,
-                                'product_name': variant.product.name,
-                                'facility_id': facility.id,
-                                'facility_name': facility.name,
-                                'base_price': variant.base_price or 0,
-                                'selling_price': 0,
-                                'mrp': variant.mrp or 0,
-                                'calculated_price': 0,
-                                'reason': 'no_inventory_record'
-                            })
-                        variant_rejected += 1
-                        continue
-                    
-                    # Get current prices
-                    current_selling_price = inventory.selling_price or 0
-                    base_price = variant.base_price or 0
-                    variant_mrp = variant.mrp or 0
-                    
-                    # Determine which price to use for calculation
-                    if current_selling_price > 0:
-                        current_price = current_selling_price
-                    elif base_price > 0:
-                        current_price = base_price
-                    else:
-                        # No valid price - reject this variant
-                        if len(rejected_variants) < 100:
-                            rejected_variants.append({
-                                'variant_id': variant.id,
-                                'variant_name': variant.name,
-                                'sku': variant.sku,
-                                'product_id': variant.product.id,
-                                'product_name': variant.product.name,
-                                'facility_id': facility.id,
-                                'facility_name': facility.name,
-                                'base_price': base_price,
-                                'selling_price': current_selling_price,
-                                'mrp': variant_mrp,
-                                'calculated_price': 0,
-                                'reason': 'no_valid_price'
-                            })
-                        variant_rejected += 1
-                        continue
-                    
-                    new_price = base_price * (1 + margin / 100)
-                    
-                    # MRP validation
-                    if variant_mrp > 0 and new_price > variant_mrp:
-                        # Only store first 100 rejected items to limit response size
-                        if len(rejected_variants) < 100:
-                            rejected_variants.append({
-                                'variant_id': variant.id,
-                                'variant_name': variant.name,
-                                'sku': variant.sku,
-                                'product_id': variant.product.id,
-                                'product_name': variant.product.name,
-                                'facility_id': facility.id,
-                                'facility_name': facility.name,
-                                'base_price': base_price,
-                                'selling_price': current_selling_price,
-                                'mrp': variant_mrp,
-                                'calculated_price': new_price,
-                                'reason': 'calculated_price_exceeds_mrp'
-                            })
-                        variant_rejected += 1
-                        continue
-                    
-                    # Prepare for bulk update
-                    old_price = inventory.selling_price
-                    inventory.selling_price = new_price
-                    inventories_to_update.append(inventory)
-                    
-                    # Track selling price for this variant
-                    variant_selling_prices.append({
-                        'facility_id': facility.id,
-                        'facility_name': facility.name,
-                        'old_selling_price': old_price or 0,
-                        'new_selling_price': new_price
-                    })
-                    
-                    # Prepare price history record for bulk creation (only if not skipped)
-                    if not skip_price_history:
-                        price_history_records.append(ProductPriceHistory(
-                            product=variant.product,
-                            product_variant=variant,
-                            cluster=clusters.first() if clusters.exists() else None,
-                            facility=facility,
-                            user=user if user and user.is_authenticated else None,
-                            old_price=old_price or current_price,
-                            new_price=new_price,
-                            old_csp=old_price or current_price,
-                            new_csp=new_price,
-                            percentage_change=margin,
-                            change_type='override_price_update',
-                            change_reason=f'Override price update by {margin}%'
-                        ))
-                    
-                    variant_updated += 1
-                    total_updated += 1
-                
-                # Always add variant to results if it was processed (updated or rejected)
-                if variant_updated > 0 or variant_rejected > 0:
-                    # Only store first 100 items to limit response size
-                    if len(updated_variants) < 100:
-                        updated_variants.append({
-                            'variant_id': variant.id,
-                            'variant_name': variant.name,
-                            'sku': variant.sku,
-                            'product_id': variant.product.id,
-                            'product_name': variant.product.name,
-                            'base_price': variant.base_price or 0,
-                            'mrp': variant.mrp or 0,
-                            'selling_prices': variant_selling_prices if variant_selling_prices else [],
-                            'facilities_updated': variant_updated,
-                            'facilities_rejected': variant_rejected,
-                            'status': 'updated' if variant_updated > 0 else 'rejected'
-                        })
-                    total_rejected += variant_rejected
-                    total_processed += 1
-            
-            # Perform bulk updates after each batch to prevent memory issues
-            if inventories_to_update:
-                print(f"Updating {len(inventories_to_update)} inventories in batch {batch_num}")
-                FacilityInventory.objects.bulk_update(
-                    inventories_to_update, 
-                    ['selling_price'], 
-                    batch_size=100
-                )
-                
-                # Bulk create price history records (only if not skipped)
-                if not skip_price_history and price_history_records:
-                    print(f"Creating {len(price_history_records)} price history records in batch {batch_num}")
-                    ProductPriceHistory.objects.bulk_create(
-                        price_history_records, 
-                        batch_size=100
-                    )
-                
-                # Clear lists for next batch
-                inventories_to_update.clear()
-                price_history_records.clear()
-        
-        print(f"Completed processing all {total_variants_to_process} variants")
-        
+        # Reprice every (variant, facility) pair set-based: one aggregate, one
+        # history INSERT ... SELECT and one UPDATE ... FROM variants
+        try:
+            result = apply_price_override(
+                variants_to_process,
+                facility_id_list,
+                margin,
+                cluster_id=cluster_id,
+                user_id=user_id,
+                write_history=not skip_price_history,
+            )
+        except PriceOverrideLocked as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+        total_updated = result['updated']
+        total_rejected = result['rejected']
+        total_processed = result['variants_processed']
+        updated_variants = result['variant_samples']
+        rejected_variants = result['rejected_samples']
+
+        print(f"Completed override for {total_processed} variants: {total_updated} inventories updated, {total_rejected} rejected")
+
         # Calculate pagination info
         if type_param == 'all':
             # For type: "all", show that all variants were processed
@@ -4239,9 +3935,11 @@ class OverridePriceView(APIView):
                 "total_variants_processed": total_processed,
                 "total_variants_updated": total_updated,
                 "total_variants_rejected": total_rejected,
-                "total_variants_skipped": len(variants_to_process) - total_processed,
+                "total_variants_skipped": variants_to_process.count() - total_processed,
                 "variants_count": total_variants,
-                "price_history_records_created": total_updated if not skip_price_history else 0
+                "rejected_by_reason": result['rejected_by_reason'],
+                "price_history_records_created": result['history_rows'],
+                "price_change_batch_id": result['price_change_batch_id']
             },
             "updated_variants": updated_variants,
             "rejected_variants": rejected_variants,